@@ -0,0 +1,70 @@
+`default_nettype none
+// CIC decimator: ORDER integrators at the input rate, ORDER combs at the
+// output rate, one sample out for every FACTOR in. No multipliers; the gain
+// of FACTOR**ORDER is shifted back out, so FACTOR must be a power of two.
+// Offset-binary samples filter the same as signed ones at unity gain
+module decimator #(
+    parameter WIDTH = 16,
+    parameter FACTOR = 2,
+    parameter ORDER = 3
+) (
+    input wire clk_in,
+    input wire rst_in,
+
+    input wire [WIDTH-1:0] sample_in,
+    input wire valid_in,
+
+    output logic [WIDTH-1:0] sample_out,
+    output logic valid_out
+);
+    localparam int unsigned SHIFT = ORDER*$clog2(FACTOR);
+    // Every output fits in WIDTH+SHIFT bits, so wrapping there is exact
+    localparam int unsigned ACC_WIDTH = WIDTH+SHIFT;
+
+    logic [$clog2(FACTOR)-1:0] phase;
+    logic decimate;
+
+    logic [ORDER-1:0][ACC_WIDTH-1:0] integrator;
+    logic [ORDER-1:0][ACC_WIDTH-1:0] integrated;
+    logic [ORDER-1:0][ACC_WIDTH-1:0] delay;
+    logic [ORDER:0][ACC_WIDTH-1:0] comb;
+
+    always_comb begin
+        integrated[0] = integrator[0] + ACC_WIDTH'(sample_in);
+        for (int i = 1; i < ORDER; i = i + 1) begin
+            integrated[i] = integrator[i] + integrated[i-1];
+        end
+
+        comb[0] = integrator[ORDER-1];
+        for (int i = 0; i < ORDER; i = i + 1) begin
+            comb[i+1] = comb[i] - delay[i];
+        end
+    end
+
+    always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+            phase <= 0;
+            decimate <= 0;
+            integrator <= '0;
+            delay <= '0;
+            sample_out <= 0;
+            valid_out <= 0;
+        end else begin
+            if (valid_in) begin
+                integrator <= integrated;
+                phase <= phase + 1;
+            end
+            // The combs run the cycle after the last integrate of a group
+            decimate <= valid_in && phase == FACTOR-1;
+            if (decimate) begin
+                for (int i = 0; i < ORDER; i = i + 1) begin
+                    delay[i] <= comb[i];
+                end
+                sample_out <= comb[ORDER][ACC_WIDTH-1:SHIFT];
+            end
+            valid_out <= decimate;
+        end
+    end
+
+endmodule
+`default_nettype wire
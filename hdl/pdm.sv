@@ -1,4 +1,5 @@
-`default_nettype none `timescale 1 ns / 1 ps
+`default_nettype none
+`timescale 1 ns / 1 ps
 
 module pdm #(
     parameter int NBITS = 16
@@ -1,5 +1,10 @@
 `default_nettype wire
-module top_level (
+module top_level #(
+    // DECIMATE > 1 runs yin on a CIC decimated copy of the samples: the same
+    // 2048 sample windows, for DECIMATE**2 times less difference work and
+    // DECIMATE times less BRAM, but taumin only steps by DECIMATE
+    parameter DECIMATE = 1
+) (
     input wire        clk_100mhz,
     input wire [ 3:0] btn,
     input wire [15:0] sw,
@@ -75,21 +80,64 @@ module top_level (
     logic [10:0] raw_taumin;
     logic raw_taumin_valid;
 
-    yin #(
-        .WIDTH(16),
-        .WINDOW_SIZE(2048),
-        .DIFFS_PER_BRAM(512),
-        .TAUMAX(2048)
-    ) yin (
-        .clk_in(clk_100mhz),
-        .rst_in(sys_rst),
-
-        .sample_in(processed_sample),
-        .valid_in (processed_sample_valid),
-
-        .valid_out(raw_taumin_valid),
-        .taumin(raw_taumin)
-    );
+    generate
+        if (DECIMATE > 1) begin : decimated
+            logic [15:0] decimated_sample;
+            logic decimated_sample_valid;
+
+            decimator #(
+                .WIDTH (16),
+                .FACTOR(DECIMATE),
+                .ORDER (3)
+            ) decimator (
+                .clk_in(clk_100mhz),
+                .rst_in(sys_rst),
+
+                .sample_in(processed_sample),
+                .valid_in (processed_sample_valid),
+
+                .sample_out(decimated_sample),
+                .valid_out (decimated_sample_valid)
+            );
+
+            logic [$clog2(2048/DECIMATE)-1:0] decimated_taumin;
+
+            yin #(
+                .WIDTH(16),
+                .WINDOW_SIZE(2048/DECIMATE),
+                .DIFFS_PER_BRAM(512/DECIMATE),
+                .TAUMAX(2048/DECIMATE)
+            ) yin (
+                .clk_in(clk_100mhz),
+                .rst_in(sys_rst),
+
+                .sample_in(decimated_sample),
+                .valid_in (decimated_sample_valid),
+
+                .valid_out(raw_taumin_valid),
+                .taumin(decimated_taumin)
+            );
+
+            // Back to full rate samples
+            assign raw_taumin = {decimated_taumin, {$clog2(DECIMATE){1'b0}}};
+        end else begin : full_rate
+            yin #(
+                .WIDTH(16),
+                .WINDOW_SIZE(2048),
+                .DIFFS_PER_BRAM(512),
+                .TAUMAX(2048)
+            ) yin (
+                .clk_in(clk_100mhz),
+                .rst_in(sys_rst),
+
+                .sample_in(processed_sample),
+                .valid_in (processed_sample_valid),
+
+                .valid_out(raw_taumin_valid),
+                .taumin(raw_taumin)
+            );
+        end
+    endgenerate
 
     logic [10:0] taumin;
     logic taumin_valid;
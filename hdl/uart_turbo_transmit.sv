@@ -1,4 +1,5 @@
-`timescale 1ns / 1ps `default_nettype none
+`timescale 1ns / 1ps
+`default_nettype none
 
 typedef enum {
     READY,
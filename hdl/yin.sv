@@ -3,7 +3,13 @@ module yin #(
     parameter WIDTH = 16,
     parameter WINDOW_SIZE = 2048,
     parameter DIFFS_PER_BRAM = 512,
-    parameter TAUMAX = 2048
+    parameter TAUMAX = 2048,
+    // HOP < WINDOW_SIZE slides the window instead: a taumin every HOP
+    // samples for the last WINDOW_SIZE of them, once that many are in. Each
+    // sample then takes two passes over the sample BRAMs, one adding its
+    // pairs and one retiring the pairs of the sample it overwrites, and the
+    // CMNDF pass has to finish within HOP samples. Needs TAUMAX == WINDOW_SIZE
+    parameter HOP = WINDOW_SIZE
 ) (
     input wire clk_in,
     input wire rst_in,
@@ -31,6 +37,8 @@ module yin #(
     localparam int unsigned FRACTION_WIDTH = 15;
     localparam int unsigned FP_WIDTH = DIFF_WIDTH+FRACTION_WIDTH;
 
+    localparam bit SLIDING = HOP < WINDOW_SIZE;
+
     localparam logic[FRACTION_WIDTH+TAU_WIDTH:0] EARLY_CD = {'0, 1'b0, 15'b000110011001100};
 
     // COUNTERS/PIPELINE CONTROL
@@ -43,6 +51,16 @@ module yin #(
     logic cycle_toggle;
     logic window_toggle;
 
+    // SLIDING WINDOW CONTROL
+    logic retiring;       // second pass, for the sample being overwritten
+    logic filled;         // a whole window is in the sample BRAMs
+    logic copying;        // first pass after a hop reads the frozen diff BRAMs
+    logic [$clog2(HOP)-1:0] hop;
+    logic [1:0] valid_pipe;
+    logic [WIDTH-1:0] retired_sample;
+    logic [WIDTH-1:0] pair_sample;
+    assign pair_sample = (retiring) ? retired_sample : current_sample;
+
     // SAMPLE BRAM CONTROL
     logic [NUM_BRAM-1:0] wen_s;
     logic [$clog2(SAMPLES_PER_BRAM)-1:0] write_addr_s;
@@ -93,34 +111,63 @@ module yin #(
     // BRAM OUTPUTS - alternate to prevent clobbering
     logic [1:0][NUM_BRAM_PORTS-1:0][DIFF_WIDTH-1:0] diff_out;
 
+    logic pass_done;
+    assign pass_done = (read_addr_s[5] == SAMPLES_PER_BRAM - 2);
+    logic retire_next;
+    assign retire_next = SLIDING && filled && !retiring;
+    logic sample_done;
+    assign sample_done = pass_done && !retire_next;
+
     logic reset_window;
-    assign reset_window = (read_addr_s[5] == SAMPLES_PER_BRAM - 2) && (sample == WINDOW_SIZE - 1);
+    assign reset_window = sample_done && ((SLIDING) ? (hop == HOP - 1) : (sample == WINDOW_SIZE - 1));
 
     always_comb begin
         // DIFF/CUMDIFF BRAM MUXING
-        diff = (window_toggle) ? diff_out[1] : diff_out[0];
+        diff = (window_toggle ^ copying) ? diff_out[1] : diff_out[0];
         cd_diff = (window_toggle) ? diff_out[0] : diff_out[1];
 
         for (int i = 0; i < NUM_BRAM_PORTS; i++) begin
             // STAGE 3 ADDR CALCULATION AND DIFF BRAM MUXING
-            case (sample[LOG_BRAM_PORTS-1:0])
-                2'b00: begin
-                    tau_w[(4-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
-                    tau_r[(4-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
-                end
-                2'b01: begin
-                    tau_w[(5-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
-                    tau_r[(5-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
-                end
-                2'b10: begin
-                    tau_w[(6-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
-                    tau_r[(6-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
-                end
-                default: begin
-                    tau_w[(3-(i))    ] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
-                    tau_r[(3-(i))    ] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
-                end
-            endcase
+            if (retiring) begin
+                // the overwritten sample is the oldest, so taus count up from it
+                case (sample[LOG_BRAM_PORTS-1:0])
+                    2'b00: begin
+                        tau_w[(i)        ] = ((read_addr_s[4] << LOG_BRAM) + i) - sample;
+                        tau_r[(i)        ] = ((read_addr_s[2] << LOG_BRAM) + i) - sample;
+                    end
+                    2'b01: begin
+                        tau_w[(3+(i)) % 4] = ((read_addr_s[4] << LOG_BRAM) + i) - sample;
+                        tau_r[(3+(i)) % 4] = ((read_addr_s[2] << LOG_BRAM) + i) - sample;
+                    end
+                    2'b10: begin
+                        tau_w[(2+(i)) % 4] = ((read_addr_s[4] << LOG_BRAM) + i) - sample;
+                        tau_r[(2+(i)) % 4] = ((read_addr_s[2] << LOG_BRAM) + i) - sample;
+                    end
+                    default: begin
+                        tau_w[(1+(i)) % 4] = ((read_addr_s[4] << LOG_BRAM) + i) - sample;
+                        tau_r[(1+(i)) % 4] = ((read_addr_s[2] << LOG_BRAM) + i) - sample;
+                    end
+                endcase
+            end else begin
+                case (sample[LOG_BRAM_PORTS-1:0])
+                    2'b00: begin
+                        tau_w[(4-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
+                        tau_r[(4-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
+                    end
+                    2'b01: begin
+                        tau_w[(5-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
+                        tau_r[(5-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
+                    end
+                    2'b10: begin
+                        tau_w[(6-(i)) % 4] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
+                        tau_r[(6-(i)) % 4] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
+                    end
+                    default: begin
+                        tau_w[(3-(i))    ] = sample - ((read_addr_s[4] << LOG_BRAM) + i);
+                        tau_r[(3-(i))    ] = sample - ((read_addr_s[2] << LOG_BRAM) + i);
+                    end
+                endcase
+            end
         end
         for (int i = 0; i < NUM_BRAM_PORTS; i++) begin
             tau_cd[i] = (read_addr_cd << LOG_BRAM) + i;
@@ -170,23 +217,39 @@ module yin #(
         end else begin
             for (int i = 0; i < NUM_BRAM_PORTS; i ++) begin
                 // STAGE 2: SUB + MUL
-                subtracted[i] <= (sample_out[i] < current_sample) ? current_sample - sample_out[i] : sample_out[i] - current_sample;
+                subtracted[i] <= (sample_out[i] < pair_sample) ? pair_sample - sample_out[i] : sample_out[i] - pair_sample;
                 multiplied[i] <= subtracted[i]*subtracted[i];
 
                 // STAGE 3 ADD TO DIFF + ADDR CALCULATION
-                case (sample[LOG_BRAM_PORTS-1:0])
-                    2'b00:
-                        added[(4-(i)) % 4] <= diff[(4-(i)) % 4] + multiplied[i];
-                    2'b01:
-                        added[(5-(i)) % 4] <= diff[(5-(i)) % 4] + multiplied[i];
-                    2'b10:
-                        added[(6-(i)) % 4] <= diff[(6-(i)) % 4] + multiplied[i];
-                    default:
-                        added[(3-(i))] <= diff[(3-(i))] + multiplied[i];
-                endcase
+                if (retiring) begin
+                    case (sample[LOG_BRAM_PORTS-1:0])
+                        2'b00:
+                            added[(i)] <= diff[(i)] - multiplied[i];
+                        2'b01:
+                            added[(3+(i)) % 4] <= diff[(3+(i)) % 4] - multiplied[i];
+                        2'b10:
+                            added[(2+(i)) % 4] <= diff[(2+(i)) % 4] - multiplied[i];
+                        default:
+                            added[(1+(i)) % 4] <= diff[(1+(i)) % 4] - multiplied[i];
+                    endcase
+                end else begin
+                    case (sample[LOG_BRAM_PORTS-1:0])
+                        2'b00:
+                            added[(4-(i)) % 4] <= diff[(4-(i)) % 4] + multiplied[i];
+                        2'b01:
+                            added[(5-(i)) % 4] <= diff[(5-(i)) % 4] + multiplied[i];
+                        2'b10:
+                            added[(6-(i)) % 4] <= diff[(6-(i)) % 4] + multiplied[i];
+                        default:
+                            added[(3-(i))] <= diff[(3-(i))] + multiplied[i];
+                    endcase
+                end
 
                 write_addr_d[i] <= ((tau_w[i] >> LOG_BRAM_PORTS) << 1) + (tau_w[i] & 1'b1);
-                wen_d[i] <= (tau_w[i] <= sample) && (!cycle_toggle) && (read_addr_s[2] != read_addr_s[4]);
+                // A full sliding window pairs with every stored sample; the
+                // overwritten one never pairs with its replacement at tau 0
+                wen_d[i] <= ((retiring) ? (tau_w[i] != 0) : (filled || (tau_w[i] <= sample)))
+                    && (!cycle_toggle) && (read_addr_s[2] != read_addr_s[4]);
             end
 
             // CUMDIFF PREFIX SUM
@@ -254,17 +317,17 @@ module yin #(
             ) diff_bram (
                 .clka (clk_in),
 
-                .addra((window != window_toggle) ? (read_addr_cd) : wen_d[i*2] ? write_addr_d[i*2] : read_addr_d[i*2]),
+                .addra((window != window_toggle && !copying) ? (read_addr_cd) : wen_d[i*2] ? write_addr_d[i*2] : read_addr_d[i*2]),
                 .wea  ((window == window_toggle) && wen_d[i*2]),
                 .dina (added[i*2]),
                 .douta(diff_out[window][i*2]),
-                .rsta((tau_r[i*2] == sample) && (window == window_toggle)),
+                .rsta(!filled && (tau_r[i*2] == sample) && (window == (window_toggle ^ copying))),
 
-                .addrb((window != window_toggle) ? (read_addr_cd + 1'b1) : wen_d[i*2+1] ? write_addr_d[i*2+1] : read_addr_d[i*2+1]),
+                .addrb((window != window_toggle && !copying) ? (read_addr_cd + 1'b1) : wen_d[i*2+1] ? write_addr_d[i*2+1] : read_addr_d[i*2+1]),
                 .web((window == window_toggle) && wen_d[i*2+1]),
                 .dinb (added[i*2+1]),
                 .doutb(diff_out[window][i*2+1]),
-                .rstb((tau_r[i*2+1] == sample) && (window == window_toggle)),
+                .rstb(!filled && (tau_r[i*2+1] == sample) && (window == (window_toggle ^ copying))),
 
                 .ena(1'b1),
                 .enb(1'b1),
@@ -298,14 +361,17 @@ module yin #(
     endgenerate
 
     always_ff @(posedge clk_in) begin
-        if (rst_in || (read_addr_s[5] == SAMPLES_PER_BRAM-2)) begin
+        if (rst_in || pass_done) begin
             processing_sample <= 0;
             cycle_toggle <= 0;
 
             read_addr_s <= '0;
         end
         if (rst_in || reset_window) begin
-            sample <= '0;
+            // sliding windows keep their place in the sample BRAMs
+            if (rst_in || !SLIDING) begin
+                sample <= '0;
+            end
             current_sample <= '0;
             valid_out <= 0;
 
@@ -327,17 +393,29 @@ module yin #(
             window_toggle <= 0;
         end else if (reset_window) begin
             window_toggle <= ~window_toggle;
+            if (SLIDING) begin
+                sample <= sample + 1;
+            end
         end else begin
             if (valid_in) begin
                 current_sample <= sample_in;
                 processing_sample <= 1;
-                if (sample == 0) begin
+                if (!SLIDING && sample == 0) begin
                     processing_cd <= 1;
                 end
             end
 
-            if (read_addr_s[5] == SAMPLES_PER_BRAM - 2) begin
-                sample <= sample + 1;
+            if (pass_done) begin
+                if (retire_next) begin
+                    // straight into the retiring pass
+                    processing_sample <= 1;
+                end else begin
+                    sample <= sample + 1;
+                end
+                // The frozen diff BRAMs are free once copied from
+                if (copying && filled) begin
+                    processing_cd <= 1;
+                end
             end else if (processing_sample) begin
                 cycle_toggle <= ~cycle_toggle;
 
@@ -349,5 +427,29 @@ module yin #(
         end
     end
 
+    always_ff @(posedge clk_in) begin
+        // The write of a new sample reads out the one it replaces
+        valid_pipe <= {valid_pipe[0], valid_in};
+        if (valid_pipe[1]) begin
+            retired_sample <= sample_out[2*sample[LOG_BRAM_PORTS-1:1]];
+        end
+
+        if (rst_in) begin
+            retiring <= 0;
+            filled <= 0;
+            copying <= 0;
+            hop <= '0;
+        end else if (pass_done) begin
+            retiring <= retire_next;
+            copying <= SLIDING && reset_window;
+            if (SLIDING && sample_done) begin
+                hop <= (hop == HOP - 1) ? 0 : hop + 1;
+                if (sample == WINDOW_SIZE - 1) begin
+                    filled <= 1;
+                end
+            end
+        end
+    end
+
 endmodule
 `default_nettype wire
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import wave
+from decimal import ROUND_HALF_UP, Decimal
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "sim" / "model"))
+import yin_model  # noqa: E402
+
+FS = 44100
+WINDOWS_PER_TASK = 64
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def format_f32(x):
+    """Shortest round-trip f32 string, printed the way Rust's Display does."""
+    x = np.float32(x)
+    if np.isinf(x):
+        return "inf"
+    exact = Decimal(float(x))
+    for digits in range(1, 10):
+        step = Decimal(1).scaleb(exact.adjusted() - digits + 1)
+        rounded = exact.quantize(step, rounding=ROUND_HALF_UP)
+        if np.float32(rounded) == x:
+            break
+    return format(rounded, "f")
+
+
+def read_windows(path, start, count, window_size):
+    with wave.open(str(path)) as wf:
+        channels = wf.getnchannels()
+        wf.setpos(start * window_size)
+        frames = wf.readframes(count * window_size)
+    samples = np.frombuffer(frames, dtype="<i2")[::channels]
+    return (samples.view(np.uint16) ^ 0x8000).reshape(count, window_size)
+
+
+def track(task):
+    path, start, count, window_size, taumax = task
+    if count == 0:
+        return path, np.zeros(0, dtype=np.int64)
+    windows = read_windows(path, start, count, window_size)
+    return path, yin_model.reference_tau(windows, taumax)
+
+
+def make_tasks(paths, window_size, taumax):
+    for path in paths:
+        with wave.open(str(path)) as wf:
+            if wf.getsampwidth() != 2:
+                eprint(f"{path}: expected 16-bit samples, skipping")
+                continue
+            num_windows = wf.getnframes() // window_size  # chunks_exact
+
+        yield path, 0, 0, window_size, taumax
+        for start in range(0, num_windows, WINDOWS_PER_TASK):
+            count = min(WINDOWS_PER_TASK, num_windows - start)
+            yield path, start, count, window_size, taumax
+
+
+def output_path(path, out_dir):
+    name = f"{path.stem}-windows.txt"
+    return (out_dir / name) if out_dir else path.with_name(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a -windows.txt pitch file for every input WAV"
+    )
+    parser.add_argument("inputs", nargs="+", type=Path, help="WAV files or directories")
+    parser.add_argument("--window-size", type=int, default=2048)
+    parser.add_argument("--taumax", type=int, default=2048)
+    parser.add_argument("--out-dir", type=Path, help="defaults to next to each input")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--taus", action="store_true", help="write integer taus instead of frequencies"
+    )
+    args = parser.parse_args()
+
+    paths = []
+    for p in args.inputs:
+        paths += sorted(p.glob("*.wav")) if p.is_dir() else [p]
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = make_tasks(paths, args.window_size, args.taumax)
+    current = None
+    out = None
+    with Pool(args.jobs) as pool:
+        # imap keeps task order, so each file is written front to back as
+        # soon as its blocks come back
+        for path, taus in pool.imap(track, tasks):
+            if path != current:
+                if out:
+                    out.close()
+                    eprint(f"Wrote {out.name}")
+                current = path
+                out = open(output_path(path, args.out_dir), "w")
+
+            if args.taus:
+                out.writelines(f"{tau}\n" for tau in taus)
+            else:
+                freqs = np.float32(FS) / taus.astype(np.float32)
+                out.writelines(f"{format_f32(f)}\n" for f in freqs)
+    if out:
+        out.close()
+        eprint(f"Wrote {out.name}")
+
+
+if __name__ == "__main__":
+    main()
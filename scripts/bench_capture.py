@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from capture import Capture, NpySink, WavSink
+from display_yin import TauReader
+from loopback_serial import LoopbackSerial
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+# Each tool reads from ser until the deadline or the end of the stream and
+# returns a dict of any extra stats it keeps.
+
+
+def per_byte(ser, deadline):
+    """The original save_wav.py loop: two single-byte reads per sample."""
+    samples = []
+    while time.perf_counter() < deadline and not ser.exhausted:
+        hi = int.from_bytes(ser.read(), "little")
+        lo = int.from_bytes(ser.read(), "little")
+        samples.append((hi << 8 | lo) - 32768)
+    return {}
+
+
+def block_capture(ser, deadline):
+    """capture.Capture writing both output files, as save_wav.py does."""
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = str(Path(tmp) / "bench.wav")
+        capture = Capture(ser, [WavSink(fname), NpySink(f"{fname}.npy")]).start()
+        while time.perf_counter() < deadline and not ser.exhausted:
+            time.sleep(0.01)
+        capture.stop()
+    return {"ring dropped": capture.dropped, "resyncs": capture.decoder.resyncs}
+
+
+def display_loop(ser, deadline, history=3 * (44100 // 2048)):
+    """The original display_yin.py read loop, without the drawing."""
+    f0 = np.zeros(history)
+    while time.perf_counter() < deadline and not ser.exhausted:
+        hibits = int.from_bytes(ser.read(), "little")
+        lobits = int.from_bytes(ser.read(), "little")
+        tau = hibits << 8 | lobits
+        f0 = np.roll(f0, -1)
+        f0[-1] = 44100 / (tau + 0.01)
+    return {}
+
+
+def tau_reader(ser, deadline):
+    """display_yin.TauReader filling its ring on a thread."""
+    reader = TauReader(ser, 3 * (44100 // 2048)).start()
+    while time.perf_counter() < deadline and not ser.exhausted:
+        time.sleep(0.01)
+    reader.stop()
+    return {"taus": reader.count, "realigned": reader.realigned}
+
+
+AUDIO_TOOLS = {"per-byte": per_byte, "capture": block_capture}
+TAU_TOOLS = {"display": display_loop, "reader": tau_reader}
+
+
+def run(name, tool, make_serial, seconds):
+    ser = make_serial()
+    start = time.perf_counter()
+    extra = tool(ser, start + seconds)
+    elapsed = time.perf_counter() - start
+    ser.close()
+
+    stats = {
+        "bytes/s": f"{ser.bytes_read / elapsed:,.0f}",
+        "offered/s": "max" if ser.byte_rate is None else f"{ser.byte_rate:,.0f}",
+        "dropped bytes": ser.dropped,
+        "dropped frames": ser.dropped_frames,
+    }
+    stats.update(extra)
+    print(f"{name:>10}: " + ", ".join(f"{k} {v}" for k, v in stats.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the capture tools against a loopback of the FPGA UART"
+    )
+    parser.add_argument("input", type=Path, help="WAV to stream, or a -windows.txt of taus")
+    parser.add_argument("--baud", type=int, help="1000000 for audio, 115200 for taus")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--buffer", type=int, default=4096, help="OS receive buffer bytes")
+    parser.add_argument(
+        "--rate", type=float, help="override offered bytes/s, 0 replays as fast as read"
+    )
+    parser.add_argument("--tools", nargs="+", help="subset of tools to run")
+    args = parser.parse_args()
+
+    if args.input.suffix == ".wav":
+        tools = AUDIO_TOOLS
+        baud = args.baud or 1_000_000
+
+        def make_serial():
+            return LoopbackSerial.from_wav(args.input, baud, buffer_size=args.buffer, timeout=0.1)
+
+    else:
+        tools = TAU_TOOLS
+        baud = args.baud or 115200
+
+        def make_serial():
+            return LoopbackSerial.from_windows(
+                args.input, baud, buffer_size=args.buffer, timeout=0.1
+            )
+
+    for name in args.tools or tools:
+        if name not in tools:
+            eprint(f"Unknown tool {name} for {args.input.name}, pick from {list(tools)}")
+            sys.exit(69)
+
+        def make():
+            ser = make_serial()
+            if args.rate is not None:
+                ser.byte_rate = args.rate or None
+            return ser
+
+        run(name, tools[name], make, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import searcher_model  # noqa: E402
+import top_level_model as model  # noqa: E402
+from bufferizer_model import RingPlayout  # noqa: E402
+from wav_source import WavSource  # noqa: E402
+
+STAGES = ("read", "yin", "searcher", "psola", "playout")
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def timed(stage, times, name):
+    """Pass stage through, adding the time spent producing each item to
+    times[name]. Time spent in upstream stages is not subtracted here."""
+    it = iter(stage)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            times[name] += time.perf_counter() - start
+            return
+        times[name] += time.perf_counter() - start
+        yield item
+
+
+def run(path, quantize, batch, out_dir):
+    source = WavSource(path, model.WINDOW_SIZE)
+    times = dict.fromkeys(STAGES, 0.0)
+    ring = RingPlayout()
+    hung = 0
+    dropped = 0
+
+    def count(blocks):
+        nonlocal hung, dropped
+        for block in blocks:
+            hung += int(np.count_nonzero(block.taus == 0))
+            dropped += sum(r.dropped for r in block.psola)
+            yield block
+
+    stage = timed(model.frames(model.wav_samples(source), batch=batch), times, "read")
+    stage = timed(model.track(stage), times, "yin")
+    stage = timed(model.snap(stage, quantize), times, "searcher")
+    stage = timed(count(model.overlap_add(stage)), times, "psola")
+    stage = timed(model.playout(stage, ring), times, "playout")
+
+    start = time.perf_counter()
+    words = np.concatenate(list(stage))
+    elapsed = time.perf_counter() - start
+
+    # Each timer includes everything upstream of it; peel those off
+    for i in reversed(range(1, len(STAGES))):
+        times[STAGES[i]] -= times[STAGES[i - 1]]
+
+    if out_dir:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with wave.open(str(out_dir / f"{path.stem}-autotuned.wav"), "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(source.sample_rate)
+            out.writeframes(model.to_pcm(words).tobytes())
+
+    audio = len(source) * model.WINDOW_SIZE / source.sample_rate
+    print(f"{path.name}: {audio:.1f}s of audio in {elapsed:.2f}s, "
+          f"real time factor {elapsed / audio:.3f} ({audio / elapsed:.0f}x real time)")
+    for name in STAGES:
+        print(f"  {name:9} {times[name]:7.3f}s {100 * times[name] / elapsed:5.1f}%")
+    print(f"  {len(source)} windows, {len(words)} words played, "
+          f"{ring.underruns} underrun reads, {ring.overruns} overrun reads")
+    if dropped:
+        print(f"  {dropped} psola writes past MAX_EXTENDED dropped")
+    if hung:
+        print(f"  {hung} windows with tau 0, which psola.sv never finishes")
+    return elapsed, audio
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream recordings through the top_level software model and time each stage"
+    )
+    parser.add_argument(
+        "wavs", type=Path, nargs="*", help="defaults to every test_data/*.wav"
+    )
+    parser.add_argument("--batch", type=int, default=model.BATCH, help="windows per block")
+    parser.add_argument("--out-dir", type=Path, help="write each autotuned output here")
+    parser.add_argument(
+        "--scale",
+        help=f"quantize to a scale instead of data/semitones.mem: {', '.join(searcher_model.SCALES)}",
+    )
+    parser.add_argument("--root", type=int, default=0, help="semitones above A")
+    args = parser.parse_args()
+
+    wavs = args.wavs or sorted((BASE_PATH / "test_data").glob("*.wav"))
+    if not wavs:
+        eprint("No wav files given or found in test_data")
+        sys.exit(69)
+
+    if args.scale:
+        quantize = searcher_model.Quantizer.from_scale(args.scale, args.root)
+    else:
+        quantize = searcher_model.Quantizer()
+
+    total = 0.0
+    audio = 0.0
+    for path in wavs:
+        elapsed, seconds = run(path, quantize, args.batch, args.out_dir)
+        total += elapsed
+        audio += seconds
+    if len(wavs) > 1:
+        print(f"total: {audio:.1f}s of audio in {total:.2f}s, real time factor {total / audio:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Block-read capture of the uart_turbo_transmit sample stream.
+
+A reader thread pulls whatever the port has in large reads into a
+preallocated ring, and a writer thread decodes completed chunks of hi/lo byte
+pairs and appends them to the output files, so neither blocks the other.
+"""
+
+import struct
+import threading
+import wave
+
+import numpy as np
+
+FS = 44100
+
+# Only realign when the other byte phase costs at most this fraction as much,
+# judged over at least RESYNC_MIN_RUN samples
+RESYNC_RATIO = 0.5
+RESYNC_MIN_RUN = 64
+
+
+class ByteRing:
+    """Preallocated single producer, single consumer byte ring."""
+
+    def __init__(self, size):
+        self.buf = np.zeros(size, dtype=np.uint8)
+        self.size = size
+        self.head = 0  # total bytes written
+        self.tail = 0  # total bytes read
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        with self.cond:
+            free = self.size - (self.head - self.tail)
+        if len(data) > free:
+            # Never block the serial reader, the OS buffer would overflow instead
+            self.dropped += len(data) - free
+            data = data[:free]
+
+        start = self.head % self.size
+        first = min(len(data), self.size - start)
+        self.buf[start : start + first] = data[:first]
+        self.buf[: len(data) - first] = data[first:]
+        with self.cond:
+            self.head += len(data)
+            self.cond.notify()
+
+    def read(self, n):
+        """Wait for n bytes (fewer once closed) and return a copy of them."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.head - self.tail >= n or self.closed)
+            n = min(n, self.head - self.tail)
+
+        start = self.tail % self.size
+        out = np.take(self.buf, np.arange(start, start + n), mode="wrap")
+        with self.cond:
+            self.tail += n
+        return out
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+
+class FrameDecoder:
+    """Turns hi/lo byte pairs into signed samples, realigning on dropped bytes.
+
+    The stream has no framing bits, so alignment is inferred from the audio:
+    read with the wrong byte phase, samples jump around wildly or sit near
+    the rails instead of around mid-scale. Each chunk is split where that
+    cost is lowest, dropping one byte there, when that is clearly better
+    than staying in the current phase.
+    """
+
+    def __init__(self):
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.resyncs = 0
+
+    @staticmethod
+    def pairs(data):
+        n = len(data) // 2
+        hi = data[0 : 2 * n : 2].astype(np.uint16)
+        lo = data[1 : 2 * n : 2].astype(np.uint16)
+        return (hi << 8) | lo
+
+    @staticmethod
+    def cost(x):
+        x = x.astype(np.int64)
+        return np.abs(np.diff(x, append=x[-1:])) + np.abs(x - 0x8000)
+
+    def decode(self, data):
+        data = np.concatenate([self.carry, data])
+        a = self.pairs(data)
+        b = self.pairs(data[1:])
+
+        if len(b) > RESYNC_MIN_RUN:
+            # keep phase a for samples before k, then phase b from k on. A
+            # drop too close to the end is left for the next chunk to find.
+            cost_a = np.cumsum(self.cost(a[: len(b)]))
+            before = np.concatenate([[0], cost_a[:-1]])
+            after = np.cumsum(self.cost(b)[::-1])[::-1]
+            k = int(np.argmin((before + after)[: len(b) - RESYNC_MIN_RUN]))
+            if after[k] < RESYNC_RATIO * (cost_a[-1] - before[k]):
+                self.resyncs += 1
+                data = np.delete(data, 2 * k)
+                a = self.pairs(data)
+
+        self.carry = data[2 * len(a) :]
+        return (a ^ 0x8000).view(np.int16)
+
+
+class WavSink:
+    def __init__(self, fname, fs=FS):
+        self.wf = wave.open(fname, "wb")
+        self.wf.setframerate(fs)
+        self.wf.setnchannels(1)
+        self.wf.setsampwidth(2)
+
+    def write(self, samples):
+        self.wf.writeframes(samples.astype("<i2").tobytes())
+
+    def close(self):
+        self.wf.close()
+
+
+class NpySink:
+    """int16 .npy file whose header is rewritten with the final length on close."""
+
+    HEADER_LEN = 128
+
+    def __init__(self, fname):
+        self.f = open(fname, "wb")
+        self.count = 0
+        self.f.write(self.header())
+
+    def header(self):
+        d = "{'descr': '<i2', 'fortran_order': False, 'shape': (%d,), }" % self.count
+        d = d.ljust(self.HEADER_LEN - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(d)) + d.encode()
+
+    def write(self, samples):
+        self.f.write(samples.astype("<i2").tobytes())
+        self.count += len(samples)
+
+    def close(self):
+        self.f.seek(0)
+        self.f.write(self.header())
+        self.f.close()
+
+
+class Capture:
+    """Reads a serial port on one thread and decodes/writes on another."""
+
+    def __init__(
+        self,
+        ser,
+        sinks,
+        limit=None,
+        block_size=4096,
+        chunk_samples=FS // 10,
+        ring_size=1 << 24,
+    ):
+        self.ser = ser
+        self.sinks = sinks
+        self.limit = limit
+        self.block_size = block_size
+        self.chunk_samples = chunk_samples
+        self.ring = ByteRing(ring_size)
+        self.decoder = FrameDecoder()
+
+        self.bytes_read = 0
+        self.samples_written = 0
+        self.running = False
+        self.done = threading.Event()
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.reader.start()
+        self.writer.start()
+        return self
+
+    def read_loop(self):
+        while self.running:
+            data = self.ser.read(max(self.block_size, self.ser.in_waiting))
+            if data:
+                self.ring.write(data)
+                self.bytes_read += len(data)
+        self.ring.close()
+
+    def write_loop(self):
+        while not self.done.is_set():
+            data = self.ring.read(2 * self.chunk_samples)
+            if len(data) == 0:
+                break
+            samples = self.decoder.decode(data)
+            if self.limit is not None:
+                samples = samples[: self.limit - self.samples_written]
+            for sink in self.sinks:
+                sink.write(samples)
+            self.samples_written += len(samples)
+            if self.limit is not None and self.samples_written >= self.limit:
+                self.done.set()
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """True once limit samples have been written or the stream ended."""
+        return self.done.wait(timeout)
+
+    def stop(self):
+        self.running = False
+        self.reader.join()
+        self.writer.join()
+        for sink in self.sinks:
+            sink.close()
+
+    @property
+    def dropped(self):
+        return self.ring.dropped
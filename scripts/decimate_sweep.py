@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import decimator_model  # noqa: E402
+from latency_model import CLOCK_HZ  # noqa: E402
+from searcher_model import Quantizer  # noqa: E402
+from top_level_model import SAMPLE_CYCLES, TAUMAX, WINDOW_SIZE  # noqa: E402
+from wav_source import WavSource  # noqa: E402
+
+FS = 44100
+MS = CLOCK_HZ / 1e3
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def reference_taus(wav, full_rate):
+    """taus from the <stem>-windows.txt next to wav, where unvoiced windows (0
+    or inf Hz) get tau 0, or yin.sv's own full rate taus without one."""
+    path = wav.with_name(f"{wav.stem}-windows.txt")
+    if not path.exists():
+        return full_rate, False
+    with np.errstate(divide="ignore"):
+        taus = np.rint(FS / np.atleast_1d(np.loadtxt(path, dtype=np.float64)))
+    taus = np.where(np.isfinite(taus), taus, 0).astype(np.int64)[: len(full_rate)]
+    return np.pad(taus, (0, len(full_rate) - len(taus))), True
+
+
+def cents(taus, reference):
+    """Pitch of taus above that of the reference taus (a longer period is lower)."""
+    return 1200 * np.log2(reference / taus)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Accuracy against work of yin.sv behind a decimate by N stage. Taus are scored against"
+        " each recording's -windows.txt contour, or yin.sv at full rate without one"
+    )
+    parser.add_argument("wavs", nargs="*", type=Path, default=sorted((BASE_PATH / "test_data").glob("*.wav")))
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--order", type=int, default=3, help="CIC stages")
+    parser.add_argument("--seconds", type=float, help="of each recording to track [default: all]")
+    args = parser.parse_args()
+
+    missing = [w for w in args.wavs if not w.exists()]
+    if missing or not args.wavs:
+        eprint(f"No such file: {missing[0]}" if missing else "No WAV files given")
+        sys.exit(69)
+    bad = [f for f in args.factors if f < 1 or f & (f - 1) or f > WINDOW_SIZE // 4]
+    if bad:
+        eprint(f"--factors must be powers of two up to {WINDOW_SIZE // 4}, got {bad[0]}")
+        sys.exit(69)
+
+    recordings = []
+    for wav in args.wavs:
+        samples = WavSource(wav).samples
+        if args.seconds is not None:
+            samples = samples[: int(args.seconds * FS)]
+        recordings.append(samples.view(np.uint16) ^ 0x8000)
+    quantize = Quantizer()
+    reference = []
+    contours = 0
+    for wav, samples in zip(args.wavs, recordings):
+        taus, contour = reference_taus(wav, decimator_model.yin(samples, 1, args.order, WINDOW_SIZE, TAUMAX).taus)
+        reference.append(taus)
+        contours += contour
+    ref = np.concatenate(reference)
+    print(
+        f"{len(ref)} windows from {len(recordings)} files, {contours} scored against their -windows.txt"
+        f" and the rest against full rate yin.sv; CIC order {args.order}"
+    )
+    print(
+        f"{'N':>3} {'same note':>10} {'<50c':>7} {'octave':>7} {'median c':>9} {'pairs/smp':>10}"
+        f" {'cyc/smp':>8} {'sample kb':>10} {'diff kb':>8} {'latency ms':>11} {'model s':>8}"
+    )
+
+    for factor in args.factors:
+        start = time.perf_counter()
+        taus = [decimator_model.yin(s, factor, args.order, WINDOW_SIZE, TAUMAX).taus for s in recordings]
+        elapsed = time.perf_counter() - start
+        taus = np.concatenate(taus)
+
+        # tau 0 is silence, with no pitch to compare
+        voiced = (taus > 0) & (ref > 0)
+        off = cents(taus[voiced], ref[voiced])
+        close = np.abs(off) < 50
+        octave = np.abs(np.abs(off) - 1200) < 50
+        same = quantize(taus[voiced]) == quantize(ref[voiced])
+        cost = decimator_model.cost(factor, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX)
+        print(
+            f"{factor:3} {same.mean():10.1%} {close.mean():7.1%} {octave.mean():7.1%}"
+            f" {np.median(np.abs(off[close])) if close.any() else np.nan:9.2f} {cost.pairs:10.0f}"
+            f" {cost.pass_cycles:8.1f} {cost.sample_bits / 1024:10.0f} {cost.diff_bits / 1024:8.0f}"
+            f" {cost.timing.latency / MS:11.3f} {elapsed:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
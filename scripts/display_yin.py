@@ -3,6 +3,8 @@
 # https://stackoverflow.com/questions/40126176/fast-live-plotting-in-matplotlib-pyplot
 # at all
 import sys
+import threading
+import time
 
 import numpy as np
 import serial
@@ -13,27 +15,86 @@ def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
-eprint("README!!! If the script is not working, make sure your serial port is correct")
-eprint("README!!! Also make sure your baud rate is correct w.r.t the FPGA")
-eprint("README!!! Also read the high bits")
-eprint("README!!! Aight I'm out")
-
 SERIAL_PORT_NAME = "/dev/cu.usbserial-8874292302131"
-WINDOWS_PER_SECOND = 44100 // 2048
+FS = 44100
+WINDOWS_PER_SECOND = FS // 2048
 SECONDS = 3
-
-ser = serial.Serial(SERIAL_PORT_NAME, bytesize=serial.EIGHTBITS, baudrate=115200)
-eprint("Serial port initialized")
-
-
-def live_update_demo(blit=False):
+FRAME_RATE = 30
+TAU_BITS = 11
+
+
+class TauReader:
+    """Reads hi/lo tau pairs on a thread into a preallocated circular buffer.
+
+    Only the newest len(buf) taus are kept; the reader never waits on the
+    display, so a slow frame just means more new taus on the next one.
+    """
+
+    def __init__(self, ser, history, block_size=256):
+        self.ser = ser
+        self.block_size = block_size
+        self.buf = np.zeros(history, dtype=np.uint16)
+        self.count = 0  # total taus received, buf[count % history] is next
+        self.realigned = 0
+        self.carry = b""
+        self.running = False
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def decode(self, data):
+        data = np.frombuffer(self.carry + data, dtype=np.uint8)
+        # taus fit in TAU_BITS, so a "high" byte above that is really a low
+        # byte left over from a dropped one
+        while True:
+            bad = np.flatnonzero(data[0 : len(data) - 1 : 2] >> (TAU_BITS - 8))
+            if len(bad) == 0:
+                break
+            data = np.delete(data, 2 * bad[0])
+            self.realigned += 1
+        n = len(data) // 2
+        self.carry = data[2 * n :].tobytes()
+        return (data[0 : 2 * n : 2].astype(np.uint16) << 8) | data[1 : 2 * n : 2]
+
+    def push(self, taus):
+        size = len(self.buf)
+        taus = taus[-size:]
+        start = self.count % size
+        first = min(len(taus), size - start)
+        self.buf[start : start + first] = taus[:first]
+        self.buf[: len(taus) - first] = taus[first:]
+        self.count += len(taus)
+
+    def read_loop(self):
+        while self.running:
+            data = self.ser.read(max(2, min(self.block_size, self.ser.in_waiting)))
+            if data:
+                self.push(self.decode(data))
+
+    def latest(self):
+        """Taus in arrival order, oldest first, and the total count so far."""
+        count = self.count
+        size = len(self.buf)
+        return np.take(self.buf, np.arange(count, count + size), mode="wrap"), count
+
+
+def live_update_demo(reader, blit=True):
     x = np.linspace(1, WINDOWS_PER_SECOND * SECONDS, WINDOWS_PER_SECOND * SECONDS)
-    f0 = np.zeros(len(x))
     fig = plt.figure()
     plt.get_current_fig_manager().full_screen_toggle()
     ax = plt.gca()
 
-    (line,) = ax.plot([])
+    (line,) = ax.plot([], animated=blit)
+    readout = ax.text(
+        0.01, 0.98, "", transform=ax.transAxes, va="top", family="monospace", animated=blit
+    )
 
     ax.set_xlim(x.min(), x.max())
     ax.set_ylim([0, 1500])
@@ -46,22 +107,30 @@ def live_update_demo(blit=False):
 
     plt.show(block=False)
 
-    while True:
-        # TODO: update y
-        hibits = int.from_bytes(ser.read(), "little")
-        lobits = int.from_bytes(ser.read(), "little")
-        tau = hibits * 255 + lobits
-        tone = 44100 / (tau + 0.01)
-        f0 = np.roll(f0, -1)
-        f0[-1] = tone
-        print(f"{tau=} {tone=}")
-        line.set_data(x, f0)
+    frames = 0
+    last_time, last_count, last_frames = time.perf_counter(), reader.count, 0
+    next_frame = last_time
+    while plt.fignum_exists(fig.number):
+        now = time.perf_counter()
+        if now - last_time >= 1:
+            ingest = (reader.count - last_count) / (now - last_time)
+            render = (frames - last_frames) / (now - last_time)
+            behind = "  FALLING BEHIND" if ingest < WINDOWS_PER_SECOND else ""
+            readout.set_text(
+                f"ingest {ingest:5.1f} taus/s (hardware {WINDOWS_PER_SECOND}/s)\n"
+                f"render {render:5.1f} fps (target {FRAME_RATE}){behind}"
+            )
+            last_time, last_count, last_frames = now, reader.count, frames
+
+        taus, count = reader.latest()
+        line.set_data(x, FS / (taus + 0.01))
         if blit:
             # restore background
             fig.canvas.restore_region(ax2background)
 
             # redraw just the points
             ax.draw_artist(line)
+            ax.draw_artist(readout)
 
             # fill in the axes rectangle
             fig.canvas.blit(ax.bbox)
@@ -75,13 +144,39 @@ def live_update_demo(blit=False):
             fig.canvas.draw()
 
         fig.canvas.flush_events()
-        # alternatively you could use
-        # plt.pause(0.000000000001)
-        # however plt.pause calls canvas.draw(), as can be read here:
-        # http://bastibe.de/2013-05-30-speeding-up-matplotlib.html
-
-        if not plt.fignum_exists(fig.number):
-            break
-
-
-live_update_demo(True)
+        frames += 1
+
+        # Fixed frame rate, skipping frames rather than queueing them up
+        next_frame = max(next_frame + 1 / FRAME_RATE, time.perf_counter())
+        time.sleep(max(0, next_frame - time.perf_counter()))
+
+
+def main():
+    eprint("README!!! If the script is not working, make sure your serial port is correct")
+    eprint("README!!! Also make sure your baud rate is correct w.r.t the FPGA")
+    eprint("README!!! Optional argument is a port name, or a -windows.txt to replay")
+    eprint("README!!! Aight I'm out")
+
+    source = sys.argv[1] if len(sys.argv) == 2 else SERIAL_PORT_NAME
+    if source.endswith(".txt"):
+        from loopback_serial import LoopbackSerial
+
+        ser = LoopbackSerial.from_windows(source, 115200, timeout=0.1)
+    else:
+        ser = serial.Serial(
+            source, bytesize=serial.EIGHTBITS, baudrate=115200, timeout=0.1
+        )
+    eprint("Serial port initialized")
+
+    reader = TauReader(ser, WINDOWS_PER_SECOND * SECONDS).start()
+    try:
+        live_update_demo(reader, True)
+    finally:
+        reader.stop()
+        ser.close()
+    if reader.realigned:
+        eprint(f"Realigned the tau stream {reader.realigned} times")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import latency_model  # noqa: E402
+import searcher_model  # noqa: E402
+from bufferizer_model import MAX_EXTENDED, SAMP_PLAY_DURATION  # noqa: E402
+from top_level_model import WINDOW_SIZE  # noqa: E402
+
+MS = latency_model.CLOCK_HZ / 1e3
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def run_rtl(window, offset, decimate):
+    """Run sim/test_latency.py for the same click and return its RTL budget."""
+    sim = os.getenv("SIM", "icarus")
+    env = dict(os.environ, CLICK_WINDOW=str(window), CLICK_OFFSET=str(offset), DECIMATE=str(decimate))
+    path = BASE_PATH / "sim_build" / f"test_latency-{sim}" / "latency.json"
+    path.unlink(missing_ok=True)
+    proc = subprocess.run([sys.executable, str(BASE_PATH / "sim" / "test_latency.py")], env=env)
+    # Written once every timestamp is in, so the diff column shows where a
+    # run that disagrees with the model is off
+    if not path.exists():
+        eprint(f"test_latency failed on {sim}")
+        sys.exit(1)
+    if proc.returncode:
+        eprint(f"test_latency failed on {sim}, the RTL is off the model")
+    with open(path) as f:
+        return latency_model.Budget(**json.load(f)["rtl"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Latency budget from the I2S input to the speaker and UART, stage by stage"
+    )
+    parser.add_argument("--window", type=int, default=1, help="window the click is in")
+    parser.add_argument(
+        "--offset", type=int, default=WINDOW_SIZE // 2, help="samples into the window"
+    )
+    parser.add_argument(
+        "--offsets",
+        type=int,
+        metavar="N",
+        help="also sweep N click offsets across the window for the best and worst case",
+    )
+    parser.add_argument("--max-extended", type=int, default=MAX_EXTENDED)
+    parser.add_argument("--play-duration", type=int, default=SAMP_PLAY_DURATION)
+    parser.add_argument("--scale", help=f"one of {', '.join(searcher_model.SCALES)}")
+    parser.add_argument("--root", type=int, default=0, help="semitones above A")
+    parser.add_argument("--decimate", type=int, default=1, help="top_level's DECIMATE")
+    parser.add_argument(
+        "--rtl", action="store_true", help="measure the same click in a top_level simulation"
+    )
+    args = parser.parse_args()
+
+    if not 0 <= args.offset < WINDOW_SIZE:
+        eprint(f"--offset must be below {WINDOW_SIZE}")
+        sys.exit(69)
+    if args.decimate < 1 or args.decimate & (args.decimate - 1) or args.decimate > WINDOW_SIZE // 4:
+        eprint(f"--decimate must be a power of two up to {WINDOW_SIZE // 4}")
+        sys.exit(69)
+    if args.rtl and (args.max_extended, args.play_duration) != (MAX_EXTENDED, SAMP_PLAY_DURATION):
+        eprint("--rtl simulates top_level as it is, so it can't take other settings")
+        sys.exit(69)
+
+    kwargs = {
+        "max_extended": args.max_extended,
+        "samp_play_duration": args.play_duration,
+        "decimate": args.decimate,
+    }
+    if args.scale:
+        kwargs["quantize"] = searcher_model.Quantizer.from_scale(args.scale, args.root)
+    click = args.window * WINDOW_SIZE + args.offset
+    model = latency_model.click_budget(click, **kwargs)
+    rtl = run_rtl(args.window, args.offset, args.decimate) if args.rtl else None
+
+    print(f"click at sample {click} (window {args.window}, offset {args.offset})")
+    header = f"{'stage':8} {'cycles':>10} {'ms':>8}"
+    if rtl:
+        header += f" {'rtl':>10} {'diff':>8}"
+    print(header)
+    for k, stage in enumerate(latency_model.STAGES + ("total",)):
+        cycles = model.total if stage == "total" else model[k]
+        line = f"{stage:8} {cycles:10} {cycles / MS:8.3f}"
+        if rtl:
+            measured = rtl.total if stage == "total" else rtl[k]
+            line += f" {measured:10} {measured - cycles:8}"
+        print(line)
+
+    if args.offsets:
+        offsets = np.linspace(0, WINDOW_SIZE - latency_model.CLICK_LEN, args.offsets).astype(int)
+        budgets = np.array(
+            [latency_model.click_budget(args.window * WINDOW_SIZE + o, **kwargs) for o in offsets]
+        )
+        totals = budgets.sum(axis=1)
+        print(f"\nover {len(offsets)} offsets in window {args.window} (ms)")
+        print(f"{'stage':8} {'min':>8} {'mean':>8} {'max':>8}")
+        for k, stage in enumerate(latency_model.STAGES):
+            col = budgets[:, k] / MS
+            print(f"{stage:8} {col.min():8.3f} {col.mean():8.3f} {col.max():8.3f}")
+        print(f"{'total':8} {totals.min() / MS:8.3f} {totals.mean() / MS:8.3f} {totals.max() / MS:8.3f}")
+        worst = offsets[totals.argmax()]
+        print(f"worst at offset {worst}")
+
+
+if __name__ == "__main__":
+    main()
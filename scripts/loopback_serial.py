@@ -0,0 +1,147 @@
+"""Stand-in for serial.Serial that replays what the FPGA would send.
+
+Bytes arrive at the rate the UART can carry them (10 bits per byte at the
+configured baud, never faster than the source produces data) into a bounded
+receive buffer like the OS driver's. Anything arriving while that buffer is
+full is dropped and counted, which is how a slow reader loses data on the
+real port.
+"""
+
+import math
+import threading
+import time
+import wave
+
+import numpy as np
+
+FS = 44100
+WINDOW_SIZE = 2048
+BITS_PER_BYTE = 10  # start + 8 data + stop, see uart_transmit.sv
+
+
+def frame(values, turbo=True):
+    """Byte stream for 16-bit values: hi then lo like uart_turbo_transmit.sv,
+    or just the low byte like a bare uart_transmit.sv."""
+    values = np.asarray(values, dtype=np.uint16)
+    if not turbo:
+        return (values & 0xFF).astype(np.uint8).tobytes()
+    out = np.empty(2 * len(values), dtype=np.uint8)
+    out[0::2] = values >> 8
+    out[1::2] = values & 0xFF
+    return out.tobytes()
+
+
+class LoopbackSerial:
+    """Implements the parts of serial.Serial the capture scripts use."""
+
+    def __init__(self, payload, byte_rate=None, buffer_size=4096, timeout=None, frame_size=2):
+        self.payload = bytes(payload)
+        self.byte_rate = byte_rate  # None replays as fast as it is read
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+        self.frame_size = frame_size
+
+        self.buffer = bytearray()
+        self.arrived = 0
+        self.dropped = 0
+        self.bytes_read = 0
+        self.start = time.perf_counter()
+        self.is_open = True
+        # Capture reads on its own thread while the caller polls exhausted
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_wav(cls, path, baudrate=1_000_000, turbo=True, **kwargs):
+        """Audio samples as bufferizer -> uart_turbo_transmit sends them."""
+        with wave.open(str(path)) as wf:
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+            samples = samples[:: wf.getnchannels()]
+        return cls.from_values(
+            samples.view(np.uint16) ^ 0x8000, FS, baudrate, turbo, **kwargs
+        )
+
+    @classmethod
+    def from_windows(cls, path, baudrate=115200, turbo=True, **kwargs):
+        """One tau per window, as the YIN display build sends them."""
+        with open(path) as f:
+            taus = [round(FS / float(line)) for line in f]
+        return cls.from_values(taus, FS / WINDOW_SIZE, baudrate, turbo, **kwargs)
+
+    @classmethod
+    def from_values(cls, values, rate, baudrate, turbo=True, **kwargs):
+        frame_size = 2 if turbo else 1
+        frame_time = frame_size * BITS_PER_BYTE / baudrate
+        # The transmitter ignores triggers while busy, so a slow link skips values
+        skip = max(1, math.ceil(frame_time * rate - 1e-9))
+        payload = frame(np.asarray(values)[::skip], turbo)
+        byte_rate = min(rate / skip * frame_size, baudrate / BITS_PER_BYTE)
+        return cls(payload, byte_rate, frame_size=frame_size, **kwargs)
+
+    def update(self):
+        """Move what has arrived since the last call into the buffer. Call
+        with the lock held."""
+        if self.byte_rate is None:
+            produced = min(len(self.payload), self.arrived + self.buffer_size - len(self.buffer))
+        else:
+            elapsed = time.perf_counter() - self.start
+            produced = min(len(self.payload), int(elapsed * self.byte_rate))
+
+        new = produced - self.arrived
+        if new > 0:
+            take = min(new, self.buffer_size - len(self.buffer))
+            self.buffer += self.payload[self.arrived : self.arrived + take]
+            self.dropped += new - take
+            self.arrived = produced
+
+    @property
+    def exhausted(self):
+        """Everything has been sent and read (or dropped)."""
+        with self.lock:
+            self.update()
+            return self.arrived == len(self.payload) and not self.buffer
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            self.update()
+            return len(self.buffer)
+
+    @property
+    def dropped_frames(self):
+        return math.ceil(self.dropped / self.frame_size)
+
+    def read(self, size=1):
+        """Like serial.Serial.read, except it returns early at end of stream."""
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        out = bytearray()
+        while True:
+            with self.lock:
+                self.update()
+                take = min(size - len(out), len(self.buffer))
+                out += self.buffer[:take]
+                del self.buffer[:take]
+                done = self.arrived == len(self.payload) and not self.buffer
+            if len(out) == size or done:
+                break
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+
+            if self.byte_rate is not None:
+                # A blocked read drains the driver buffer as bytes arrive
+                wait = min(size - len(out), self.buffer_size // 2) / self.byte_rate
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                if wait > 1e-4:
+                    time.sleep(wait)
+
+        self.bytes_read += len(out)
+        return bytes(out)
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.update()
+            self.buffer.clear()
+
+    def close(self):
+        self.is_open = False
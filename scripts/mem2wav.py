@@ -6,26 +6,73 @@ import wave
 
 import numpy as np
 
+CHUNK_BYTES = 1 << 20
+
+HEX_DIGITS = np.full(256, -1, dtype=np.int8)
+for i, c in enumerate(b"0123456789abcdef"):
+    HEX_DIGITS[c] = i
+    HEX_DIGITS[ord(chr(c).upper())] = i
+
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(b" \t\r\v\f")] = True
+
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+def parse_hex(buf):
+    """Parse newline-terminated hex lines, skipping blank ones."""
+    chars = np.frombuffer(buf, dtype=np.uint8)
+    chars = chars[~WHITESPACE[chars]]  # same as line.strip()
+    newline = chars == ord("\n")
+    digits = HEX_DIGITS[chars]
+    if np.any((digits < 0) & ~newline):
+        raise ValueError("invalid hex digit in input")
+
+    # Lines are short, so walk all of them one digit column at a time
+    ends = np.flatnonzero(newline)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    values = np.zeros(len(ends), dtype=np.int64)
+    for k in range(lengths.max(initial=0)):
+        live = lengths > k
+        values[live] = (values[live] << 4) | digits[starts[live] + k]
+    return values[lengths > 0]
+
+
+def read_mem(f):
+    rest = b""
+    while chunk := f.read(CHUNK_BYTES):
+        chunk = rest + chunk
+        cut = chunk.rfind(b"\n") + 1
+        rest = chunk[cut:]
+        yield parse_hex(chunk[:cut])
+    if rest:
+        yield parse_hex(rest + b"\n")
+
+
+def read_bin(f):
+    while chunk := f.read(CHUNK_BYTES):
+        yield np.frombuffer(chunk, dtype="<u2")
+
+
 if len(sys.argv) != 3:
     eprint("Please provide input and output filenames")
+    eprint("Input ending in .bin is read as raw little-endian uint16")
     sys.exit(69)
 
 input = sys.argv[1]
 output = sys.argv[2]
+reader = read_bin if input.endswith(".bin") else read_mem
 
-samples = []
-with open(input, "rb") as f:
-    for line in f.readlines():
-        samples.append(int(line.strip(), base=16) ^ 0x8000)
-
-with wave.open(output, "wb") as wf:
+with open(input, "rb") as f, wave.open(output, "wb") as wf:
     wf.setframerate(44100)
     wf.setnchannels(1)
     wf.setsampwidth(2)
-    samples = np.array(samples, dtype=np.uint16).view(dtype=np.int16).tobytes()
-    wf.writeframes(samples)
+    for samples in reader(f):
+        if np.any(samples > 0xFFFF):
+            eprint("Sample does not fit in 16 bits")
+            sys.exit(69)
+        samples = (samples.astype(np.uint16) ^ 0x8000).astype("<u2")
+        wf.writeframes(samples.tobytes())
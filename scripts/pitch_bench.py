@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import decimator_model  # noqa: E402
+import pitch_corpus  # noqa: E402
+import yin_model  # noqa: E402
+from top_level_model import SAMPLE_CYCLES, TAUMAX, WINDOW_SIZE  # noqa: E402
+from wav_source import WavSource  # noqa: E402
+
+FS = 44100
+CORPUS_PATH = BASE_PATH / "sim_build" / "pitch_corpus"
+YIN_RS_PATH = BASE_PATH / "yin-rs" / "target" / "release" / "yin-rs"
+
+# A voiced window more than this far off in f0 is a gross pitch error
+GROSS = 0.2
+# and an octave error if it is within a semitone of a whole number of
+# octaves off
+OCTAVE_CENTS = 100
+
+# Fewest cycles a sample that test_yin_sliding's block mode keeps up with
+RTL_SAMPLE_CYCLES = WINDOW_SIZE // 2 + 16
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+class Run(NamedTuple):
+    taus: list  # per recording, one per window
+    seconds: float
+    cycles: Optional[int] = None  # yin.sv busy cycles per window
+
+
+class Score(NamedTuple):
+    windows: int
+    gpe: float  # of voiced windows
+    octave: float  # of voiced windows
+    fine_cents: float  # mean error of the voiced windows without a gross error
+    false_voiced: float  # unvoiced windows given a tau
+
+
+def score(taus, f0):
+    n = min(len(taus), len(f0))
+    taus, f0 = np.asarray(taus[:n], dtype=np.float64), f0[:n]
+    voiced = f0 > 0
+    with np.errstate(divide="ignore"):
+        est = np.where(taus > 0, FS / taus, 0)[voiced]
+        off = 1200 * np.log2(est / f0[voiced])
+    gross = ~(np.abs(est / f0[voiced] - 1) <= GROSS)
+    octaves = np.rint(off / 1200)
+    octave = (octaves != 0) & (np.abs(off - 1200 * octaves) < OCTAVE_CENTS)
+    return Score(
+        windows=n,
+        gpe=gross.mean() if voiced.any() else np.nan,
+        octave=octave.mean() if voiced.any() else np.nan,
+        fine_cents=np.abs(off[~gross]).mean() if (~gross).any() else np.nan,
+        false_voiced=(taus[~voiced] > 0).mean() if (~voiced).any() else np.nan,
+    )
+
+
+def windows_of(samples):
+    n = len(samples) // WINDOW_SIZE
+    return samples[: n * WINDOW_SIZE].reshape(n, WINDOW_SIZE)
+
+
+def run_model(recordings, track, cycles=None):
+    start = time.perf_counter()
+    taus = [track(samples) for samples in recordings]
+    return Run(taus, time.perf_counter() - start, cycles)
+
+
+def run_yin_rs(binary, wavs):
+    """Every recording through one yin-rs run, binary taus into a scratch
+    directory."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        command = [
+            str(binary),
+            f"--window-size={WINDOW_SIZE}",
+            f"--taumax={TAUMAX}",
+            f"--out-dir={out_dir}",
+            "--format=binary",
+            *map(str, wavs),
+        ]
+        start = time.perf_counter()
+        subprocess.run(command, check=True)
+        seconds = time.perf_counter() - start
+        taus = [np.fromfile(Path(out_dir) / f"{w.stem}-taus.bin", dtype="<u2").astype(np.int64) for w in wavs]
+    return Run(taus, seconds)
+
+
+def run_rtl(wavs, windows):
+    """The first windows of each recording through yin.sv with
+    test_yin_sliding in block mode. The bench checks every tau against the
+    model; the last window has no next sample to start its CMNDF pass."""
+    sys.path.append(str(BASE_PATH / "sim"))
+    import bench
+    import regress
+
+    sim = os.getenv("SIM", "icarus")
+    taus = []
+    for wav in wavs:
+        env = regress.bench_env(sim)
+        env.update(
+            AUDIO=str(wav),
+            WINDOW_SIZE=str(WINDOW_SIZE),
+            HOP=str(WINDOW_SIZE),
+            SAMPLE_CYCLES=str(RTL_SAMPLE_CYCLES),
+            NUM_WINDOWS=str(windows + 1),
+        )
+        result = regress.run_bench("test_yin_sliding", sim, env)
+        if result["returncode"]:
+            log = bench.build_dir("test_yin_sliding", sim) / "regress.log"
+            raise RuntimeError(f"test_yin_sliding failed on {wav}, see {log}")
+        taus.append(bench.load_outputs("test_yin_sliding", sim)["taumin"].astype(np.int64))
+    # How fast the simulator goes says nothing about the RTL
+    timing = yin_model.hop_timing(WINDOW_SIZE, RTL_SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX)
+    return Run(taus, 0.0, timing.hop_busy)
+
+
+def percent(value):
+    return "-" if np.isnan(value) else f"{value:.1%}"
+
+
+def report(name, run, wavs, labels):
+    windows = sum(len(t) for t in run.taus)
+    rate = f"{windows / run.seconds:.0f}" if run.seconds else "-"
+    cycles = "-" if run.cycles is None else f"{run.cycles}"
+    rows = [(wav.stem, score(taus, f0)) for wav, taus, f0 in zip(wavs, run.taus, labels)]
+    # The RTL only runs the first few windows of each recording
+    f0 = np.concatenate([f[: len(t)] for f, t in zip(labels, run.taus)])
+    rows.append(("all", score(np.concatenate(run.taus), f0)))
+    for signal, s in rows:
+        fine = "-" if np.isnan(s.fine_cents) else f"{s.fine_cents:.1f}"
+        print(
+            f"{name:>12} {signal:>10} {s.windows:8} {percent(s.gpe):>7} {percent(s.octave):>7}"
+            f" {fine:>7} {percent(s.false_voiced):>9} {rate:>9} {cycles:>9}"
+        )
+        name = ""
+    return rows[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gross pitch error, octave errors and throughput of each YIN implementation"
+        " on signals with a known f0"
+    )
+    parser.add_argument(
+        "wavs",
+        nargs="*",
+        type=Path,
+        help="recordings with an f0 per window in <stem>-windows.txt [default: generate the synthetic corpus]",
+    )
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH, help="where to generate the corpus")
+    parser.add_argument("--classes", nargs="+", default=list(pitch_corpus.CLASSES), choices=pitch_corpus.CLASSES)
+    parser.add_argument("--signals", type=int, default=8, help="starting notes per class")
+    parser.add_argument("--windows", type=int, default=16, help="per signal")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--factors", type=int, nargs="*", default=[2, 4], help="also run yin.sv decimated by these")
+    parser.add_argument("--yin-rs", type=Path, help=f"yin-rs binary [default: {YIN_RS_PATH.relative_to(BASE_PATH)}]")
+    parser.add_argument(
+        "--rtl",
+        type=int,
+        metavar="WINDOWS",
+        help="also simulate this many windows of each recording through yin.sv, a few minutes a window",
+    )
+    parser.add_argument("--max-gpe", type=float, help="exit 1 if any implementation's overall GPE is above this")
+    args = parser.parse_args()
+
+    bad = [f for f in args.factors if f < 2 or f & (f - 1) or f > WINDOW_SIZE // 4]
+    if bad:
+        eprint(f"--factors must be powers of two from 2 to {WINDOW_SIZE // 4}, got {bad[0]}")
+        sys.exit(69)
+    if args.yin_rs is not None and not args.yin_rs.exists():
+        eprint(f"No such file: {args.yin_rs}")
+        sys.exit(69)
+
+    if args.wavs:
+        wavs = args.wavs
+        unlabelled = [w for w in wavs if not w.with_name(f"{w.stem}-windows.txt").exists()]
+        if unlabelled:
+            eprint(f"No {unlabelled[0].stem}-windows.txt next to {unlabelled[0]}")
+            sys.exit(69)
+    else:
+        start = time.perf_counter()
+        wavs = pitch_corpus.write(
+            args.corpus, args.classes, signals=args.signals, windows=args.windows, seed=args.seed
+        )
+        print(f"Generated {len(wavs)} classes into {args.corpus} in {time.perf_counter() - start:.1f}s")
+
+    recordings = [WavSource(w, WINDOW_SIZE).samples.view(np.uint16) ^ 0x8000 for w in wavs]
+    labels = [pitch_corpus.labels(w) for w in wavs]
+
+    runs = {
+        "yin.sv model": run_model(
+            recordings,
+            lambda s: yin_model.yin(windows_of(s), TAUMAX).taumin[:, -1].astype(np.int64),
+            yin_model.hop_timing(WINDOW_SIZE, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX).hop_busy,
+        ),
+        "float yin": run_model(recordings, lambda s: yin_model.reference_tau(windows_of(s), TAUMAX)),
+    }
+    for factor in args.factors:
+        runs[f"decimate {factor}"] = run_model(
+            recordings,
+            lambda s: decimator_model.yin(s, factor, window_size=WINDOW_SIZE, taumax=TAUMAX).taus,
+            decimator_model.cost(factor, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX).timing.hop_busy,
+        )
+    binary = args.yin_rs or YIN_RS_PATH
+    if binary.exists():
+        runs["yin-rs"] = run_yin_rs(binary, wavs)
+    else:
+        eprint(f"Skipping yin-rs, build it with cargo build --release in {YIN_RS_PATH.parents[2]}")
+    if args.rtl:
+        runs["yin.sv rtl"] = run_rtl(wavs, args.rtl)
+
+    print(
+        f"{'':>12} {'signal':>10} {'windows':>8} {'GPE':>7} {'octave':>7} {'cents':>7}"
+        f" {'unvoiced':>9} {'windows/s':>9} {'cyc/win':>9}"
+    )
+    overall = {name: report(name, run, wavs, labels) for name, run in runs.items()}
+
+    if args.max_gpe is not None:
+        over = [name for name, s in overall.items() if s.gpe > args.max_gpe]
+        if over:
+            eprint(f"GPE above {args.max_gpe:.1%} for {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
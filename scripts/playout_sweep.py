@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import playout_model  # noqa: E402
+import searcher_model  # noqa: E402
+from bufferizer_model import MAX_EXTENDED, SAMP_PLAY_DURATION, RingPlayout  # noqa: E402
+
+FS = 44100
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def load_taus(path):
+    """taus from a -windows.txt, where unvoiced windows (0 or inf Hz) get tau
+    0, or straight from yin-rs's -taus.txt or --format binary -taus.bin."""
+    if path.suffix == ".bin":
+        return np.fromfile(path, dtype="<u2").astype(np.int64)
+    if path.name.endswith("-taus.txt"):
+        return np.atleast_1d(np.loadtxt(path, dtype=np.int64, usecols=0))
+    with np.errstate(divide="ignore"):
+        taus = np.rint(FS / np.atleast_1d(np.loadtxt(path, dtype=np.float64)))
+    return np.where(np.isfinite(taus), taus, 0).astype(np.int64)
+
+
+def check(result, max_extended, samp_play_duration):
+    """Underruns from the word-level RingPlayout over the same windows."""
+    ring = RingPlayout(max_extended, samp_play_duration)
+    for length, start in zip(result.length, result.start):
+        if length:
+            ring.write(int(start), np.arange(length))
+    if len(result.start):
+        ring.read_until(int(result.start[-1]) + 1)
+    return ring.underruns
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep bufferizer playout settings over pitch contours and report underruns and overruns"
+    )
+    parser.add_argument(
+        "contours", nargs="+", type=Path, help="-windows.txt or yin-rs -taus files, one pitch per window"
+    )
+    parser.add_argument("--max-extended", type=int, nargs="+", default=[MAX_EXTENDED])
+    parser.add_argument("--play-duration", type=int, nargs="+", default=[SAMP_PLAY_DURATION])
+    parser.add_argument("--rom", type=Path, default=searcher_model.ROM_PATH)
+    parser.add_argument(
+        "--scale",
+        help=f"generate the ROM for a scale instead: {', '.join(searcher_model.SCALES)}",
+    )
+    parser.add_argument("--root", type=int, default=0, help="semitones above A")
+    parser.add_argument("--csv", type=Path, help="write every window of the first setting here")
+    parser.add_argument(
+        "--check", action="store_true", help="compare underruns with the word-level ring model"
+    )
+    args = parser.parse_args()
+
+    missing = [p for p in args.contours if not p.exists()]
+    if missing:
+        eprint(f"No such file: {missing[0]}")
+        sys.exit(69)
+
+    if args.scale:
+        quantize = searcher_model.Quantizer.from_scale(args.scale, args.root)
+    else:
+        quantize = searcher_model.Quantizer(searcher_model.load_rom(args.rom))
+    contours = [load_taus(p) for p in args.contours]
+    taus = np.concatenate(contours)
+    bounds = np.cumsum([0] + [len(t) for t in contours])
+    total = len(taus)
+    hung = sum(int(np.count_nonzero(t == 0)) for t in contours)
+    print(f"{len(contours)} contours, {total} windows")
+    if hung:
+        print(f"{hung} windows with tau 0, which psola.sv never finishes, modelled as no output")
+
+    print(
+        f"{'max_ext':>7} {'duration':>8} {'underrun':>9} {'reads':>9} {'overrun':>8}"
+        f" {'min slack':>10} {'windows/s':>10}"
+    )
+    rows = None
+    mismatched = 0
+    for max_extended in args.max_extended:
+        table = playout_model.extent_table(quantize, max_extended)
+        for duration in args.play_duration:
+            start = time.perf_counter()
+            result = playout_model.playout(
+                taus, table, max_extended, duration, contours=[len(t) for t in contours]
+            )
+            elapsed = time.perf_counter() - start
+
+            underruns, overruns, slack = result.underruns, result.overruns, result.slack
+            print(
+                f"{max_extended:7} {duration:8} {np.count_nonzero(underruns):9} {underruns.sum():9}"
+                f" {np.count_nonzero(overruns):8} {slack.min():10} {total / elapsed:10.0f}"
+            )
+
+            # Split back into one Playout per contour
+            results = [
+                playout_model.Playout(*(field[a:b] for field in result))
+                for a, b in zip(bounds[:-1], bounds[1:])
+            ]
+            if args.csv and rows is None:
+                rows = [
+                    (path.name, i, *fields)
+                    for path, r in zip(args.contours, results)
+                    for i, fields in enumerate(zip(*r))
+                ]
+            if args.check:
+                for path, r in zip(args.contours, results):
+                    ring = check(r, max_extended, duration)
+                    if ring != r.underruns.sum():
+                        print(f"  {path.name}: {r.underruns.sum()} underruns, ring model has {ring}")
+                        mismatched += 1
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["contour", "window", *playout_model.Playout._fields])
+            writer.writerows(rows)
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
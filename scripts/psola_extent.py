@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import psola_model  # noqa: E402
+import searcher_model  # noqa: E402
+from wav_source import WavSource  # noqa: E402
+
+FS = 44100
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the PSOLA model over a recording and report output window lengths"
+    )
+    parser.add_argument("wav", type=Path)
+    parser.add_argument("windows", type=Path, help="-windows.txt with one pitch per window")
+    parser.add_argument("--max-extended", type=int, default=psola_model.MAX_EXTENDED)
+    parser.add_argument("--fraction-bits", type=int, default=16)
+    parser.add_argument("--rom", type=Path, default=searcher_model.ROM_PATH)
+    parser.add_argument(
+        "--scale",
+        help=f"generate the ROM for a scale instead: {', '.join(searcher_model.SCALES)}",
+    )
+    parser.add_argument("--root", type=int, default=0, help="semitones above A")
+    args = parser.parse_args()
+
+    source = WavSource(args.wav, psola_model.WINDOW_SIZE)
+    with open(args.windows) as f:
+        taus = [round(FS / float(line)) for line in f]
+    if args.scale:
+        quantize = searcher_model.Quantizer.from_scale(args.scale, args.root)
+    else:
+        quantize = searcher_model.Quantizer(searcher_model.load_rom(args.rom))
+    shifted_taus = quantize(taus)
+
+    lens = []
+    dropped = 0
+    hung = 0
+    start = time.perf_counter()
+    for i, (tau, shifted_tau) in enumerate(zip(taus[: len(source)], shifted_taus)):
+        if tau == 0:
+            hung += 1
+            continue
+        result = psola_model.psola(
+            source[i], tau, shifted_tau, args.fraction_bits, args.max_extended
+        )
+        lens.append(result.window_len)
+        dropped += result.dropped
+    elapsed = time.perf_counter() - start
+
+    lens = np.array(lens)
+    audio = len(lens) * psola_model.WINDOW_SIZE / FS
+    print(f"{len(lens)} windows, {audio:.1f}s of audio in {elapsed:.2f}s ({audio / elapsed:.0f}x real time)")
+    print(
+        f"window_len min {lens.min()}, median {int(np.median(lens))}, "
+        f"99.9% {int(np.percentile(lens, 99.9))}, max {lens.max()}"
+    )
+    over = np.count_nonzero(lens > args.max_extended)
+    print(f"{over} windows longer than MAX_EXTENDED={args.max_extended}, {dropped} writes dropped")
+    if hung:
+        print(f"{hung} windows with tau 0, which psola.sv never finishes")
+
+
+if __name__ == "__main__":
+    main()
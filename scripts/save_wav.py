@@ -2,9 +2,9 @@
 
 import sys
 
-import numpy as np
 import serial
-from scipy.io import wavfile
+
+from capture import FS, Capture, NpySink, WavSink
 
 
 def eprint(*args, **kwargs):
@@ -13,27 +13,41 @@ def eprint(*args, **kwargs):
 
 if len(sys.argv) == 1:
     eprint("Please provide output filename as first argument")
+    eprint("Optional second argument is seconds to record, 0 records until Ctrl-C")
     sys.exit(69)
 fname = sys.argv[1]
 
 SERIAL_PORT_NAME = "/dev/cu.usbserial-8874292302131"
-FS = 44100
 SECONDS = int(sys.argv[2]) if len(sys.argv) == 3 else 15
 
-ser = serial.Serial(SERIAL_PORT_NAME, bytesize=serial.EIGHTBITS, baudrate=1_000_000)
+ser = serial.Serial(
+    SERIAL_PORT_NAME, bytesize=serial.EIGHTBITS, baudrate=1_000_000, timeout=0.1
+)
 eprint("Serial port initialized")
 
-eprint(f"Recording {SECONDS} seconds of audio:")
-samples = []
-for i in range(FS * SECONDS):
-    hi = int.from_bytes(ser.read(), "little")
-    lo = int.from_bytes(ser.read(), "little")
-    if (i + 1) % FS == 0:
-        eprint(f"{(i+1)/FS} seconds complete")
-    samples.append((hi * 255 + lo) - 32768)
-
-
-arr = np.array(samples, dtype=np.int16)
-np.save(f"{fname}.npy", arr)
-
-wavfile.write(fname, FS, arr)
+if SECONDS:
+    eprint(f"Recording {SECONDS} seconds of audio:")
+else:
+    eprint("Recording audio until Ctrl-C:")
+
+capture = Capture(
+    ser,
+    [WavSink(fname, FS), NpySink(f"{fname}.npy")],
+    limit=FS * SECONDS if SECONDS else None,
+).start()
+
+try:
+    while not capture.wait(1):
+        eprint(f"{capture.samples_written / FS:.1f} seconds complete")
+except KeyboardInterrupt:
+    pass
+finally:
+    capture.stop()
+    ser.close()
+
+eprint(f"Saved {capture.samples_written / FS:.1f} seconds to {fname}")
+if capture.dropped or capture.decoder.resyncs:
+    eprint(
+        f"{capture.dropped} bytes dropped by the host, "
+        f"{capture.decoder.resyncs} byte-pair resyncs"
+    )
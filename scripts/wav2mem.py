@@ -2,25 +2,56 @@
 
 
 import sys
+import wave
 
 import numpy as np
-from scipy.io import wavfile
+
+CHUNK_SAMPLES = 1 << 16
 
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+def hex_table():
+    """f"{sample:x}\\n" for every 16-bit sample, right aligned in 5 bytes.
+
+    Returns the table and a mask of which bytes of each row to keep, so a
+    whole block can be encoded with two lookups and one boolean index.
+    """
+    values = np.arange(1 << 16)
+    nibbles = (values[:, None] >> np.array([12, 8, 4, 0])) & 0xF
+    table = np.empty((1 << 16, 5), dtype=np.uint8)
+    table[:, :4] = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)[nibbles]
+    table[:, 4] = ord("\n")
+
+    num_digits = 1 + (values >= 0x10) + (values >= 0x100) + (values >= 0x1000)
+    keep = np.arange(5) >= 4 - num_digits[:, None]
+    return table, keep
+
+
 if len(sys.argv) != 3:
     eprint("Please provide input and output filenames")
+    eprint("Output ending in .bin is written as raw little-endian uint16")
     sys.exit(69)
 
 input = sys.argv[1]
 output = sys.argv[2]
+binary = output.endswith(".bin")
+
+table, keep = hex_table()
 
-samplerate, data = wavfile.read(input)
+with wave.open(input, "rb") as wf, open(output, "wb") as f:
+    if wf.getsampwidth() != 2:
+        eprint("Only 16-bit WAV files are supported")
+        sys.exit(69)
+    channels = wf.getnchannels()
 
-data = data.view(dtype=np.uint16) ^ 0x8000 # convert to unsigned
+    while frames := wf.readframes(CHUNK_SAMPLES):
+        data = np.frombuffer(frames, dtype="<i2")[::channels]
+        data = data.view(dtype=np.uint16) ^ 0x8000  # convert to unsigned
 
-with open(output, "w") as f:
-    f.writelines(f"{sample:x}\n" for sample in data)
+        if binary:
+            f.write(data.astype("<u2").tobytes())
+        else:
+            f.write(table[data][keep[data]].tobytes())
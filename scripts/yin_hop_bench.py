@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_PATH / "sim" / "model"))
+import yin_model  # noqa: E402
+from latency_model import CLOCK_HZ  # noqa: E402
+from top_level_model import SAMPLE_CYCLES, TAUMAX, WINDOW_SIZE  # noqa: E402
+from wav_source import WavSource  # noqa: E402
+
+FS = 44100
+MS = CLOCK_HZ / 1e3
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def recompute(samples, ends, window_size, taumax, batch=256):
+    """Diffs of the same windows from scratch, as the block mode would."""
+    diffs = np.zeros((len(ends), taumax), dtype=np.int64)
+    for k in range(0, len(ends), batch):
+        starts = ends[k : k + batch, None] - window_size
+        diffs[k : k + batch] = yin_model.difference(samples[starts + np.arange(window_size)], taumax)
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pitch update rate, latency and cost of yin.sv's sliding mode against the block mode"
+    )
+    parser.add_argument(
+        "wav", nargs="?", type=Path, default=BASE_PATH / "test_data" / "aladdin-new.wav"
+    )
+    parser.add_argument(
+        "--hops", type=int, nargs="+", default=[WINDOW_SIZE, 1024, 512, 256, 128, 64, 32]
+    )
+    parser.add_argument("--seconds", type=float, default=5, help="of the recording to track")
+    parser.add_argument(
+        "--check", action="store_true", help="check every incremental diff against a full recompute"
+    )
+    args = parser.parse_args()
+
+    if not args.wav.exists():
+        eprint(f"No such file: {args.wav}")
+        sys.exit(69)
+    bad = [h for h in args.hops if not 0 < h <= WINDOW_SIZE]
+    if bad:
+        eprint(f"--hops must be between 1 and {WINDOW_SIZE}, got {bad[0]}")
+        sys.exit(69)
+
+    source = WavSource(args.wav, WINDOW_SIZE)
+    samples = source.samples[: int(args.seconds * FS)].view(np.uint16) ^ 0x8000
+    print(f"{len(samples)} samples, {SAMPLE_CYCLES} cycles each, {WINDOW_SIZE} sample window")
+    print(
+        f"{'hop':>5} {'taus/s':>7} {'every ms':>9} {'latency ms':>11} {'worst ms':>9}"
+        f" {'cyc/sample':>11} {'cyc/hop':>9} {'fits':>5} {'model us':>9} {'full us':>8}"
+    )
+
+    mismatched = 0
+    for hop in args.hops:
+        timing = yin_model.hop_timing(hop, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX)
+        start = time.perf_counter()
+        ends, diffs = yin_model.sliding_diff(samples, hop, WINDOW_SIZE, TAUMAX)
+        incremental = time.perf_counter() - start
+        if not len(ends):
+            print(f"{hop:5} recording is shorter than a window")
+            continue
+        start = time.perf_counter()
+        full = recompute(samples, ends, WINDOW_SIZE, TAUMAX)
+        from_scratch = time.perf_counter() - start
+
+        # The tau in use is worst just before the next one lands
+        print(
+            f"{hop:5} {FS / hop:7.1f} {timing.interval / MS:9.2f} {timing.latency / MS:11.3f}"
+            f" {(timing.interval + timing.latency) / MS:9.2f} {timing.sample_busy:11}"
+            f" {timing.hop_busy:9} {'yes' if timing.fits else 'no':>5}"
+            f" {incremental / len(ends) * 1e6:9.0f} {from_scratch / len(ends) * 1e6:8.0f}"
+        )
+        if args.check and not np.array_equal(diffs, full):
+            bad = np.flatnonzero((diffs != full).any(axis=-1))
+            print(f"  window ending at sample {ends[bad[0]]} differs from a full recompute")
+            mismatched += 1
+
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
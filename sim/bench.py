@@ -0,0 +1,435 @@
+"""Build and run steps shared by every cocotb bench's main().
+
+Each bench builds into its own directory under sim_build/, and the build is
+only forced when a hash of everything that goes into it has changed, so
+rerunning a bench (or the whole regression) costs simulation time only.
+
+Waveforms are off unless asked for through the environment:
+
+    WAVES=fail          trace only benches that fail, by rerunning them with
+                        the same RANDOM_SEED
+    WAVES=all           trace every run
+    WAVE_SIGNALS=a,b    only dump these signals or scopes under the toplevel
+    WAVE_TIME=from:to   only dump between these sim times in ns
+    WAVE_WINDOWS=i:j    only dump windows i to j - 1, for benches that call
+                        mark_window(); the window times come from an
+                        untraced run with the same seed
+
+The WAVE_* limits need Icarus. Other simulators dump the whole run, so they
+refuse them rather than quietly tracing everything.
+
+Benches that pass run() a window count can also be split with SHARDS=n into
+n contiguous window ranges, each simulated by its own process at once. A
+shard reads its range with shard_windows().
+
+Benches that name their stimulus files and save their DUT outputs with
+save_outputs() get those outputs cached (see result_cache.py). A run whose
+RTL, parameters, bench, models, drivers and stimulus all hash the same as
+an earlier passing run skips the build and simulation and hands the cached
+outputs to the bench's replay function, which redoes the checks and plots in
+Python. Sharded runs always simulate.
+SIM_CACHE=0 turns this off and SIM_CACHE_MB bounds the cache size.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+from cocotb.runner import get_results, get_runner
+
+from result_cache import ResultCache, content_key
+
+PROJ_PATH = Path(__file__).resolve().parent.parent
+
+# Benches import bench before their models, so python sim/test_X.py finds
+# sim/model without a PYTHONPATH. The runner passes sys.path on to the
+# simulator's Python
+sys.path.insert(0, str(PROJ_PATH / "sim" / "model"))
+sys.path.insert(1, str(PROJ_PATH / "sim"))
+
+# Two levels below the project root, where hdl/searcher.sv finds
+# ../../data/semitones.mem
+BUILD_ROOT = PROJ_PATH / "sim_build"
+
+# Read by $readmemh at elaboration, so they're part of the build too
+DATA_FILES = [PROJ_PATH / "data" / "semitones.mem"]
+
+BUILD_ARGS = {
+    "icarus": ["-Wall"],
+    # Keep Verilator's lint warnings visible without failing the build on them
+    "verilator": ["-Wall", "-Wno-fatal"],
+}
+TIMESCALE = ("1ns", "1ps")
+CLOCK_PERIOD = 10  # ns, what every bench starts its Clock with
+
+# Written into the build directory (the simulator's working directory) by
+# mark_window(), one "index time_ns" line per window
+WINDOWS_FILE = "windows.txt"
+
+# Written next to it by save_outputs()
+OUTPUTS_FILE = "outputs.npz"
+RESULT_CACHE = BUILD_ROOT / "results"
+
+WAVES_MODULE = "bench_waves"
+WAVES_TEMPLATE = """\
+module {module}();
+    reg [63:0] start = 0;
+    reg [63:0] stop = 0;
+    initial if ($test$plusargs("waves")) begin
+        $dumpfile("{toplevel}.fst");
+{dumpvars}
+        if ($value$plusargs("wave_start=%d", start) && start > 0) begin
+            $dumpoff;
+            #(start);
+            $dumpon;
+        end
+        if ($value$plusargs("wave_stop=%d", stop)) begin
+            #(stop - start);
+            $dumpoff;
+        end
+    end
+endmodule
+"""
+
+
+class WaveOptions(NamedTuple):
+    mode: str  # "", "fail" or "all"
+    signals: Tuple[str, ...]
+    time: Optional[Tuple[int, Optional[int]]]  # ns
+    windows: Optional[Tuple[int, Optional[int]]]
+
+
+def _range(text):
+    if not text:
+        return None
+    start, _, stop = text.partition(":")
+    return int(start or 0), int(stop) if stop else None
+
+
+def wave_options():
+    mode = os.getenv("WAVES", "").lower()
+    if mode in ("0", "none", "off"):
+        mode = ""
+    elif mode in ("1", "on"):
+        mode = "all"
+    elif mode not in ("", "fail", "all"):
+        raise ValueError(f"WAVES must be fail or all, not {mode}")
+    signals = tuple(s for s in os.getenv("WAVE_SIGNALS", "").split(",") if s)
+    return WaveOptions(mode, signals, _range(os.getenv("WAVE_TIME")), _range(os.getenv("WAVE_WINDOWS")))
+
+
+def mark_window(index):
+    """Record the sim time window index starts at, so WAVE_WINDOWS can be
+    turned into a time range. Call from inside a test."""
+    from cocotb.utils import get_sim_time
+
+    with open(WINDOWS_FILE, "a") as f:
+        f.write(f"{index} {int(get_sim_time('ns'))}\n")
+
+
+def save_outputs(**arrays):
+    """Save DUT outputs for the result cache, and for replay on a hit.
+    Sharded runs concatenate each array across shards in window order."""
+    np.savez_compressed(OUTPUTS_FILE, **arrays)
+
+
+def load_outputs(test_module, sim=None):
+    with np.load(build_dir(test_module, sim) / OUTPUTS_FILE) as data:
+        return {name: data[name] for name in data.files}
+
+
+def result_cache():
+    if os.getenv("SIM_CACHE", "1") == "0":
+        return None
+    return ResultCache(RESULT_CACHE, int(float(os.getenv("SIM_CACHE_MB", 1024)) * 1e6))
+
+
+def merge_outputs(directory, test_dirs):
+    parts = []
+    for test_dir in test_dirs:
+        with np.load(test_dir / OUTPUTS_FILE) as data:
+            parts.append({name: data[name] for name in data.files})
+    np.savez_compressed(
+        directory / OUTPUTS_FILE,
+        **{name: np.concatenate([p[name] for p in parts]) for name in parts[0]},
+    )
+
+
+def window_times(directory):
+    times = {}
+    path = directory / WINDOWS_FILE
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                index, ns = line.split()
+                times.setdefault(int(index), int(ns))
+    return times
+
+
+def wave_plusargs(waves, directory):
+    """Plusargs for a traced run, limited to the requested time range."""
+    start, stop = waves.time or (0, None)
+    if waves.windows:
+        times = window_times(directory)
+        first, last = waves.windows
+        start = times.get(first, 0)
+        stop = times.get(last) if last is not None else None
+    plusargs = ["+waves", "-fst"]
+    if start:
+        plusargs.append(f"+wave_start={start}")
+    if stop is not None:
+        plusargs.append(f"+wave_stop={stop}")
+    return plusargs
+
+
+def waves_module(directory, toplevel, signals):
+    """Dump module built alongside the toplevel. It stays idle unless the
+    run gets +waves, so turning tracing on or off never needs a rebuild."""
+    scopes = [f"{toplevel}.{s}" for s in signals] or [toplevel]
+    path = directory / f"{WAVES_MODULE}.v"
+    path.write_text(
+        WAVES_TEMPLATE.format(
+            module=WAVES_MODULE,
+            toplevel=toplevel,
+            dumpvars="\n".join(f"        $dumpvars(0, {s});" for s in scopes),
+        )
+    )
+    return path
+
+
+def shard_count():
+    return int(os.getenv("SHARDS", 1))
+
+
+def shard_windows(count):
+    """First and one past the last window this process should simulate."""
+    first, last = _range(os.getenv("SHARD_WINDOWS")) or (0, None)
+    return first, count if last is None else min(last, count)
+
+
+def shard_bounds(windows, shards):
+    return [windows * k // shards for k in range(shards + 1)]
+
+
+def build_dir(test_module, sim=None):
+    return BUILD_ROOT / f"{test_module}-{sim or os.getenv('SIM', 'icarus')}"
+
+
+def shard_dirs(test_module, shards, sim=None):
+    """Where each shard runs. Siblings of the build directory rather than
+    inside it, to stay two levels below the project root."""
+    return [Path(f"{build_dir(test_module, sim)}-shard{k}") for k in range(shards)]
+
+
+def check_sources():
+    """Python that shapes a bench's stimulus and checks its outputs, so part
+    of every result cache key along with the bench itself."""
+    return [PROJ_PATH / "sim" / "drivers.py"] + sorted((PROJ_PATH / "sim" / "model").glob("*.py"))
+
+
+def build_hash(sources, parameters, sim, build_args, waves=False):
+    """Hash of the simulator, its arguments and the contents of every input."""
+    h = hashlib.sha256()
+    h.update(repr((sim, list(build_args), sorted(parameters.items()), TIMESCALE, waves)).encode())
+    for path in list(sources) + DATA_FILES:
+        h.update(Path(path).name.encode())
+        h.update(Path(path).read_bytes())
+    return h.hexdigest()
+
+
+def sim_time(results):
+    """Total simulated ns over every test in a results.xml."""
+    return sum(float(case.get("sim_time_ns", 0)) for case in ET.parse(results).iter("testcase"))
+
+
+def test_shards(sim, hdl_toplevel, test_module, directory, seed, windows, shards):
+    """Run each shard's windows in its own simulator process at once."""
+    bounds = shard_bounds(windows, shards)
+
+    def shard(k, test_dir):
+        test_dir.mkdir(parents=True, exist_ok=True)
+        (test_dir / OUTPUTS_FILE).unlink(missing_ok=True)
+        # A runner per thread, since test() keeps its settings on the
+        # runner. One that never built has no sources to guess the
+        # toplevel's language from, so it has to be given
+        results = get_runner(sim).test(
+            hdl_toplevel=hdl_toplevel,
+            hdl_toplevel_lang="verilog",
+            test_module=test_module,
+            build_dir=directory,
+            test_dir=test_dir,
+            results_xml=str(test_dir / "results.xml"),
+            seed=seed,
+            test_args=[],
+            extra_env={"SHARD_WINDOWS": f"{bounds[k]}:{bounds[k + 1]}"},
+        )
+        return get_results(results) + (sim_time(results),)
+
+    with ThreadPoolExecutor(max_workers=shards) as pool:
+        done = list(pool.map(shard, range(shards), shard_dirs(test_module, shards, sim)))
+    return tuple(sum(x) for x in zip(*done))
+
+
+def write_status(directory, **status):
+    # Picked up by sim/regress.py for its summary
+    with open(directory / "status.json", "w") as f:
+        json.dump(status, f)
+
+
+def run(
+    test_module,
+    hdl_toplevel,
+    sources,
+    parameters,
+    build_args=None,
+    windows=None,
+    shards=1,
+    stimulus=None,
+    replay=None,
+    cache=True,
+):
+    """Build (if needed) and test one toplevel. Returns the number of failed tests.
+
+    With a window count and more than one shard, the windows are split
+    across that many simulator processes; tracing and the result cache are
+    not supported then.
+
+    stimulus lists the files (or other values) the bench's input comes from.
+    Given that and a replay(outputs, directory) returning a failure count,
+    passing runs are cached and a hit replays instead of simulating.
+    """
+    sim = os.getenv("SIM", "icarus")
+    build_args = BUILD_ARGS.get(sim, []) if build_args is None else build_args
+    waves = wave_options()
+    if sim != "icarus" and waves.mode and (waves.signals or waves.time or waves.windows):
+        raise ValueError(f"WAVE_SIGNALS, WAVE_TIME and WAVE_WINDOWS need icarus, {sim} can only dump everything")
+
+    directory = build_dir(test_module, sim)
+    directory.mkdir(parents=True, exist_ok=True)
+    sources = list(sources)
+    build_args = list(build_args)
+    if sim == "icarus":
+        sources.append(waves_module(directory, hdl_toplevel, waves.signals))
+        build_args += ["-s", WAVES_MODULE]
+    # Other simulators can only dump everything, and only if built for it
+    build_waves = sim != "icarus" and bool(waves.mode)
+    digest = build_hash(sources, parameters, sim, build_args, build_waves)
+    seed = int(os.getenv("RANDOM_SEED", int(time.time())))
+
+    sharded = windows is not None and shards > 1
+    # Tracing needs a real simulation, so it always misses. A sharded run is
+    # there to exercise the shards, so it never replays a single process run
+    results_cache = (
+        result_cache() if cache and stimulus and replay and not waves.mode and not sharded else None
+    )
+    if results_cache:
+        bench_file = PROJ_PATH / "sim" / f"{test_module}.py"
+        key = content_key(digest, bench_file, *check_sources(), *[
+            Path(s) if isinstance(s, (str, Path)) and Path(s).is_file() else s for s in stimulus
+        ])
+        outputs = results_cache.get(key)
+        if outputs is not None:
+            start = time.perf_counter()
+            np.savez_compressed(directory / OUTPUTS_FILE, **outputs)
+            try:
+                failed = replay(outputs, directory)
+            except AssertionError as e:
+                print(f"Replay of cached outputs failed: {e}")
+                failed = 1
+            print(results_cache.summary())
+            write_status(
+                directory,
+                rebuilt=False,
+                cached=True,
+                build_time=0.0,
+                test_time=time.perf_counter() - start,
+                trace_time=0.0,
+                traced=False,
+                shards=1,
+                seed=seed,
+                tests=1,
+                failed=failed,
+                cycles=0.0,
+            )
+            return failed
+
+    stamp = directory / "build.sha256"
+    stale = not stamp.exists() or stamp.read_text() != digest
+
+    runner = get_runner(sim)
+    start = time.perf_counter()
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        always=stale,
+        build_dir=directory,
+        build_args=build_args,
+        parameters=parameters,
+        timescale=TIMESCALE,
+        waves=build_waves,
+    )
+    stamp.write_text(digest)
+    built = time.perf_counter()
+
+    def test(traced):
+        plusargs = wave_plusargs(waves, directory) if traced and sim == "icarus" else []
+        (directory / WINDOWS_FILE).unlink(missing_ok=True)
+        (directory / OUTPUTS_FILE).unlink(missing_ok=True)
+        results = runner.test(
+            hdl_toplevel=hdl_toplevel,
+            test_module=test_module,
+            build_dir=directory,
+            seed=seed,
+            test_args=[],
+            plusargs=plusargs,
+            waves=traced,
+        )
+        return get_results(results) + (sim_time(results),)
+
+    if sharded:
+        tests, failed, sim_ns = test_shards(
+            sim, hdl_toplevel, test_module, directory, seed, windows, shards
+        )
+        tested = time.perf_counter()
+        traced = False
+        test_dirs = shard_dirs(test_module, shards, sim)
+        if all((d / OUTPUTS_FILE).exists() for d in test_dirs):
+            merge_outputs(directory, test_dirs)
+    else:
+        # A windowed trace needs the window times from an untraced run first
+        trace_first = waves.mode == "all" and not waves.windows
+        tests, failed, sim_ns = test(trace_first)
+        tested = time.perf_counter()
+
+        traced = trace_first
+        if not trace_first and (waves.mode == "all" or (waves.mode == "fail" and failed)):
+            test(True)
+            traced = True
+
+    if results_cache:
+        if not failed and (directory / OUTPUTS_FILE).exists():
+            results_cache.put(key, directory / OUTPUTS_FILE)
+        print(results_cache.summary())
+
+    write_status(
+        directory,
+        rebuilt=stale,
+        cached=False,
+        build_time=built - start,
+        test_time=tested - built,
+        trace_time=time.perf_counter() - tested,
+        traced=traced,
+        shards=shards if sharded else 1,
+        seed=seed,
+        tests=tests,
+        failed=failed,
+        cycles=sim_ns / CLOCK_PERIOD,
+    )
+    return failed
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Run every bench on each simulator and compare simulated cycles per second.
+
+Benches run one at a time by default so the timings don't fight over cores.
+Builds are cached as usual (see bench.py), and build time is reported apart
+from test time so a first Verilator compile doesn't hide its run speed. The
+result cache is off, since a replay simulates nothing.
+"""
+
+import argparse
+import sys
+
+from regress import bench_env, discover, eprint, run_bench
+
+SIMS = ["icarus", "verilator"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare simulator throughput on every bench")
+    parser.add_argument("benches", nargs="*", help="only run benches whose name contains one of these")
+    parser.add_argument("--sims", nargs="+", default=SIMS)
+    args = parser.parse_args()
+
+    benches = discover(args.benches)
+    if not benches:
+        eprint("No benches match")
+        sys.exit(69)
+
+    results = {}
+    for sim in args.sims:
+        env = dict(bench_env(sim), SIM_CACHE="0")
+        for bench in benches:
+            result = run_bench(bench, sim, env)
+            results[bench, sim] = result
+            print(f"{sim:10} {bench:22} {'PASS' if result['returncode'] == 0 else 'FAIL'}", flush=True)
+
+    print()
+    header = f"{'bench':22}"
+    for sim in args.sims:
+        header += f" {sim + ' tests':>16} {'build':>8} {'test':>8} {'cycles/s':>10}"
+    print(header)
+
+    lost = []
+    for bench in benches:
+        line = f"{bench:22}"
+        outcomes = set()
+        for sim in args.sims:
+            r = results[bench, sim]
+            if "tests" not in r:
+                line += f" {'ERROR':>16} {'-':>8} {'-':>8} {'-':>10}"
+                outcomes.add(None)
+                continue
+            if r.get("cached"):
+                # Replayed anyway, so there is no speed to report
+                line += f" {r['tests'] - r['failed']:>12}/{r['tests']:<3} {'-':>8} {'-':>8} {'replayed':>10}"
+                outcomes.add((r["tests"], r["failed"]))
+                continue
+            outcomes.add((r["tests"], r["failed"]))
+            rate = r["cycles"] / r["test_time"] if r["test_time"] else 0
+            line += (
+                f" {r['tests'] - r['failed']:>12}/{r['tests']:<3}"
+                f" {r['build_time']:7.1f}s {r['test_time']:7.1f}s {rate:10.0f}"
+            )
+        print(line)
+        if len(outcomes) > 1:
+            lost.append(bench)
+
+    if len(args.sims) > 1:
+        base = args.sims[0]
+        for sim in args.sims[1:]:
+            speedups = [
+                (results[b, sim]["cycles"] / results[b, sim]["test_time"])
+                / (results[b, base]["cycles"] / results[b, base]["test_time"])
+                for b in benches
+                if all(
+                    "tests" in results[b, s] and results[b, s]["test_time"] and not results[b, s].get("cached")
+                    for s in (base, sim)
+                )
+                and results[b, base]["cycles"]
+            ]
+            if speedups:
+                print(f"\n{sim} vs {base}: {min(speedups):.1f}x to {max(speedups):.1f}x cycles/s")
+
+    if lost:
+        print(f"\nresults differ between simulators for: {', '.join(lost)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
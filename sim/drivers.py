@@ -0,0 +1,111 @@
+"""Array-driven stimulus drivers and output monitors for the cocotb benches.
+
+Waking a Python coroutine costs far more than simulating a clock cycle, so
+these drive or capture a whole NumPy array at a fixed cadence, keep their
+handles and triggers, and sleep through idle cycles with a single Timer
+instead of waking on every edge.
+"""
+
+import numpy as np
+from cocotb.triggers import FallingEdge, RisingEdge, Timer
+
+from bench import CLOCK_PERIOD
+
+
+class SampleDriver:
+    """Drives one sample every period cycles with a one cycle valid strobe.
+
+    Values change on the edge picked by rising, like the hand written
+    loops they replace, and addr (if given) counts up from first_addr.
+    """
+
+    def __init__(
+        self,
+        clk,
+        data,
+        valid,
+        addr=None,
+        period=1,
+        rising=False,
+        idle_value=None,
+        clock_period=CLOCK_PERIOD,
+    ):
+        self.data = data
+        self.valid = valid
+        self.addr = addr
+        self.period = period
+        self.idle_value = idle_value
+        self.edge = RisingEdge(clk) if rising else FallingEdge(clk)
+        # From the edge ending a strobe to half a cycle before the next
+        # sample's edge, so the wake-up never races an edge
+        self.idle = Timer((period - 1.5) * clock_period, units="ns") if period > 2 else None
+
+    async def drive(self, samples, first_addr=0):
+        """Drive every sample in samples.
+
+        The first goes out immediately, so call this just after an edge of
+        the kind the driver uses. Returns period cycles after the last
+        sample, on the edge the next one would have gone out on.
+        """
+        for k, value in enumerate(np.asarray(samples).tolist()):
+            if k:
+                await self.next_slot()
+            self.data.value = value
+            if self.addr is not None:
+                self.addr.value = first_addr + k
+            self.valid.value = 1
+            if self.period > 1:
+                await self.edge
+                self.end_strobe()
+
+        await self.next_slot()
+        if self.period == 1:
+            self.end_strobe()
+
+    async def next_slot(self):
+        if self.idle is not None:
+            await self.idle
+        await self.edge
+
+    def end_strobe(self):
+        self.valid.value = 0
+        if self.idle_value is not None:
+            self.data.value = self.idle_value
+
+
+class ValidMonitor:
+    """Captures data on every cycle valid is high into a preallocated array.
+
+    Sleeps on the rising edge of valid between bursts, so idle cycles cost
+    nothing; within a burst it wakes once per captured word. Values are
+    read mid-cycle on the falling edge, where every simulator agrees on
+    them.
+    """
+
+    def __init__(self, clk, data, valid, size=4096, dtype=np.int64):
+        self.data = data
+        self.valid = valid
+        self.clk_edge = FallingEdge(clk)
+        self.valid_edge = RisingEdge(valid)
+        self.values = np.zeros(size, dtype=dtype)
+        self.count = 0
+
+    @property
+    def captured(self):
+        return self.values[: self.count]
+
+    def clear(self):
+        self.count = 0
+
+    async def run(self):
+        """Start with cocotb.start_soon(monitor.run())."""
+        while True:
+            await self.valid_edge
+            while True:
+                await self.clk_edge
+                if not self.valid.value:
+                    break
+                if self.count == len(self.values):
+                    self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+                self.values[self.count] = self.data.value.integer
+                self.count += 1
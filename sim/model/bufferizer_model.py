@@ -0,0 +1,149 @@
+"""Software model of the playout side of hdl/bufferizer.sv and ring_buffer.sv.
+
+bram_wrapper writes each PSOLA window into the ring one word per cycle, and
+the bufferizer reads one word every SAMP_PLAY_DURATION cycles once the first
+window is done. Reads are processed a chunk at a time: runs of ordinary reads
+are vectorized, and the two ways the RTL misbehaves are reproduced exactly
+enough to hear them:
+
+- overrun: the writer laps the reader and the read returns the newer word
+- underrun: head == tail, so the ring replays its 64 word tail cache
+  backwards (this also happens when the ring is exactly full)
+"""
+
+import numpy as np
+
+MAX_EXTENDED = 2200
+SAMP_PLAY_DURATION = 2304
+CACHE_SIZE = 64
+
+
+class RingPlayout:
+    """Word-level playout from a ring of 2 * MAX_EXTENDED entries."""
+
+    def __init__(self, max_extended=MAX_EXTENDED, samp_play_duration=SAMP_PLAY_DURATION):
+        self.entries = 2 * max_extended
+        self.period = samp_play_duration
+
+        # Every word still in (or recently lapped out of) the ring
+        self.times = np.zeros(0, dtype=np.int64)
+        self.words = np.zeros(0, dtype=np.int64)
+        self.base = 0  # word index of words[0]
+
+        self.cleared = np.full(self.entries, -1, dtype=np.int64)
+        self.cache = np.zeros(CACHE_SIZE, dtype=np.int64)
+        self.tail = 0  # total words read, so tail pointer is tail % entries
+        self.next_read = None  # cycle of the next read, None while loading
+
+        self.reads = 0
+        self.underruns = 0
+        self.overruns = 0
+
+    @property
+    def written(self):
+        return self.base + len(self.words)
+
+    def write(self, start, words):
+        """One bram_wrapper output pass, entering the ring one word per cycle
+        starting at cycle start."""
+        words = np.asarray(words, dtype=np.int64)
+        self.times = np.concatenate([self.times, start + np.arange(len(words))])
+        self.words = np.concatenate([self.words, words])
+        if self.next_read is None:
+            # LOADING_BUFFER until the first raw_psola_done, then one read
+            # every SAMP_PLAY_DURATION cycles
+            self.next_read = start + len(words) + self.period + 1
+
+    def read_until(self, horizon):
+        """Output words of every read before cycle horizon."""
+        out = [np.zeros(0, dtype=np.int64)]
+        while self.next_read is not None and self.next_read < horizon:
+            n = min(self.entries, (horizon - self.next_read - 1) // self.period + 1)
+            out.append(self.read(self.next_read + self.period * np.arange(n)))
+            self.next_read += n * self.period
+        return np.concatenate(out)
+
+    def drain(self):
+        """Output words until the ring is empty after the last write."""
+        if self.next_read is None:
+            return np.zeros(0, dtype=np.int64)
+        out = [self.read_until(int(self.times[-1]) + 1)]
+        while self.tail < self.written:
+            tail = self.tail
+            n = min(self.entries, self.written - self.tail)
+            out.append(self.read_until(self.next_read + n * self.period))
+            if self.tail == tail:
+                break  # stuck crossing with nothing left to write
+        return np.concatenate(out)
+
+    def read(self, r):
+        """Process reads at cycles r, at most one ring's worth."""
+        written = self.base + np.searchsorted(self.times, r)  # head before each read
+        out = np.empty(len(r), dtype=np.int64)
+        k = 0
+        while k < len(r):
+            tail = self.tail + np.arange(len(r) - k)
+            crossing = (written[k:] - tail) % self.entries == 0
+            f = int(crossing.argmax()) if crossing.any() else len(r) - k
+            out[k : k + f] = self.pop(r[k : k + f])
+            k += f
+            if k == len(r):
+                break
+
+            stuck = (written[k:] - self.tail) % self.entries == 0
+            g = len(r) - k if stuck.all() else int(stuck.argmin())
+            out[k : k + g] = self.replay(r[k : k + g])
+            k += g
+
+        self.reads += len(r)
+        self.trim()
+        return out
+
+    def slot(self, before, tail):
+        """Contents of each tail slot counting only writes before cycle before."""
+        written = self.base + np.searchsorted(self.times, before)
+        latest = tail + self.entries * ((written - 1 - tail) // self.entries)
+        idx = latest - self.base
+        val = np.zeros(len(tail), dtype=np.int64)
+        ok = idx >= 0
+        fresh = self.times[idx[ok]] > self.cleared[tail[ok] % self.entries]
+        val[ok] = np.where(fresh, self.words[idx[ok]], 0)
+        return val, latest
+
+    def crossing_after(self, r, tail):
+        """Whether head == tail in the cycle data_valid_out is high."""
+        written = self.base + np.searchsorted(self.times, r, side="right")
+        return (written - tail) % self.entries == 0
+
+    def pop(self, r):
+        tail = self.tail + np.arange(len(r))
+        # The BRAM output register lags a cycle behind line_buffer_out, so
+        # a word written just before the read can miss either of them
+        val, latest = self.slot(r - 1, tail)
+        cached = self.slot(r - 2, tail)[0]
+        self.overruns += int(np.count_nonzero(latest > tail))
+        self.cleared[tail % self.entries] = r  # the read port writes back 0
+
+        self.tail += len(r)
+        self.cache = np.concatenate([cached[::-1], self.cache])[:CACHE_SIZE]
+        return np.where(self.crossing_after(r, tail + 1), cached, val)
+
+    def replay(self, r):
+        self.underruns += len(r)
+        tail = np.full(len(r), self.tail)
+        val = self.cache[np.arange(1, len(r) + 1) % CACHE_SIZE]
+        self.cache = np.roll(self.cache, -len(r))
+
+        # A write on the read edge ends the crossing, and the output shows
+        # the slot it lands in as it was before
+        moved = ~self.crossing_after(r, tail)
+        if moved.any():
+            val = np.where(moved, self.slot(r - 1, tail)[0], val)
+        return val
+
+    def trim(self):
+        drop = max(0, self.tail - self.entries - self.base)
+        if drop:
+            self.times = self.times[drop:]
+            self.words = self.words[drop:]
+            self.base += drop
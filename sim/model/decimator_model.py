@@ -0,0 +1,77 @@
+"""Bit-exact software model of hdl/decimator.sv, and yin.sv run behind it.
+
+The CIC filter's gain of factor**order is a power of two, so its integrators
+and combs never lose anything: each output is exactly a box filter of length
+factor applied order times, floored by the gain. That is one short np.convolve
+over the whole recording.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+import yin_model
+
+
+def kernel(factor, order):
+    """Integer taps of the CIC filter, summing to factor**order."""
+    taps = np.ones(1, dtype=np.int64)
+    for _ in range(order):
+        taps = np.convolve(taps, np.ones(factor, dtype=np.int64))
+    return taps
+
+
+def shift(factor, order):
+    if factor & (factor - 1):
+        raise ValueError(f"factor must be a power of two, got {factor}")
+    return order * (factor.bit_length() - 1)
+
+
+def cic(samples, factor, order=3):
+    """sample_out of decimator.sv for every factor-th offset-binary sample.
+
+    Output k filters up to and including sample k * factor + factor - 1, with
+    the filter starting out at zero like the RTL after reset.
+    """
+    bits = shift(factor, order)
+    x = np.asarray(samples, dtype=np.int64)
+    filtered = np.convolve(x, kernel(factor, order))[: len(x)]
+    return (filtered[factor - 1 :: factor] >> bits).astype(np.uint16)
+
+
+class DecimatedYin(NamedTuple):
+    taus: np.ndarray  # taumin in full rate samples, one per window
+    stages: yin_model.YinStages  # yin.sv at the decimated rate
+
+
+def yin(samples, factor, order=3, window_size=2048, taumax=2048):
+    """Taus of yin.sv fed by decimator.sv, for each whole window_size window
+    of full rate samples. factor == 1 is yin.sv on its own."""
+    decimated = samples if factor == 1 else cic(samples, factor, order)
+    size = window_size // factor
+    n = len(decimated) // size
+    stages = yin_model.yin(decimated[: n * size].reshape(n, size), taumax // factor)
+    return DecimatedYin(stages.taumin[:, -1].astype(np.int64) * factor, stages)
+
+
+class DecimatedCost(NamedTuple):
+    """yin.sv's work behind a decimate by factor stage, per full rate sample."""
+
+    pairs: float  # squared differences
+    pass_cycles: float  # sample BRAM pass cycles
+    sample_bits: int  # sample BRAM contents
+    diff_bits: int  # both diff BRAM banks
+    timing: yin_model.HopTiming  # of yin.sv in decimated samples
+
+
+def cost(factor, sample_cycles, window_size=2048, taumax=2048, width=16):
+    size = window_size // factor
+    taus = taumax // factor
+    timing = yin_model.hop_timing(size, factor * sample_cycles, size, taus)
+    return DecimatedCost(
+        pairs=size / factor,
+        pass_cycles=timing.sample_busy / factor,
+        sample_bits=size * width,
+        diff_bits=2 * taus * yin_model.DIFF_WIDTH,
+        timing=timing,
+    )
@@ -0,0 +1,66 @@
+"""Fixed point conversions and packed bus helpers shared by the benches.
+
+Values are unsigned Q(width - fraction_width).fraction_width like the yin.sv
+and fp_div.sv datapaths. Scalars become Python ints, so any width is exact;
+arrays convert in one NumPy pass while the width fits an int64 and fall back
+to object arrays of Python ints above that.
+"""
+
+import math
+
+import numpy as np
+
+from yin_model import FP_WIDTH, FRACTION_WIDTH
+
+NUMPY_WIDTH = 63  # widest value that still fits an int64
+
+
+def _mask(width):
+    return (1 << width) - 1
+
+
+def to_fp(value, width=FP_WIDTH, fraction_width=FRACTION_WIDTH):
+    """Fixed point bits of a real value, truncated toward zero and wrapped to
+    width bits. Exact for ints, floats and Fractions, since scaling by a
+    power of two never rounds."""
+    if np.ndim(value) == 0:
+        return math.trunc(value * (1 << fraction_width)) & _mask(width)
+
+    value = np.asarray(value)
+    if width <= NUMPY_WIDTH and value.dtype != object:
+        scaled = np.trunc(value * float(1 << fraction_width)).astype(np.int64)
+        return scaled & _mask(width)
+    return np.frompyfunc(lambda v: to_fp(v, width, fraction_width), 1, 1)(value)
+
+
+def from_fp(value, width=FP_WIDTH, fraction_width=FRACTION_WIDTH):
+    """Real value of fixed point bits, as a float or float array."""
+    if np.ndim(value) == 0:
+        return (int(value) & _mask(width)) / (1 << fraction_width)
+
+    value = np.asarray(value)
+    if value.dtype == object:
+        return np.frompyfunc(lambda v: from_fp(v, width, fraction_width), 1, 1)(value).astype(
+            np.float64
+        )
+    return (value.astype(np.int64) & _mask(min(width, NUMPY_WIDTH))) / float(1 << fraction_width)
+
+
+def index(value, index, width):
+    """Lane index of a packed bus, lane 0 in the low bits."""
+    return (int(value) >> (index * width)) & _mask(width)
+
+
+def unpack(value, lanes, width):
+    """Every lane of a packed bus like cd_diff or next_taumin, lane 0 first."""
+    value = int(value)
+    dtype = np.int64 if width <= NUMPY_WIDTH else object
+    return np.array([(value >> (i * width)) & _mask(width) for i in range(lanes)], dtype=dtype)
+
+
+def pack(lanes, width):
+    """Packed bus holding each value in lanes, lane 0 in the low bits."""
+    value = 0
+    for i, lane in enumerate(lanes):
+        value |= (int(lane) & _mask(width)) << (i * width)
+    return value
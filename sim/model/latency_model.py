@@ -0,0 +1,170 @@
+"""Latency budget of hdl/top_level.sv from a click, stage by stage.
+
+The stimulus is a quiet tone (so yin.sv always finds a period and psola.sv
+always finishes) with a short full scale click in it. The click is followed
+from the I2S input through the software pipeline model to the output, and
+each stage is the cycles from one timestamp to the next:
+
+    i2s     MSB of the click sample driven on sdata -> processed_sample_valid
+    window  -> the last sample of the click's window is valid
+    yin     -> taumin_valid for that window, through the decimator when
+               top_level's DECIMATE is over 1
+    psola   -> the click's output word enters the bufferizer ring
+    ring    -> that word is read out of the ring (audio_valid_out)
+    pdm     -> the word is in top_level's audio register, the PDM input
+    uart    -> the stop bit of the word's second UART byte has been sent
+
+test_latency.py takes the same timestamps from the RTL.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from bufferizer_model import MAX_EXTENDED, SAMP_PLAY_DURATION, RingPlayout
+from top_level_model import (
+    FRACTION_BITS,
+    SAMPLE_CYCLES,
+    TAU_REG_CYCLES,
+    WINDOW_SIZE,
+    frames,
+    overlap_add,
+    snap,
+    to_pcm,
+    track,
+    yin_cycles,
+)
+
+CLOCK_HZ = 100_000_000
+
+# i2s_receiver.sv: bits are driven on the falling edge of sclk and sampled
+# the cycle after its rising edge, the 24th bit a cycle before
+# data_valid_out, which top_level registers twice more
+SCLK_CYCLES = 36
+I2S_CYCLES = SCLK_CYCLES // 2 + 1 + 23 * SCLK_CYCLES + 3
+
+# i2s_receiver.sv receives a frame straight out of reset, before the
+# microphone's first ws, so the RTL sees a silent sample ahead of the first
+# one and every window starts a sample early
+SILENCE = 0x8000
+
+# ring_buffer.sv's data_valid_out, registered from the bufferizer's read
+RING_CYCLES = 1
+
+# top_level's audio register
+PDM_CYCLES = 1
+
+# uart_turbo_transmit.sv at 1 Mbaud: two 10 bit frames, each after a cycle
+# to trigger uart_transmit, for it to go busy and to register the start bit.
+# The second is triggered the cycle after uart_transmit drops busy, which it
+# does a cycle after the first stop bit
+BAUD_RATE = 1_000_000
+UART_CYCLES = 2 * (10 * (CLOCK_HZ // BAUD_RATE) + 3)
+
+STAGES = ("i2s", "window", "yin", "psola", "ring", "pdm", "uart")
+
+# Stimulus levels, around the offset-binary midpoint. The tone and PSOLA's
+# ripple from the window weights not summing to 1 stay well under THRESHOLD,
+# the click stays well over it
+TONE_TAU = 200
+TONE_AMPLITUDE = 2000
+CLICK_AMPLITUDE = 28000
+CLICK_LEN = 8
+THRESHOLD = 12000
+
+
+class Budget(NamedTuple):
+    i2s: int
+    window: int
+    yin: int
+    psola: int
+    ring: int
+    pdm: int
+    uart: int
+
+    @property
+    def total(self):
+        return sum(self)
+
+
+def click_samples(windows, click, tau=TONE_TAU, window_size=WINDOW_SIZE):
+    """Offset-binary samples of a tone with a click at sample click."""
+    n = np.arange(windows * window_size)
+    signal = np.round(TONE_AMPLITUDE * np.sin(2 * np.pi * n / tau))
+    signal[click : click + CLICK_LEN] = CLICK_AMPLITUDE
+    return (signal.astype(np.int64) + 0x8000).astype(np.uint16)
+
+
+def is_click(words, fraction_bits=FRACTION_BITS):
+    """Which out_val/audio_out words carry the click. It is positive, so
+    an empty word (full scale negative) is not one."""
+    return to_pcm(words, fraction_bits).astype(np.int64) > THRESHOLD
+
+
+def timestamps(
+    samples,
+    click,
+    window_size=WINDOW_SIZE,
+    max_extended=MAX_EXTENDED,
+    samp_play_duration=SAMP_PLAY_DURATION,
+    quantize=None,
+    decimate=1,
+):
+    """Cycle of every stage boundary for the click at sample click, with the
+    click sample's processed_sample_valid at cycle 0 of its sample period."""
+    samples = np.concatenate([[SILENCE], samples]).astype(np.uint16)
+    click += 1
+    window = click // window_size
+    yin = yin_cycles(decimate)
+    blocks = overlap_add(
+        snap(track(frames([samples], window_size), decimate=decimate), quantize),
+        max_extended=max_extended,
+        yin_cycles=yin,
+    )
+    ring = RingPlayout(max_extended, samp_play_duration)
+    first_read = None
+    for block in blocks:
+        for n, (result, start) in enumerate(zip(block.psola, block.starts)):
+            if block.index + n == window:
+                if not result.window_len:
+                    raise ValueError(f"window {window} has tau 0 and never finishes")
+                hits = np.flatnonzero(is_click(result.out))
+                if not len(hits):
+                    raise ValueError(f"click at sample {click} never reaches psola's output")
+                entered = int(start) + int(hits[0])
+            if result.window_len:
+                ring.write(start, result.out)
+                if first_read is None:
+                    first_read = ring.next_read
+    hits = np.flatnonzero(is_click(ring.drain()))
+    if not len(hits):
+        raise ValueError(f"click at sample {click} is never played")
+
+    # top_level_model counts from the end of the window's last sample period
+    valid = (click + 1) * SAMPLE_CYCLES
+    window_end = (window + 1) * window_size * SAMPLE_CYCLES
+    read = first_read + int(hits[0]) * samp_play_duration + RING_CYCLES
+    return {
+        "input": valid - I2S_CYCLES,
+        "i2s": valid,
+        "window": window_end,
+        # bram_wrapper's tau_valid_in, less bufferizer's register
+        "yin": window_end + yin + TAU_REG_CYCLES - 1,
+        "psola": entered,
+        "ring": read,
+        "pdm": read + PDM_CYCLES,
+        "uart": read + PDM_CYCLES + UART_CYCLES,
+    }
+
+
+def budget(stamps):
+    """Budget from a dict of stage timestamps, each counted from the one
+    before it; the first stage counts from "input"."""
+    times = [stamps["input"]] + [stamps[stage] for stage in STAGES]
+    return Budget(*(int(b - a) for a, b in zip(times[:-1], times[1:])))
+
+
+def click_budget(click, window_size=WINDOW_SIZE, **kwargs):
+    """Budget for a click at sample click, with a window of tone after it."""
+    windows = click // window_size + 3
+    return budget(timestamps(click_samples(windows, click, window_size=window_size), click, window_size, **kwargs))
@@ -0,0 +1,140 @@
+"""Synthetic test signals with a known f0 for every window.
+
+Each class is a stack of signals synthesized at once, one row per starting
+note. On disk a class is one 16-bit WAV with its signals back to back, plus
+a -windows.txt with the f0 of every window in Hz (0 where there is no
+pitch), the same format as the contours in test_data, so every script that
+takes those takes a corpus class too.
+"""
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from scipy.io import wavfile
+
+FS = 44100
+WINDOW_SIZE = 2048
+PEAK = 0.5  # of full scale
+
+# Roughly the span of a singing voice, E2 to A5
+LOWEST = 82.41
+HIGHEST = 880.0
+
+# Harmonics stop short of Nyquist so nothing aliases
+MAX_HARMONIC_HZ = 0.45 * FS
+
+# Formants (center, bandwidth in Hz) of an /a/ vowel
+FORMANTS = ((730, 90), (1090, 110), (2440, 170))
+
+VIBRATO_HZ = 5.5
+VIBRATO_CENTS = 50
+NOISY_SNR_DB = 10
+
+# The formant gain of a harmonic moves slowly, so it is worked out once
+# every this many samples
+ENVELOPE_STEP = 64
+
+CLASSES = ("tone", "vowel", "vibrato", "glide", "noisy", "noise", "silence")
+
+
+class PitchClass(NamedTuple):
+    name: str
+    samples: np.ndarray  # int16, every signal back to back
+    f0: np.ndarray  # Hz per window, 0 where there is no pitch
+
+
+def formant_gain(freq):
+    """Spectral envelope of the vowel, a resonance per formant, over a
+    falling glottal source."""
+    freq = np.asarray(freq, dtype=np.float64)
+    gain = np.zeros_like(freq)
+    for center, bandwidth in FORMANTS:
+        gain += 1 / (1 + ((freq - center) / (bandwidth / 2)) ** 2)
+    return (gain + 0.05) * (100 / np.maximum(freq, 100))
+
+
+def synthesize(f0, rng, harmonics=True):
+    """Sum of harmonics of the per-sample f0 contours in the rows of f0,
+    each with a random starting phase."""
+    # Harmonic k is rotation**k, one complex multiply each instead of a sin
+    rotation = np.exp(2j * np.pi * np.cumsum(f0 / FS, axis=-1))
+    harmonic = np.ones_like(rotation)
+    out = np.zeros_like(f0)
+    coarse = f0[:, ::ENVELOPE_STEP]
+    count = int(MAX_HARMONIC_HZ // f0.min()) if harmonics else 1
+    for k in range(1, count + 1):
+        harmonic *= rotation
+        freq = k * coarse
+        gain = np.where(freq < MAX_HARMONIC_HZ, formant_gain(freq) if harmonics else 1.0, 0)
+        gain = np.repeat(gain, ENVELOPE_STEP, axis=-1)[:, : f0.shape[-1]]
+        offset = np.exp(1j * rng.uniform(0, 2 * np.pi, (len(f0), 1)))
+        out += gain * (harmonic * offset).imag
+    return out
+
+
+def quantize(signals):
+    """int16 with each row's peak at PEAK, silent rows left silent."""
+    peak = np.abs(signals).max(axis=-1, keepdims=True)
+    scaled = signals * np.divide(PEAK * 32767, peak, out=np.zeros_like(peak), where=peak > 0)
+    return np.rint(scaled).astype(np.int16)
+
+
+def window_f0(f0, window_size):
+    """Geometric mean of the f0 contour over each window, which is what a
+    period estimate over the whole window lands on."""
+    windows = f0.reshape(len(f0), -1, window_size)
+    return np.exp(np.log(windows).mean(axis=-1))
+
+
+def generate(name, signals=8, windows=16, window_size=WINDOW_SIZE, seed=0):
+    """One class of signals, each windows windows long, starting on notes
+    spread evenly (in pitch) over the voice range."""
+    if name not in CLASSES:
+        raise ValueError(f"unknown class {name}, expected one of {', '.join(CLASSES)}")
+    rng = np.random.default_rng([seed, CLASSES.index(name)])
+    n = windows * window_size
+    t = np.arange(n) / FS
+    notes = np.geomspace(LOWEST, HIGHEST, signals)[:, None]
+
+    if name in ("noise", "silence"):
+        audio = rng.standard_normal((signals, n)) if name == "noise" else np.zeros((signals, n))
+        return PitchClass(name, quantize(audio).ravel(), np.zeros(signals * windows))
+
+    if name == "vibrato":
+        offset = rng.uniform(0, 2 * np.pi, (signals, 1))
+        f0 = notes * 2 ** (VIBRATO_CENTS / 1200 * np.sin(2 * np.pi * VIBRATO_HZ * t + offset))
+    elif name == "glide":
+        # An octave up from the low notes and down from the high ones
+        direction = np.where(notes < np.sqrt(LOWEST * HIGHEST), 1, -1)
+        f0 = notes * 2 ** (direction * t / t[-1])
+    else:
+        f0 = np.broadcast_to(notes, (signals, n)).copy()
+
+    audio = synthesize(f0, rng, harmonics=name != "tone")
+    if name == "noisy":
+        power = (audio**2).mean(axis=-1, keepdims=True)
+        audio += rng.standard_normal(audio.shape) * np.sqrt(power / 10 ** (NOISY_SNR_DB / 10))
+    return PitchClass(name, quantize(audio).ravel(), window_f0(f0, window_size).ravel())
+
+
+def write(directory, classes=CLASSES, **kwargs):
+    """Generate each class into directory as <name>.wav and <name>-windows.txt.
+    Returns the WAV paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in classes:
+        pitch_class = generate(name, **kwargs)
+        path = directory / f"{name}.wav"
+        wavfile.write(path, FS, pitch_class.samples)
+        np.savetxt(directory / f"{name}-windows.txt", pitch_class.f0, fmt="%.3f")
+        paths.append(path)
+    return paths
+
+
+def labels(wav):
+    """f0 per window of a WAV from its -windows.txt, 0 where there is none
+    (written as 0 or inf)."""
+    f0 = np.atleast_1d(np.loadtxt(wav.with_name(f"{wav.stem}-windows.txt"), dtype=np.float64))
+    return np.where(np.isfinite(f0), f0, 0)
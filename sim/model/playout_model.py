@@ -0,0 +1,170 @@
+"""Window-level event model of bufferizer.sv playing out bram_wrapper windows.
+
+bufferizer_model.RingPlayout follows every word through the ring. This model
+only tracks how many words each window adds and how many reads happen
+between windows, so a pitch contour is all it needs:
+
+- window i's output (window_len words, which depends only on tau) starts
+  entering the ring at top_level_model.output_start()
+- once the first window is done, one word is read every SAMP_PLAY_DURATION
+  cycles
+- a read with the ring empty is an underrun (the RTL replays its tail cache)
+- a window that fills the ring is an overrun: the writer laps the reader and
+  a whole ring of words is never played
+
+Between overruns the ring level is a Lindley recursion, which is a
+cumulative sum and a running minimum, so a contour costs a few array passes
+rather than a Python loop per window. Underrun counts match RingPlayout read
+for read.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+import psola_model
+from bufferizer_model import MAX_EXTENDED, SAMP_PLAY_DURATION
+from searcher_model import TAU_BITS, Quantizer
+from top_level_model import DIV_CYCLES, SAMPLE_CYCLES, TAU_REG_CYCLES, WINDOW_SIZE, YIN_CYCLES
+
+# Windows per pass of levels(); an overrun recomputes the rest of its pass
+CHUNK = 4096
+EMPTY = 1 << 40
+
+
+class Playout(NamedTuple):
+    """Per-window playout of one contour; every field has one entry per window."""
+
+    length: np.ndarray  # words the window adds to the ring
+    start: np.ndarray  # cycle its first word enters the ring
+    reads: np.ndarray  # reads since the previous window started
+    slack: np.ndarray  # cycles from start to the first read needing the window
+    underruns: np.ndarray  # reads before start that found the ring empty
+    overruns: np.ndarray  # words never played because this window lapped the reader
+    level: np.ndarray  # words in the ring once the window is in
+
+
+class ExtentTable(NamedTuple):
+    """psola_model.extent() and searcher.sv cycles for every tau."""
+
+    length: np.ndarray
+    cycles: np.ndarray  # phase 2 cycles
+    search_cycles: np.ndarray
+
+
+def extent_table(quantize=None, max_extended=MAX_EXTENDED, window_size=WINDOW_SIZE):
+    """Look-up tables indexed by tau. tau 0 never finishes, so it gets no
+    output and no cycles."""
+    quantize = Quantizer() if quantize is None else quantize
+    length = np.zeros(1 << TAU_BITS, dtype=np.int64)
+    cycles = np.zeros(1 << TAU_BITS, dtype=np.int64)
+    for tau in range(1, 1 << TAU_BITS):
+        e = psola_model.extent(tau, quantize.table[tau], window_size, max_extended)
+        length[tau] = e.window_len
+        cycles[tau] = e.cycles
+    return ExtentTable(length, cycles, quantize.cycles.astype(np.int64))
+
+
+def starts(window, taus, table, window_size=WINDOW_SIZE):
+    """top_level_model.output_start() for every window at once."""
+    tau_valid = (window + 1) * window_size * SAMPLE_CYCLES + YIN_CYCLES + TAU_REG_CYCLES
+    phase1 = np.maximum(DIV_CYCLES, table.search_cycles[taus]) + 2
+    return tau_valid + phase1 + table.cycles[taus] + 4
+
+
+def lindley(z):
+    """p[i] = max(p[i - 1] + z[i], 0) from p[-1] = 0, and how much the floor
+    added at each step."""
+    s = np.cumsum(z)
+    p = s - np.minimum(np.minimum.accumulate(s), 0)
+    return p, p - np.concatenate([[0], p[:-1]]) - z
+
+
+def levels(length, reads, entries, reset=None, chunk=CHUNK):
+    """Ring level with reads before and length words after every window,
+    starting from an empty ring wherever reset is set.
+
+    Pointers are compared modulo entries, so a ring that overfills by x
+    words is left looking like it holds x: the reader plays those and then
+    replays its cache while the other entries words are never read.
+
+    Returns (available, level, underruns, overruns), where available is the
+    level after the reads, before clamping at 0.
+    """
+    n = len(length)
+    reset = np.zeros(n, dtype=bool) if reset is None else reset
+    available = np.empty(n, dtype=np.int64)
+    level = np.empty(n, dtype=np.int64)
+    underruns = np.empty(n, dtype=np.int64)
+    overruns = np.zeros(n, dtype=np.int64)
+
+    i = 0
+    q = 0  # level before window i
+    while i < n:
+        # Until the ring overfills, the level after each window's reads
+        # follows the recursion, the floor absorbing reads of an empty ring
+        end = min(n, i + chunk)
+        z = np.concatenate([[q], length[i : end - 1]]) - reads[i:end]
+        # Deep enough that the floor empties the ring, which is then all
+        # the floor did: a recording's first window has no reads before it
+        z[reset[i:end]] = -EMPTY
+        before, floor = lindley(z)
+        floor[reset[i:end]] = 0
+        after = before + length[i:end]
+        full = np.flatnonzero(after >= entries)
+        k = full[0] + 1 if len(full) else end - i
+        available[i : i + k] = before[:k] - floor[:k]
+        underruns[i : i + k] = floor[:k]
+        level[i : i + k] = after[:k]
+        i += k
+        if len(full):
+            overruns[i - 1] = entries
+            level[i - 1] -= entries
+        q = level[i - 1]
+    return available, level, underruns, overruns
+
+
+def playout(
+    taus,
+    table=None,
+    max_extended=MAX_EXTENDED,
+    samp_play_duration=SAMP_PLAY_DURATION,
+    window_size=WINDOW_SIZE,
+    contours=None,
+):
+    """Playout of every window of a contour of taus from yin.sv.
+
+    Several contours can be run in one go by concatenating them and passing
+    their window counts as contours; each plays from reset. table must come
+    from extent_table() with the same max_extended.
+    """
+    taus = np.asarray(taus, dtype=np.int64) & ((1 << TAU_BITS) - 1)
+    table = extent_table(max_extended=max_extended, window_size=window_size) if table is None else table
+    contours = np.array([len(taus)] if contours is None else contours, dtype=np.int64)
+    contours = contours[contours > 0]
+    first = np.cumsum(contours) - contours
+    contour = np.repeat(np.arange(len(contours)), contours)
+    window = np.arange(len(taus)) - first[contour]
+
+    period = samp_play_duration
+    length = table.length[taus]
+    start = starts(window, taus, table, window_size)
+
+    # LOADING_BUFFER until the first window is done, then a read every period
+    index = np.where(length > 0, np.arange(len(taus)), len(taus))
+    played = np.minimum.reduceat(index, first) if len(taus) else index
+    never = played == len(taus)
+    played[never] = 0
+    first_read = np.where(never, EMPTY, start[played] + length[played] + period + 1)[contour]
+    # Reads at or before start miss the window
+    done = np.where(start >= first_read, (start - first_read) // period + 1, 0)
+    reads = np.diff(done, prepend=0)
+    reads[first] = done[first]
+
+    reset = np.zeros(len(taus), dtype=bool)
+    reset[first] = True
+    available, level, underruns, overruns = levels(length, reads, 2 * max_extended, reset)
+    # The read that takes the first word of the window, late if the ring
+    # ran dry before it
+    slack = first_read + (done + available) * period - start
+    return Playout(length, start, reads, slack, underruns, overruns, level)
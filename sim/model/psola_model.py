@@ -0,0 +1,209 @@
+"""Bit-exact software model of hdl/psola.sv as driven by hdl/bram_wrapper.sv.
+
+A window is cut into grains of up to 2 * tau input samples starting every tau
+samples; grain k is weighted by a triangular window and added into the output
+BRAM at k * shifted_tau. Every (grain, offset) pair is laid out as one flat
+index array and accumulated with np.add.at, so a window costs a few array
+passes instead of the ~2 * WINDOW_SIZE clock cycles the RTL spends on it.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from yin_model import fp_div
+
+WINDOW_SIZE = 2048
+MAX_EXTENDED = 2200
+FRACTION_BITS = 14  # psola.sv default, bram_wrapper.sv instantiates it with 16
+OUT_WIDTH = 32
+DIV_WIDTH = 32
+
+# An output word is read 2 cycles before its item is processed and written 1
+# cycle after, so a read only sees writes from items at least this many
+# cycles older
+HAZARD_CYCLES = 4
+
+
+class PsolaWindow(NamedTuple):
+    """One window of output BRAM contents, as bram_wrapper streams them out."""
+
+    out: np.ndarray  # out_val words for out_addr 0 .. window_len - 1
+    window_len: int  # window_len_out
+    dropped: int  # writes at or beyond MAX_EXTENDED, which the BRAM ignores
+    cycles: int  # cycles spent in phase 2
+
+
+class Extent(NamedTuple):
+    """The parts of a PsolaWindow that depend only on the taus."""
+
+    window_len: int
+    dropped: int
+    cycles: int
+
+
+def addr_width(max_extended):
+    return max(int(max_extended - 1).bit_length(), 1)
+
+
+def inv_tau(tau, fraction_bits=FRACTION_BITS):
+    """inv_tau_in: 1 / tau with fraction_bits fraction bits, from fp_div."""
+    return int(fp_div(1, tau, DIV_WIDTH, fraction_bits))
+
+
+def window_func(offset, tau, inv, fraction_bits=FRACTION_BITS):
+    """window_func_val_piped: rises to 1.0 at offset tau and falls back to 0."""
+    offset = np.asarray(offset, dtype=np.int64)
+    ramp = offset * inv
+    val = np.where(offset < tau, ramp, (2 << fraction_bits) - ramp)
+    # Wraps like the 32 bit expression, then loses its top bit in the pipeline
+    return val & ((1 << (fraction_bits + 3)) - 1)
+
+
+def grains(tau, shifted_tau, window_size=WINDOW_SIZE):
+    """Input start i, output start j and length of every grain psola.sv runs.
+
+    Grains start every tau samples while i + tau < window_size, and stop
+    short at the end of the window.
+    """
+    i = np.arange(0, max(window_size - tau, 0), tau, dtype=np.int64)
+    j = np.arange(len(i), dtype=np.int64) * shifted_tau
+    length = np.minimum(2 * tau, window_size - i)
+    return i, j, length
+
+
+def items(tau, shifted_tau, window_size=WINDOW_SIZE):
+    """Grain and offset of every (grain, offset) item, in processing order."""
+    i, j, length = grains(tau, shifted_tau, window_size)
+    count = int(length.sum())
+    grain = np.repeat(np.arange(len(i)), length)
+    offset = np.arange(count) - np.repeat(np.cumsum(length) - length, length)
+    return i, j, grain, offset
+
+
+def out_len(addr, mask):
+    """window_len_out: wraps with the address, then keeps growing from 0."""
+    wrapped = np.flatnonzero(addr == mask)
+    tail = addr[wrapped[-1] + 1 :] if len(wrapped) else addr
+    window_len = int(tail.max()) + 1 if len(tail) else 0
+    if not len(wrapped):
+        window_len = max(window_len, 1)
+    return window_len
+
+
+def extent(tau, shifted_tau, window_size=WINDOW_SIZE, max_extended=MAX_EXTENDED):
+    """Output length, dropped writes and phase 2 cycles of a window, without
+    needing its samples."""
+    tau = int(tau)
+    if tau == 0:
+        raise ValueError("psola.sv never finishes a window with tau == 0")
+    mask = (1 << addr_width(max_extended)) - 1
+    i, j, grain, offset = items(tau, int(shifted_tau), window_size)
+    addr = (j[grain] + offset) & mask
+    return Extent(
+        out_len(addr, mask),
+        int(np.count_nonzero(addr >= max_extended)),
+        len(grain) + len(i) + 3,
+    )
+
+
+def psola(
+    window,
+    tau,
+    shifted_tau,
+    fraction_bits=FRACTION_BITS,
+    max_extended=MAX_EXTENDED,
+):
+    """Run one window through psola.sv and return the output BRAM contents.
+
+    window is the 16 bit offset-binary signal BRAM half being processed. The
+    output BRAM is assumed clear, which bram_wrapper guarantees by zeroing
+    every word it streams out. The RTL never leaves phase 2 for tau == 0, so
+    that case raises.
+    """
+    window = np.asarray(window, dtype=np.int64)
+    window_size = len(window)
+    tau = int(tau)
+    shifted_tau = int(shifted_tau)
+    if tau == 0:
+        raise ValueError("psola.sv never finishes a window with tau == 0")
+    mask = (1 << addr_width(max_extended)) - 1
+
+    # One entry per (grain, offset) item, in the order the RTL processes them
+    i, j, grain, offset = items(tau, shifted_tau, window_size)
+    count = len(grain)
+    # Every grain ends with an idle cycle while i and j step
+    time = np.arange(count) + grain
+    sample = window[i[grain] + offset]
+    addr = (j[grain] + offset) & mask
+
+    inv = inv_tau(tau, fraction_bits)
+    overwrite = (i[grain] + offset < tau) | (
+        (i[grain] + 2 * tau > window_size) & (offset > tau)
+    )
+    value = np.where(
+        overwrite,
+        sample << fraction_bits,
+        sample * window_func(offset, tau, inv, fraction_bits),
+    )
+
+    mem = accumulate(addr, time, value, overwrite, mask + 1)
+    mem &= (1 << OUT_WIDTH) - 1
+
+    window_len = out_len(addr, mask)
+
+    out = mem[:window_len].copy()
+    out[max_extended:] = 0  # undefined in the RTL
+    return PsolaWindow(
+        out,
+        window_len,
+        int(np.count_nonzero(addr >= max_extended)),
+        count + len(i) + 3,
+    )
+
+
+def accumulate(addr, time, value, overwrite, depth):
+    """Final output BRAM words after every item's read-modify-write.
+
+    Normally each word ends up as its last overwrite plus every addition
+    after it. Items that hit a word within HAZARD_CYCLES of the previous
+    write to it read the stale value instead; those words are replayed
+    item by item.
+    """
+    mem = np.zeros(depth, dtype=np.int64)
+    if not len(addr):
+        return mem
+
+    order = np.lexsort((time, addr))
+    same = addr[order][1:] == addr[order][:-1]
+    close = same & (np.diff(time[order]) < HAZARD_CYCLES)
+    hazard = np.zeros(depth, dtype=bool)
+    hazard[addr[order][1:][close]] = True
+    clean = ~hazard[addr]
+
+    last = np.full(depth, -1, dtype=np.int64)
+    ow = clean & overwrite
+    np.maximum.at(last, addr[ow], time[ow])
+    keep = clean & (time >= last[addr])
+    np.add.at(mem, addr[keep], value[keep])
+
+    for a in np.flatnonzero(hazard):
+        items = np.flatnonzero(addr == a)  # already in time order
+        written = []  # (time, word) of every write so far
+        for k in items:
+            seen = [w for t, w in written if t <= time[k] - HAZARD_CYCLES]
+            base = seen[-1] if seen else 0
+            written.append((time[k], value[k] if overwrite[k] else base + value[k]))
+        mem[a] = written[-1][1]
+    return mem
+
+
+def psola_stream(windows, taus, shifted_taus, **kwargs):
+    """PsolaWindow for each window, like consecutive bram_wrapper runs."""
+    for window, tau, shifted_tau in zip(windows, taus, shifted_taus):
+        yield psola(window, tau, shifted_tau, **kwargs)
+
+
+def to_audio(out, fraction_bits=FRACTION_BITS):
+    """Signed floating point samples from out_val words, as the benches plot."""
+    return np.asarray(out) / (1 << fraction_bits) - 32768
@@ -0,0 +1,97 @@
+"""Lookup-table model of hdl/searcher.sv, the semitone quantizer.
+
+The RTL scans the semitones.mem ROM for the first period at or above tau,
+two cycles per entry. Because the ROM read lags the address by one compare,
+entry 0 is compared twice and the last entry is compared when the address
+hits BRAM_SIZE. Ties go to the shorter period. closest_table() runs that
+scan for every 11 bit tau at once, so quantizing is a single indexing op.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+WIDTH = 12
+BRAM_SIZE = 64
+TAU_BITS = 11
+
+ROM_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "semitones.mem"
+A4 = 44100 / 440  # period of A4 in samples
+
+# Pitch classes above the root in each scale
+SCALES = {
+    "chromatic": tuple(range(12)),
+    "major": (0, 2, 4, 5, 7, 9, 11),
+    "minor": (0, 2, 3, 5, 7, 8, 10),
+    "pentatonic": (0, 2, 4, 7, 9),
+}
+
+
+def generate(scale="chromatic", root=0, low=-25, high=40):
+    """Periods like scripts/initialize_rom.py, keeping only notes in the scale.
+
+    Index i is i semitones below A4; root is the scale's root in semitones
+    above A. scale is a name from SCALES or a sequence of pitch classes.
+    """
+    steps = SCALES[scale] if isinstance(scale, str) else scale
+    keep = {s % 12 for s in steps}
+    return [int(A4 * (2 ** (i / 12))) for i in range(low, high) if (-i - root) % 12 in keep]
+
+
+def fit_rom(periods, size=BRAM_SIZE):
+    """ROM contents as the BRAM holds them: the first size entries, and
+    short tables padded with their last entry so the scan stays monotonic."""
+    rom = np.asarray(periods[:size], dtype=np.int64)
+    return np.concatenate([rom, np.full(size - len(rom), rom[-1])])
+
+
+def load_rom(path=ROM_PATH, size=BRAM_SIZE):
+    with open(path) as f:
+        return fit_rom([int(line, 16) for line in f if line.strip()], size)
+
+
+def write_rom(path, periods):
+    """Write periods as a .mem file in the format initialize_rom.py uses."""
+    with open(path, "w") as rom_file:
+        rom_file.write("\n".join(hex(int(p)) for p in periods))
+
+
+def search(rom, search_val, width=WIDTH):
+    """(closest_value, cycles from start_search to closest_value_found)."""
+    rom = np.asarray(rom, dtype=np.int64)
+    x = np.asarray(search_val, dtype=np.int64)[..., None]
+
+    # Values compared on each step, and prev_diff going into that step
+    seen = np.concatenate([rom[:1], rom])
+    prev_diff = np.where(np.arange(len(seen)) == 0, (1 << width) - 1, x - np.roll(seen, 1))
+
+    hit = seen >= x
+    step = np.where(hit.any(axis=-1), hit.argmax(axis=-1), len(seen) - 1)
+    val = seen[step]
+    prev = np.take_along_axis(prev_diff, step[..., None], axis=-1)[..., 0]
+    x = x[..., 0]
+
+    closest = np.where((val >= x) & (prev <= val - x), x - prev, val)
+    return closest, 2 * step + 1
+
+
+def closest_table(rom=None, width=WIDTH):
+    """closest_value for every tau below 2**TAU_BITS."""
+    rom = load_rom() if rom is None else rom
+    return search(rom, np.arange(1 << TAU_BITS), width)[0]
+
+
+class Quantizer:
+    """Snaps taus to the ROM periods searcher.sv would pick."""
+
+    def __init__(self, rom=None):
+        self.rom = load_rom() if rom is None else fit_rom(rom)
+        self.table, self.cycles = search(self.rom, np.arange(1 << TAU_BITS))
+
+    @classmethod
+    def from_scale(cls, scale="chromatic", root=0):
+        return cls(generate(scale, root))
+
+    def __call__(self, taus):
+        """Closest period for a tau or an array of taus."""
+        return self.table[np.asarray(taus) & ((1 << TAU_BITS) - 1)]
@@ -0,0 +1,177 @@
+"""Streaming software model of the audio path through hdl/top_level.sv.
+
+Each stage is a generator that takes and yields Blocks of consecutive
+windows, mirroring the hardware dataflow:
+
+    frames -> track (yin) -> snap (searcher) -> overlap_add (psola) -> playout
+
+so a recording streams through without ever being held in memory whole.
+Cycle counts follow the RTL closely enough to place every window's output in
+the bufferizer ring, which is what decides what actually gets played.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+import decimator_model
+import psola_model
+import yin_model
+from bufferizer_model import MAX_EXTENDED, RingPlayout
+from searcher_model import TAU_BITS, Quantizer
+
+WINDOW_SIZE = 2048
+TAUMAX = 2048
+FRACTION_BITS = 16  # bram_wrapper's psola
+BATCH = 64  # windows per block
+
+# i2s_receiver.sv: 64 sclk periods of 36 cycles per sample
+SAMPLE_CYCLES = 64 * 36
+
+# yin.sv scores the previous window while the next one comes in, starting
+# with its first sample
+YIN_CYCLES = yin_model.hop_timing(WINDOW_SIZE, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX).latency
+# With DECIMATE > 1, decimator.sv's sample for a group comes out this many
+# cycles after the group's last one goes in
+DECIMATOR_CYCLES = 2
+CIC_ORDER = 3
+TAU_REG_CYCLES = 2  # taumin registers in top_level and bufferizer
+DIV_CYCLES = 11  # psola's 1 / tau fp_div
+
+
+class Block(NamedTuple):
+    index: int  # number of the first window
+    windows: np.ndarray  # (n, WINDOW_SIZE) offset-binary samples
+    taus: Optional[np.ndarray] = None
+    shifted_taus: Optional[np.ndarray] = None
+    search_cycles: Optional[np.ndarray] = None
+    psola: Optional[list] = None  # PsolaWindow per window
+    starts: Optional[np.ndarray] = None  # cycle each output starts entering the ring
+
+
+def yin_cycles(decimate=1):
+    """Cycles from a window's last processed_sample_valid to yin's taumin,
+    with yin behind a decimate by decimate stage when that is over 1."""
+    if decimate == 1:
+        return YIN_CYCLES
+    timing = decimator_model.cost(decimate, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX).timing
+    return DECIMATOR_CYCLES + timing.latency
+
+
+def wav_samples(source, block_size=1 << 16):
+    """Offset-binary sample blocks from a WavSource, as the I2S receiver gives them."""
+    for start in range(0, len(source.samples), block_size):
+        yield source.samples[start : start + block_size].view(np.uint16) ^ 0x8000
+
+
+def frames(samples, window_size=WINDOW_SIZE, batch=BATCH):
+    """Blocks of whole windows from an iterable of sample arrays. A trailing
+    partial window is dropped."""
+    pending = []
+    count = 0
+    index = 0
+    for chunk in samples:
+        pending.append(np.asarray(chunk, dtype=np.uint16))
+        count += len(chunk)
+        if count < batch * window_size:
+            continue
+
+        data = np.concatenate(pending)
+        n = len(data) // window_size
+        yield Block(index, data[: n * window_size].reshape(n, window_size))
+        index += n
+        pending = [data[n * window_size :]]
+        count = len(pending[0])
+
+    if count >= window_size:
+        data = np.concatenate(pending)
+        n = len(data) // window_size
+        yield Block(index, data[: n * window_size].reshape(n, window_size))
+
+
+def track(blocks, taumax=TAUMAX, decimate=1):
+    """taumin from yin.sv for every window, in full rate samples, behind
+    top_level's decimator when decimate is over 1."""
+    # The CIC filter runs on from one block into the next, so each block
+    # is filtered with enough of the last one in front of it. Zeros are
+    # what the filter holds after reset
+    history = np.zeros(CIC_ORDER * decimate, dtype=np.uint16)
+    for block in blocks:
+        if decimate == 1:
+            yield block._replace(taus=yin_model.yin(block.windows, taumax).taumin[:, -1])
+            continue
+        samples = np.concatenate([history, block.windows.ravel()])
+        history = samples[-len(history) :]
+        decimated = decimator_model.cic(samples, decimate, CIC_ORDER)[CIC_ORDER:]
+        windows = decimated.reshape(len(block.windows), -1)
+        taus = yin_model.yin(windows, taumax // decimate).taumin[:, -1].astype(np.int64) * decimate
+        yield block._replace(taus=taus)
+
+
+def snap(blocks, quantize=None):
+    """Period searcher.sv snaps each tau to, and how long the search takes."""
+    quantize = Quantizer() if quantize is None else quantize
+    for block in blocks:
+        taus = block.taus & ((1 << TAU_BITS) - 1)
+        yield block._replace(
+            shifted_taus=quantize.table[taus], search_cycles=quantize.cycles[taus]
+        )
+
+
+def output_start(window, search_cycles, psola_cycles, yin_cycles=YIN_CYCLES):
+    """Cycle the first output word of a window is written into the ring."""
+    tau_valid = (window + 1) * WINDOW_SIZE * SAMPLE_CYCLES + yin_cycles + TAU_REG_CYCLES
+    # phase 1 waits on both the divider and the search, plus a cycle each to
+    # register them and switch phase
+    phase1 = max(DIV_CYCLES, int(search_cycles)) + 2
+    # OUTPUT starts the cycle after psola finishes, then 2 BRAM read cycles
+    return tau_valid + phase1 + psola_cycles + 4
+
+
+def overlap_add(blocks, fraction_bits=FRACTION_BITS, max_extended=MAX_EXTENDED, yin_cycles=YIN_CYCLES):
+    """psola.sv output for every window.
+
+    The RTL never finishes a window with tau == 0 (silence); those are
+    modelled as producing no output at all.
+    """
+    empty = psola_model.PsolaWindow(np.zeros(0, dtype=np.int64), 0, 0, 0)
+    for block in blocks:
+        results = []
+        starts = []
+        for n, (window, tau, shifted_tau, search_cycles) in enumerate(
+            zip(block.windows, block.taus, block.shifted_taus, block.search_cycles)
+        ):
+            if tau == 0:
+                results.append(empty)
+                starts.append(-1)
+                continue
+            result = psola_model.psola(window, tau, shifted_tau, fraction_bits, max_extended)
+            results.append(result)
+            starts.append(output_start(block.index + n, search_cycles, result.cycles, yin_cycles))
+        yield block._replace(psola=results, starts=np.array(starts))
+
+
+def playout(blocks, ring=None):
+    """audio_out words as the bufferizer plays them, one array per block."""
+    ring = RingPlayout() if ring is None else ring
+    for block in blocks:
+        for result, start in zip(block.psola, block.starts):
+            if result.window_len:
+                ring.write(start, result.out)
+        # The next window's output can't start before its tau is ready, so
+        # every read before the next window ends is final
+        end = block.index + len(block.windows) + 1
+        yield ring.read_until(end * WINDOW_SIZE * SAMPLE_CYCLES)
+    yield ring.drain()
+
+
+def to_pcm(words, fraction_bits=FRACTION_BITS):
+    """Signed 16 bit samples from audio_out words, as top_level sends them."""
+    words = np.asarray(words, dtype=np.int64)
+    return (((words >> fraction_bits) & 0xFFFF) ^ 0x8000).astype(np.uint16).view(np.int16)
+
+
+def autotune(samples, quantize=None, ring=None, **kwargs):
+    """The whole chain: sample blocks in, audio_out word blocks out."""
+    blocks = frames(samples, kwargs.pop("window_size", WINDOW_SIZE), kwargs.pop("batch", BATCH))
+    return playout(overlap_add(snap(track(blocks), quantize), **kwargs), ring)
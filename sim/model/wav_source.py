@@ -0,0 +1,40 @@
+"""Memory-mapped WAV input shared by the testbenches and scripts.
+
+Nothing is read up front: windows are views into the mapped file and only the
+window being simulated is converted to the offset-binary samples the RTL takes.
+"""
+
+import numpy as np
+from scipy.io import wavfile
+
+
+class WavSource:
+    """Fixed-size windows of a 16-bit WAV file (first channel only)."""
+
+    def __init__(self, path, window_size=2048):
+        self.sample_rate, data = wavfile.read(path, mmap=True)
+        if data.dtype != np.int16:
+            raise ValueError(f"{path}: expected 16-bit PCM, got {data.dtype}")
+        self.samples = data if data.ndim == 1 else data[:, 0]
+        self.window_size = window_size
+
+    def __len__(self):
+        # Trailing partial window is dropped, same as chunks_exact in yin-rs
+        return len(self.samples) // self.window_size
+
+    def raw(self, i):
+        """Signed samples of window i, a view into the mapped file."""
+        if not 0 <= i < len(self):
+            raise IndexError(f"window {i} out of range for {len(self)} windows")
+        return self.samples[i * self.window_size : (i + 1) * self.window_size]
+
+    def __getitem__(self, i):
+        """Offset-binary uint16 samples of window i, as the I2S receiver outputs."""
+        return self.raw(i).view(np.uint16) ^ 0x8000
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def normalized(self, i):
+        """Window i scaled to [-1, 1), matching librosa.load."""
+        return self.raw(i) / np.float32(32768)
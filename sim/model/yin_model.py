@@ -0,0 +1,331 @@
+"""Bit-exact software model of hdl/yin.sv.
+
+Every stage works on a whole window (or a stack of windows along the leading
+axes) at once, so the golden values for a 2048 sample window cost a handful of
+FFTs instead of a cubic Python loop.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+DIFF_WIDTH = 42
+FRACTION_WIDTH = 15
+FP_WIDTH = DIFF_WIDTH + FRACTION_WIDTH
+
+# 0.1 in Q1.15, see EARLY_CD in yin.sv
+EARLY_CD = 0b000110011001100
+
+
+class YinStages(NamedTuple):
+    """Per-tau values of each yin.sv pipeline stage, indexed [..., tau]."""
+
+    diff: np.ndarray  # diff BRAM contents (cd_diff)
+    prefix_sum: np.ndarray  # cd_add
+    div: np.ndarray  # cd_div
+    err: np.ndarray  # cd_div_err
+    mul: np.ndarray  # cd_mul_reg
+    early_out: np.ndarray
+    min_reached: np.ndarray  # next_min_reached
+    cd_min: np.ndarray  # next_cd_min
+    taumin: np.ndarray  # next_taumin, taumin[..., -1] is the module output
+
+
+def tau_width(taumax):
+    return max(int(taumax - 1).bit_length(), 1)
+
+
+def autocorrelation(window, taumax=None):
+    """r[tau] = sum_i w[i] * w[i + tau], exact for 16 bit integer samples.
+
+    Samples are split into bytes so every FFT product stays far below the
+    float64 mantissa and rounding recovers the exact integer result.
+    """
+    w = np.asarray(window, dtype=np.int64)
+    n = w.shape[-1]
+    taumax = n if taumax is None else taumax
+    nfft = 1 << (n + taumax).bit_length()
+
+    hi = np.fft.rfft(w >> 8, nfft)
+    lo = np.fft.rfft(w & 0xFF, nfft)
+
+    def corr(spectrum):
+        out = np.fft.irfft(spectrum, nfft)[..., :taumax]
+        return np.rint(out).astype(np.int64)
+
+    hh = corr(np.conj(hi) * hi)
+    hl = corr(2 * (np.conj(hi) * lo).real)
+    ll = corr(np.conj(lo) * lo)
+    return (hh << 16) + (hl << 8) + ll
+
+
+def difference(window, taumax=None, width=DIFF_WIDTH):
+    """d[tau] = sum over sample pairs tau apart of (w[s1] - w[s2])**2,
+    wrapping at width bits like the diff BRAMs, or exact with width None.
+
+    Lags at or beyond the window length are zero, which is what the diff
+    BRAMs hold for a partially received window.
+    """
+    w = np.asarray(window, dtype=np.int64)
+    n = w.shape[-1]
+    taumax = n if taumax is None else taumax
+    lags = min(taumax, n)
+
+    energy = np.zeros(w.shape[:-1] + (n + 1,), dtype=np.int64)
+    np.cumsum(w * w, axis=-1, out=energy[..., 1:])
+
+    # sum_{i < n-tau} w[i]^2 + sum_{i >= tau} w[i]^2 - 2 r[tau]
+    tau = np.arange(lags)
+    diff = np.zeros(w.shape[:-1] + (taumax,), dtype=np.int64)
+    if lags:
+        diff[..., :lags] = (
+            energy[..., n - tau]
+            + energy[..., -1:]
+            - energy[..., tau]
+            - 2 * autocorrelation(w, lags)
+        )
+    return diff if width is None else diff & ((1 << width) - 1)
+
+
+class DiffTracker:
+    """Running diff BRAM contents while a window is being received.
+
+    Each push costs O(taumax), mirroring the per-sample accumulation in
+    yin.sv. After a push, diff holds what the diff BRAMs read for the new
+    sample and added what gets written back.
+    """
+
+    def __init__(self, window_size, taumax=None):
+        self.window_size = window_size
+        self.taumax = window_size if taumax is None else taumax
+        self.samples = np.zeros(window_size, dtype=np.int64)
+        self.diff = np.zeros(self.taumax, dtype=np.int64)
+        self.added = np.zeros(self.taumax, dtype=np.int64)
+        self.count = 0
+
+    def reset(self):
+        self.diff[:] = 0
+        self.added[:] = 0
+        self.count = 0
+
+    def push(self, sample):
+        if self.count == self.window_size:
+            self.reset()
+
+        k = self.count
+        lags = min(k, self.taumax - 1)
+        self.samples[k] = sample
+        self.diff[:] = self.added
+
+        # w[k-1], w[k-2], ... pair with the new sample at tau 1, 2, ...
+        delta = self.samples[k - lags : k][::-1] - sample
+        self.added[1 : lags + 1] += delta * delta
+        self.added &= (1 << DIFF_WIDTH) - 1
+        self.count += 1
+
+
+def slide(diff, window, new):
+    """difference() of the window moved on by the samples in new.
+
+    Rather than a window's worth of FFTs, this adds the pairs each new sample
+    makes with the samples before it and retires the pairs of the samples
+    falling out the front, as yin.sv's sliding mode does one sample at a time.
+    diff is difference(window, taumax); the result is the same for
+    window[len(new):] followed by new.
+    """
+    w = np.concatenate([window, new]).astype(np.int64)
+    n = len(window)
+    h = len(new)
+    taumax = diff.shape[-1]
+    tau = np.arange(taumax)
+
+    energy = np.zeros(n + h + 1, dtype=np.int64)
+    np.cumsum(w * w, out=energy[1:])
+
+    # New sample n+j pairs with n+j-tau, old sample i with i+tau. A pair
+    # from an old sample to a new one turns up in both sums and cancels, so
+    # neither needs to stop at the other end of the window
+    cross_new = np.correlate(w[n - taumax + 1 :], w[n:])[::-1]
+    cross_old = np.correlate(w[: taumax - 1 + h], w[:h])
+    added = energy[-1] - energy[n] + energy[n + h - tau] - energy[n - tau] - 2 * cross_new
+    retired = energy[h] + energy[h + tau] - energy[tau] - 2 * cross_old
+    return (diff + added - retired) & ((1 << DIFF_WIDTH) - 1)
+
+
+def sliding_diff(samples, hop, window_size, taumax=None):
+    """Diff BRAM contents at every hop yin.sv's sliding mode outputs a tau
+    for: the last window_size samples every hop samples, from the first hop
+    with a whole window in. Returns (ends, diffs), ends counting samples."""
+    samples = np.asarray(samples, dtype=np.int64)
+    taumax = window_size if taumax is None else taumax
+    first = -(-window_size // hop) * hop
+    ends = np.arange(first, len(samples) + 1, hop)
+    diffs = np.zeros((len(ends), taumax), dtype=np.int64)
+    if not len(ends):
+        return ends, diffs
+    if hop >= window_size:
+        # Windows that don't overlap have nothing to carry over
+        starts = ends[:, None] - window_size
+        return ends, difference(samples[starts + np.arange(window_size)], taumax)
+
+    diffs[0] = difference(samples[first - window_size : first], taumax)
+    for k in range(1, len(ends)):
+        end = ends[k]
+        diffs[k] = slide(
+            diffs[k - 1], samples[end - hop - window_size : end - hop], samples[end - hop : end]
+        )
+    return ends, diffs
+
+
+def prefix_sum(diff):
+    """cd_add: running sum of the diff function, wrapping at DIFF_WIDTH."""
+    return np.cumsum(diff, axis=-1) & ((1 << DIFF_WIDTH) - 1)
+
+
+def fp_div(dividend, divisor, width=FP_WIDTH, fraction_width=FRACTION_WIDTH):
+    """quotient_out of hdl/fp_div.sv: restoring division, one bit per step.
+
+    Produces FRACTION_WIDTH + 1 quotient bits (1 integer bit). Division by
+    zero yields all ones, like the RTL; callers check err themselves.
+    """
+    int_width = width - fraction_width
+    d = np.asarray(dividend, dtype=np.int64) & ((1 << int_width) - 1)
+    div = np.asarray(divisor, dtype=np.int64) & ((1 << int_width) - 1)
+    mask = (1 << (int_width + 1)) - 1
+
+    q = np.zeros(np.broadcast(d, div).shape, dtype=np.int64)
+    for _ in range(fraction_width + 1):
+        bit = div <= d
+        d = (np.where(bit, d - div, d) << 1) & mask
+        q = (q << 1) | bit
+    return q
+
+
+def cmndf(diff, cumdiff):
+    """Tau-scaled cumulative mean normalized difference: (div, err, mul)."""
+    taumax = diff.shape[-1]
+    err = cumdiff == 0
+    div = fp_div(diff, cumdiff)
+    mul = np.where(err, 1 << FRACTION_WIDTH, div * np.arange(taumax))
+    return div, err, mul
+
+
+def minimum(mul, early_cd=EARLY_CD):
+    """Min search with early out, per tau: (early_out, min_reached, cd_min, taumin).
+
+    A tau only replaces the running minimum when strictly smaller. Once the
+    minimum is below early_cd, the first tau that fails to improve it freezes
+    the search for the rest of the window.
+    """
+    mul = np.asarray(mul, dtype=np.int64)
+    taumax = mul.shape[-1]
+    tau = np.arange(taumax)
+    init = (1 << (FRACTION_WIDTH + tau_width(taumax) + 1)) - 1
+
+    running = np.minimum.accumulate(
+        np.concatenate([np.full(mul.shape[:-1] + (1,), init), mul], axis=-1), axis=-1
+    )
+    before = running[..., :-1]
+    update = mul < before
+    early_out = before < early_cd
+
+    reached = early_out & ~update
+    first = np.where(reached.any(axis=-1), reached.argmax(axis=-1), taumax)[..., None]
+    min_reached = tau >= first
+
+    # Freeze everything at the state reached just before the early out
+    frozen = np.minimum(tau, first)
+    cd_min = np.take_along_axis(running, frozen + 1, axis=-1)
+    last_update = np.maximum.accumulate(np.where(update, tau, 0), axis=-1)
+    taumin = np.take_along_axis(last_update, frozen, axis=-1)
+    return early_out, min_reached, cd_min, taumin
+
+
+def yin(window, taumax=None):
+    """Run every yin.sv stage on one window (or a stack of windows)."""
+    diff = difference(window, taumax)
+    cumdiff = prefix_sum(diff)
+    div, err, mul = cmndf(diff, cumdiff)
+    early_out, min_reached, cd_min, taumin = minimum(mul)
+    return YinStages(
+        diff, cumdiff, div, err, mul, early_out, min_reached, cd_min, taumin
+    )
+
+
+def sliding(samples, hop, window_size, taumax=None):
+    """Every yin.sv stage for each window of its sliding mode (HOP < WINDOW_SIZE).
+
+    Returns (ends, stages), with the window ending at sample ends[k] in row
+    k of each stage. hop == window_size gives the block mode's windows.
+    """
+    ends, diff = sliding_diff(samples, hop, window_size, taumax)
+    cumdiff = prefix_sum(diff)
+    div, err, mul = cmndf(diff, cumdiff)
+    early_out, min_reached, cd_min, taumin = minimum(mul)
+    return ends, YinStages(
+        diff, cumdiff, div, err, mul, early_out, min_reached, cd_min, taumin
+    )
+
+
+class HopTiming(NamedTuple):
+    """yin.sv's timing in clock cycles for one hop setting."""
+
+    interval: int  # between taumins
+    sample_busy: int  # sample BRAM passes per sample, must fit a sample period
+    hop_busy: int  # passes plus the CMNDF pass, per taumin
+    latency: int  # last sample of a window valid -> valid_out
+    fits: bool  # passes fit a sample and the CMNDF pass fits a hop
+
+
+def hop_timing(hop, sample_cycles, window_size, taumax=None):
+    """Cycle budget of yin.sv with HOP = hop. The block mode starts the CMNDF
+    pass with the next window's first sample; the sliding one copies the
+    diff BRAMs in that sample's first pass, then starts it."""
+    taumax = window_size if taumax is None else taumax
+    # read_addr_s steps through window_size / 4 reads, two cycles each, and
+    # the pass ends when the last one reaches stage 5
+    pass_cycles = window_size // 2 + 4
+    cmndf_cycles = (taumax // 4) * 16
+    sliding = hop < window_size
+    passes = 2 if sliding else 1
+    # valid_out is registered after the last compare
+    latency = sample_cycles + (pass_cycles if sliding else 0) + cmndf_cycles + 1
+    return HopTiming(
+        interval=hop * sample_cycles,
+        sample_busy=passes * pass_cycles,
+        hop_busy=hop * passes * pass_cycles + cmndf_cycles,
+        latency=latency,
+        # The next hop's last pass resets the CMNDF pass
+        fits=passes * pass_cycles < sample_cycles
+        and latency < hop * sample_cycles + passes * pass_cycles,
+    )
+
+
+def reference_tau(windows, taumax=None, threshold=0.1):
+    """Floating point YIN as implemented by yin-rs, one tau per window.
+
+    The first tau whose CMNDF drops below threshold is followed downhill to
+    its local minimum; without one, the global minimum over tau >= 1 wins.
+    Windows that are all silence return 0.
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.int64))
+    n = windows.shape[-1]
+    taumax = n if taumax is None else taumax
+    tau = np.arange(taumax)
+
+    # Exact, so a loud window doesn't wrap the way it does in the diff BRAMs
+    diff = difference(windows, taumax, width=None)[:, 1:].astype(np.float64)
+    cmndf = np.full((len(windows), taumax), np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cmndf[:, 1:] = tau[1:] * diff / np.cumsum(diff, axis=-1)
+    cmndf[np.isnan(cmndf)] = np.inf
+
+    below = cmndf < threshold
+    first = np.where(below.any(axis=-1), below.argmax(axis=-1), taumax)[:, None]
+    stop = np.ones_like(below)
+    stop[:, :-1] = ~(cmndf[:, 1:] < cmndf[:, :-1])
+    walked = np.where(stop & (tau >= first), tau, taumax - 1).min(axis=-1)
+
+    best = cmndf.argmin(axis=-1)
+    best[~np.isfinite(cmndf.min(axis=-1))] = 0
+    return np.where(first[:, 0] < taumax, walked, best)
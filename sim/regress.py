@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Run every sim/test_*.py bench concurrently and summarize the results.
+
+Each bench runs as its own process through its main(), so it builds into its
+own sim_build/ directory (see bench.py) and its output goes to a log there.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+SIM_PATH = Path(__file__).resolve().parent
+PROJ_PATH = SIM_PATH.parent
+BUILD_ROOT = PROJ_PATH / "sim_build"  # bench.BUILD_ROOT, without importing cocotb
+
+# Benches run a second time with extra environment. They share a build
+# directory with the plain run, so they go after everything else is done
+VARIANTS = [
+    # Checks the stitched shards against a single process run
+    ("test_psola_bram", {"SHARDS": "2"}),
+]
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def discover(patterns):
+    benches = sorted(p.stem for p in SIM_PATH.glob("test_*.py"))
+    if patterns:
+        benches = [b for b in benches if any(p in b for p in patterns)]
+    return benches
+
+
+def bench_env(sim, waves=None):
+    """Environment for a bench process, with sim and sim/model importable."""
+    env = dict(os.environ, SIM=sim)
+    if waves:
+        env["WAVES"] = waves
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(SIM_PATH), str(SIM_PATH / "model")] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    return env
+
+
+def variant_name(bench, extra):
+    return " ".join([bench] + [f"{k}={v}" for k, v in extra.items()])
+
+
+def log_name(extra):
+    return "regress.log" if not extra else f"regress-{'-'.join(f'{k}{v}' for k, v in extra.items())}.log"
+
+
+def run_bench(bench, sim, env, extra=None):
+    directory = BUILD_ROOT / f"{bench}-{sim}"
+    directory.mkdir(parents=True, exist_ok=True)
+    status = directory / "status.json"
+    status.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    with open(directory / log_name(extra), "w") as log:
+        proc = subprocess.run(
+            [sys.executable, str(SIM_PATH / f"{bench}.py")],
+            cwd=SIM_PATH,
+            env=dict(env, **(extra or {})),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    result = {
+        "bench": variant_name(bench, extra or {}),
+        "log": directory / log_name(extra),
+        "returncode": proc.returncode,
+        "wall": time.perf_counter() - start,
+    }
+    if status.exists():
+        with open(status) as f:
+            result.update(json.load(f))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cocotb benches in parallel")
+    parser.add_argument("benches", nargs="*", help="only run benches whose name contains one of these")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="benches to run at once")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument(
+        "--waves",
+        choices=["fail", "all"],
+        help="dump waveforms for failing benches or all of them, see bench.py for WAVE_* limits",
+    )
+    args = parser.parse_args()
+
+    benches = discover(args.benches)
+    if not benches:
+        eprint("No benches match")
+        sys.exit(69)
+
+    env = bench_env(args.sim, args.waves)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_bench, bench, args.sim, env) for bench in benches]
+        for future in as_completed(futures):
+            result = future.result()
+            passed = result["returncode"] == 0
+            print(f"{'PASS' if passed else 'FAIL'} {result['bench']} ({result['wall']:.1f}s)", flush=True)
+        results = [future.result() for future in futures]
+    for bench, extra in VARIANTS:
+        if bench in benches:
+            result = run_bench(bench, args.sim, env, extra)
+            # A variant that quietly ran unsharded checked nothing
+            shards = int(extra.get("SHARDS", 1))
+            if result.get("shards", shards) != shards:
+                eprint(f"{result['bench']} ran {result['shards']} shard(s), not {shards}")
+                result["returncode"] = result["returncode"] or 1
+            passed = result["returncode"] == 0
+            print(f"{'PASS' if passed else 'FAIL'} {result['bench']} ({result['wall']:.1f}s)", flush=True)
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"{'bench':26} {'result':6} {'tests':>7} {'build':>12} {'test':>15} {'wall':>8}")
+    for r in results:
+        if "tests" in r:
+            outcome = "PASS" if r["returncode"] == 0 else "FAIL"
+            tests = f"{r['tests'] - r['failed']}/{r['tests']}"
+            build = f"{r['build_time']:.1f}s" + ("" if r["rebuilt"] else " cached")
+            test = f"{r['test_time']:.1f}s" + (" cached" if r.get("cached") else "")
+        else:
+            # Never got as far as running the tests
+            outcome, tests, build, test = "ERROR", "-", "-", "-"
+        print(f"{r['bench']:26} {outcome:6} {tests:>7} {build:>12} {test:>15} {r['wall']:7.1f}s")
+
+    failed = [r for r in results if r["returncode"] != 0]
+    print(f"\n{len(results) - len(failed)}/{len(results)} benches passed in {elapsed:.1f}s")
+    for r in failed:
+        print(f"  see {r['log']}")
+    for r in results:
+        if r.get("traced"):
+            print(f"  waves for {r['bench']} (seed {r['seed']}) in {r['log'].parent}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
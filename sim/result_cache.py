@@ -0,0 +1,97 @@
+"""Size-bounded LRU cache of simulation outputs, keyed by content hashes.
+
+Entries are .npz files of whatever arrays a bench saved; the least recently
+used ones are evicted once the cache grows past its size limit. Hit and miss
+counts are kept alongside so they add up across runs and parallel benches.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+def content_key(*parts):
+    """Hash of each part: file contents for paths, repr for anything else."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            h.update(part.name.encode())
+            h.update(part.read_bytes())
+        else:
+            h.update(repr(part).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key):
+        return self.root / f"{key}.npz"
+
+    @contextmanager
+    def locked(self):
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def get(self, key):
+        """Arrays stored under key, or None. A hit marks the entry as used."""
+        path = self.path(key)
+        with self.locked():
+            hit = path.exists()
+            if hit:
+                os.utime(path)
+            self._count("hits" if hit else "misses")
+        if not hit:
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def put(self, key, npz):
+        """Store a saved .npz under key, then evict down to max_bytes."""
+        tmp = self.root / f".{key}.{os.getpid()}"
+        tmp.write_bytes(Path(npz).read_bytes())
+        with self.locked():
+            os.replace(tmp, self.path(key))
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self.root.glob("*.npz"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink()
+            self._count("evictions")
+
+    def _count(self, field):
+        path = self.root / "stats.json"
+        stats = json.loads(path.read_text()) if path.exists() else {}
+        stats[field] = stats.get(field, 0) + 1
+        path.write_text(json.dumps(stats))
+
+    def stats(self):
+        path = self.root / "stats.json"
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if path.exists():
+            stats.update(json.loads(path.read_text()))
+        entries = list(self.root.glob("*.npz"))
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(p.stat().st_size for p in entries)
+        return stats
+
+    def summary(self):
+        s = self.stats()
+        return (
+            f"result cache: {s['hits']} hits, {s['misses']} misses, {s['evictions']} evictions, "
+            f"{s['entries']} entries, {s['bytes'] / 1e6:.1f}/{self.max_bytes / 1e6:.0f} MB"
+        )
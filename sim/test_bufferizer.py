@@ -1,4 +1,3 @@
-import os
 import sys
 from pathlib import Path
 
@@ -6,10 +5,13 @@ import cocotb
 import matplotlib.pyplot as plt
 import numpy as np
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
+
+import bench
 from scipy.io import wavfile
 
+from wav_source import WavSource
+
 SAMPLE_RATE = 44100
 WINDOW_SIZE = 2048
 FRACTION_BITS = 14
@@ -43,16 +45,14 @@ async def test_bufferizer(dut):
     tau_inS_PATH = BASE_PATH / "test_data" / "slide-windows.txt"
 
     # Load the audio file and tau_ins from YIN
-    # input_wave, _ = librosa.load(AUDIO_PATH, sr=SAMPLE_RATE)
-    _, input_wave = wavfile.read(AUDIO_PATH)
-    input_wave = input_wave.view(dtype=np.uint16) ^ 0x8000
+    source = WavSource(AUDIO_PATH, WINDOW_SIZE)
 
     with open(tau_inS_PATH, "r") as file:
         tau_ins = [int(SAMPLE_RATE / float(line.strip())) for line in file]
 
     tau_ins = [50] + tau_ins[:-1]
 
-    input_wave = input_wave[: len(tau_ins) * WINDOW_SIZE]
+    input_wave = source.samples[: len(tau_ins) * WINDOW_SIZE]
 
     dut.rst_in.value = 1
     await ClockCycles(dut.clk_in, 5, rising=False)
@@ -61,7 +61,11 @@ async def test_bufferizer(dut):
 
     cocotb.start_soon(logger(dut))
 
-    for i, samp in enumerate(input_wave):
+    for i in range(len(input_wave)):
+        if i % WINDOW_SIZE == 0:
+            bench.mark_window(i // WINDOW_SIZE)
+            window = source[i // WINDOW_SIZE]
+        samp = window[i % WINDOW_SIZE]
         await FallingEdge(dut.clk_in)
         dut.sample_in.value = int(samp)
         dut.sample_valid_in.value = 1
@@ -108,9 +112,7 @@ async def test_bufferizer(dut):
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [proj_path / "hdl" / "bufferizer.sv"]
     sources += [
         proj_path / "hdl" / "bram_wrapper.sv",
@@ -122,26 +124,9 @@ def main():
         proj_path / "hdl" / "pipeline.sv",
         proj_path / "hdl" / "ring_buffer.sv",
     ]
-    build_test_args = ["-Wall"]
     parameters = {"SAMP_PLAY_DURATION": SAMP_PLAY_DURATION}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="bufferizer",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="bufferizer",
-        test_module="test_bufferizer",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_bufferizer", "bufferizer", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
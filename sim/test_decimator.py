@@ -0,0 +1,82 @@
+import os
+import sys
+from pathlib import Path
+
+import cocotb
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles
+
+import bench
+from drivers import SampleDriver, ValidMonitor
+
+import decimator_model
+from wav_source import WavSource
+
+WIDTH = 16
+FACTOR = int(os.getenv("FACTOR", 4))
+ORDER = int(os.getenv("ORDER", 3))
+
+# Samples can come every cycle, the combs only run once per FACTOR
+SAMPLE_CYCLES = 3
+NUM_SAMPLES = int(os.getenv("NUM_SAMPLES", 1 << 14))
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+AUDIO_PATH = BASE_PATH / "test_data" / "aladdin-new.wav"
+
+source = WavSource(AUDIO_PATH)
+samples = source.samples[:NUM_SAMPLES].view(np.uint16) ^ 0x8000
+expected = decimator_model.cic(samples, FACTOR, ORDER)
+
+
+def check(decimated):
+    assert len(decimated) == len(expected), f"expected {len(expected)} samples, got {len(decimated)}"
+    for k, (got, want) in enumerate(zip(decimated, expected)):
+        assert got == want, f"output {k}: expected {want}, got {got}"
+    print(f"{len(decimated)} samples decimated by {FACTOR} through {ORDER} CIC stages")
+
+
+def replay(outputs, directory):
+    """Check cached outputs against the current model."""
+    check(outputs["sample_out"])
+    return 0
+
+
+@cocotb.test()
+async def test_decimator(dut):
+    cocotb.start_soon(Clock(dut.clk_in, bench.CLOCK_PERIOD, units="ns").start())
+    dut.valid_in.value = 0
+    dut.rst_in.value = 1
+    await ClockCycles(dut.clk_in, 2)
+    dut.rst_in.value = 0
+
+    monitor = ValidMonitor(dut.clk_in, dut.sample_out, dut.valid_out, size=len(expected))
+    cocotb.start_soon(monitor.run())
+
+    driver = SampleDriver(dut.clk_in, dut.sample_in, dut.valid_in, period=SAMPLE_CYCLES, rising=True)
+    await ClockCycles(dut.clk_in, 5)
+    await driver.drive(samples)
+    await ClockCycles(dut.clk_in, 5)
+
+    bench.save_outputs(sample_out=monitor.captured)
+    check(monitor.captured)
+
+
+def main():
+    """Simulate the counter using the Python runner."""
+    proj_path = Path(__file__).resolve().parent.parent
+    sources = [proj_path / "hdl" / "decimator.sv"]
+    parameters = {"WIDTH": WIDTH, "FACTOR": FACTOR, "ORDER": ORDER}
+    failed = bench.run(
+        "test_decimator",
+        "decimator",
+        sources,
+        parameters,
+        stimulus=[AUDIO_PATH, NUM_SAMPLES],
+        replay=replay,
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
-import os
 import sys
 from pathlib import Path
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
 
+import bench
+
 import random
 from fxpmath import Fxp
 
+from fixed_point import to_fp
+
 async def reset(dut, cycles):
     dut.rst_in.value = 1
     await ClockCycles(dut.clk_in, cycles)
@@ -33,25 +35,6 @@ for x in range(NUM_TESTS):
     tests.append((dividend, divisor, quotient))
     x += 1
 
-def from_fp(value):
-    accum = 0
-    for x in range(FRACTION_WIDTH):
-        accum += 2**(-1*(FRACTION_WIDTH-x)) * ((value >> x) & 0x1)
-
-    for x in range(WIDTH-FRACTION_WIDTH):
-        accum += 2**x * ((value >> (x+FRACTION_WIDTH)) & 0x1)
-
-    return accum
-
-def to_fp(value):
-    accum = 0
-    for x in range(WIDTH-1, -1, -1):
-        digit = int(value / (2**(x - FRACTION_WIDTH)))
-        accum += 2**x * digit
-        value -= 2**(x - FRACTION_WIDTH) * digit
-
-    return hex(accum)
-
 @cocotb.test()
 async def test_fp_div(dut):
     print("Starting...")
@@ -72,40 +55,21 @@ async def test_fp_div(dut):
         await ClockCycles(dut.clk_in, NUM_STAGES - 2, rising=False)
         assert dut.valid_out.value == 1, "not valid after N cycles"
 
-        expected = to_fp(quotient)
-        got = hex(dut.quotient_out.value)
+        expected = to_fp(quotient, WIDTH, FRACTION_WIDTH)
+        got = int(dut.quotient_out.value)
         print(dut.quotient_out.value)
 
-        assert got == expected, f"expected {expected}, got {got}"
+        assert got == expected, f"expected {hex(expected)}, got {hex(got)}"
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [
         proj_path / "hdl" / "fp_div.sv"
     ]
-    build_test_args = ["-Wall"]
     parameters = {"WIDTH" : WIDTH, "FRACTION_WIDTH" : FRACTION_WIDTH, "NUM_STAGES" : NUM_STAGES }
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="fp_div",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="fp_div",
-        test_module="test_fp_div",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_fp_div", "fp_div", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
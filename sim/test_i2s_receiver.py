@@ -1,12 +1,12 @@
-import os
 import sys
 from pathlib import Path
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
 
+import bench
+
 
 def get_bit(data, n):
     return (data >> n) & 1
@@ -64,7 +64,7 @@ async def test_data_receive(dut):
         await ClockCycles(dut.clk_in, 2)
         await FallingEdge(dut.clk_in)  # sample on negedge so cocotb picks it up
         assert dut.data_valid_out.value == 1
-        assert dut.data_out.value == (signed2unsignedrange(data) >> 8)
+        assert dut.debug_data_out.value == signed2unsignedrange(data)
 
         # data_valid_out should only be valid for one cycle
         await ClockCycles(dut.clk_in, 1)
@@ -75,6 +75,7 @@ async def test_data_receive(dut):
         for i in range(8):
             await RisingEdge(dut.sclk_out)
         await ClockCycles(dut.clk_in, 1)
+        await FallingEdge(dut.clk_in)  # sample on negedge so cocotb picks it up
         assert dut.ws_out == 1
 
         # wait out other channel (we ignore this data)
@@ -101,30 +102,11 @@ async def test_i2s_receiver(dut):
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [proj_path / "hdl" / "i2s_receiver.sv"]
-    build_test_args = ["-Wall"]
     parameters = {}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="i2s_receiver",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="i2s_receiver",
-        test_module="test_i2s_receiver",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_i2s_receiver", "i2s_receiver", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
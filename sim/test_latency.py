@@ -0,0 +1,239 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import cocotb
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.result import SimTimeoutError
+from cocotb.triggers import ClockCycles, Event, FallingEdge, RisingEdge, Timer, with_timeout
+from cocotb.utils import get_sim_time
+
+import bench
+
+import latency_model
+from latency_model import SCLK_CYCLES, STAGES, click_samples, is_click
+
+WINDOW_SIZE = 2048
+CYCLES_PER_BAUD = latency_model.CLOCK_HZ // latency_model.BAUD_RATE
+
+# The click goes CLICK_OFFSET samples into window CLICK_WINDOW. Window 0's
+# playout is still starting up, so the first window that shows a steady
+# state latency is 1
+CLICK_WINDOW = int(os.getenv("CLICK_WINDOW", 1))
+CLICK_OFFSET = int(os.getenv("CLICK_OFFSET", WINDOW_SIZE // 2))
+CLICK = CLICK_WINDOW * WINDOW_SIZE + CLICK_OFFSET
+# The click comes out about a window after its own window ends
+WINDOWS = CLICK_WINDOW + 3
+# top_level's DECIMATE, yin's decimate by N stage
+DECIMATE = int(os.getenv("DECIMATE", 1))
+
+LATENCY_FILE = "latency.json"
+
+# What top_level measured for a click at sample 3072 under Verilator, by
+# DECIMATE. The model has to keep giving the same, which is checked before
+# anything is built
+MEASURED = {
+    1: latency_model.Budget(
+        i2s=850, window=2354688, yin=10498, psola=3213, ring=2470366, pdm=1, uart=2006
+    ),
+    4: latency_model.Budget(
+        i2s=850, window=2354688, yin=11268, psola=3213, ring=2449630, pdm=1, uart=2006
+    ),
+}
+MEASURED_CLICK = 3072
+
+
+def now():
+    return int(get_sim_time("ns")) // bench.CLOCK_PERIOD
+
+
+def runs(bits):
+    """(bit, length) runs, so a constant stretch of sdata costs one wake-up."""
+    out = []
+    for bit in bits:
+        if out and out[-1][0] == bit:
+            out[-1][1] += 1
+        else:
+            out.append([bit, 1])
+    return out
+
+
+async def send_i2s(dut, samples, stamps, window_done):
+    """Drive the left channel of every sample, MSB first, each bit on the
+    falling edge of sclk like an I2S microphone."""
+    sclk = SCLK_CYCLES * bench.CLOCK_PERIOD
+    # The RTL's windows start with i2s_receiver's silent sample out of reset,
+    # so the click's window ends a sample short of the bench's
+    last = (CLICK_WINDOW + 1) * WINDOW_SIZE - 2
+    for n, sample in enumerate(samples.tolist()):
+        # ws falls with sclk at the end of the previous frame; the MSB goes
+        # out on the next falling edge, half a cycle clear of the clock
+        await FallingEdge(dut.ws)
+        await Timer(sclk + bench.CLOCK_PERIOD // 2, units="ns")
+        if n == CLICK:
+            stamps["input"] = now()
+        word = (sample ^ 0x8000) << 8
+        bits = runs([(word >> b) & 1 for b in range(23, -1, -1)])
+        for k, (bit, length) in enumerate(bits):
+            dut.sdata.value = bit
+            # The LSB is held until the next frame; the sample is valid
+            # well before then
+            if k < len(bits) - 1:
+                await Timer(length * sclk, units="ns")
+            elif length > 1:
+                await Timer((length - 1) * sclk, units="ns")
+        if n in (CLICK, last):
+            await RisingEdge(dut.processed_sample_valid)
+            stamps["i2s" if n == CLICK else "window"] = now()
+        if n == last:
+            window_done.set()
+
+
+async def uart_byte(dut):
+    """Receive one byte from uart_txd, returning it after the stop bit."""
+    baud = CYCLES_PER_BAUD * bench.CLOCK_PERIOD
+    await FallingEdge(dut.uart_txd)
+    await Timer(baud * 3 // 2, units="ns")
+    byte = 0
+    for b in range(8):
+        byte |= dut.uart_txd.value.integer << b
+        await Timer(baud, units="ns")
+    assert dut.uart_txd.value == 1, "missing UART stop bit"
+    await Timer(baud // 2, units="ns")
+    return byte
+
+
+async def follow_click(dut, stamps, window_done):
+    """Timestamp the click's window and output word through the pipeline."""
+    buf = dut.buf_dawg
+    await window_done.wait()
+    await RisingEdge(dut.taumin_valid)
+    stamps["yin"] = now()
+
+    # The click's window streams out of bram_wrapper a word per cycle
+    await RisingEdge(buf.raw_psola_valid)
+    while True:
+        await FallingEdge(dut.clk_100mhz)
+        assert buf.raw_psola_valid.value == 1, f"click at sample {CLICK} missing from psola output"
+        if is_click(buf.raw_psola.value.integer):
+            stamps["psola"] = now()
+            break
+
+    while True:
+        await RisingEdge(dut.raw_audio_valid)
+        await FallingEdge(dut.clk_100mhz)
+        if is_click(dut.raw_audio.value.integer):
+            stamps["ring"] = now()
+            break
+    await RisingEdge(dut.audio_valid)
+    stamps["pdm"] = now()
+    word = dut.audio.value.integer >> 16
+
+    high = await uart_byte(dut)
+    low = await uart_byte(dut)
+    stamps["uart"] = now()
+    assert (high << 8) | low == word, f"UART sent {(high << 8) | low:#x}, expected {word:#x}"
+
+
+def check(stamps, directory):
+    """Print the RTL and model budgets side by side, save both and check
+    they agree stage by stage."""
+    rtl = latency_model.budget(stamps)
+    model = latency_model.click_budget(CLICK, decimate=DECIMATE)
+    print(f"click at sample {CLICK} (window {CLICK_WINDOW}, offset {CLICK_OFFSET}), decimate {DECIMATE}")
+    print(f"{'stage':8} {'rtl':>10} {'model':>10} {'diff':>8} {'rtl ms':>8}")
+    for stage, r, m in zip(STAGES, rtl, model):
+        print(f"{stage:8} {r:10} {m:10} {r - m:8} {r / latency_model.CLOCK_HZ * 1e3:8.3f}")
+    print(
+        f"{'total':8} {rtl.total:10} {model.total:10} {rtl.total - model.total:8}"
+        f" {rtl.total / latency_model.CLOCK_HZ * 1e3:8.3f}"
+    )
+    with open(Path(directory) / LATENCY_FILE, "w") as f:
+        json.dump({"click": CLICK, "decimate": DECIMATE, "rtl": rtl._asdict(), "model": model._asdict()}, f)
+    off = [f"{stage} by {r - m}" for stage, r, m in zip(STAGES, rtl, model) if r != m]
+    assert not off, f"RTL latency off the model: {', '.join(off)}"
+
+
+def check_measured():
+    """Check the model against the RTL budget measured for this click, if
+    there is one."""
+    if CLICK != MEASURED_CLICK or DECIMATE not in MEASURED:
+        return
+    model = latency_model.click_budget(CLICK, decimate=DECIMATE)
+    off = [f"{stage} by {m - r}" for stage, r, m in zip(STAGES, MEASURED[DECIMATE], model) if r != m]
+    assert not off, f"Model latency off the measured RTL: {', '.join(off)}"
+
+
+def replay(outputs, directory):
+    """Check cached timestamps against the current model."""
+    check({name: int(outputs[name]) for name in outputs}, directory)
+    return 0
+
+
+@cocotb.test()
+async def test_latency(dut):
+    cocotb.start_soon(Clock(dut.clk_100mhz, bench.CLOCK_PERIOD, units="ns").start())
+    dut.sw.value = 0
+    dut.sdata.value = 0
+    dut.btn.value = 1
+    await ClockCycles(dut.clk_100mhz, 5)
+    dut.btn.value = 0
+
+    stamps = {}
+    window_done = Event()
+    cocotb.start_soon(send_i2s(dut, click_samples(WINDOWS, CLICK), stamps, window_done))
+    follower = cocotb.start_soon(follow_click(dut, stamps, window_done))
+    # Whatever hasn't come out by the end of the stimulus never will
+    try:
+        await with_timeout(
+            follower, WINDOWS * WINDOW_SIZE * latency_model.SAMPLE_CYCLES * bench.CLOCK_PERIOD, "ns"
+        )
+    except SimTimeoutError:
+        missing = [stage for stage in ("input",) + STAGES if stage not in stamps]
+        raise AssertionError(f"click never reached {missing[0]}")
+
+    bench.save_outputs(**{name: np.array(t) for name, t in stamps.items()})
+    check(stamps, ".")
+
+
+def main():
+    """Simulate the counter using the Python runner."""
+    check_measured()
+    proj_path = Path(__file__).resolve().parent.parent
+    sources = [
+        proj_path / "hdl" / name
+        for name in [
+            "top_level.sv",
+            "i2s_receiver.sv",
+            "yin.sv",
+            "decimator.sv",
+            "fp_div.sv",
+            "xilinx_true_dual_port_read_first_1_clock_ram.v",
+            "xilinx_single_port_ram_read_first.sv",
+            "seven_segment_controller.sv",
+            "bufferizer.sv",
+            "bram_wrapper.sv",
+            "psola.sv",
+            "searcher.sv",
+            "pipeline.sv",
+            "ring_buffer.sv",
+            "uart_transmit.sv",
+            "uart_turbo_transmit.sv",
+            "pdm.sv",
+        ]
+    ]
+    failed = bench.run(
+        "test_latency",
+        "top_level",
+        sources,
+        {"DECIMATE": DECIMATE},
+        stimulus=[CLICK_WINDOW, CLICK_OFFSET],
+        replay=replay,
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
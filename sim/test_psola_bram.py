@@ -1,5 +1,7 @@
+import json
 import os
 import sys
+import time
 import wave
 from pathlib import Path
 
@@ -8,14 +10,30 @@ import librosa
 import numpy as np
 import soundfile as sf
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
+
+import bench
+from drivers import SampleDriver, ValidMonitor
 from matplotlib import pyplot as plt
 from scipy.io import wavfile
 
+import psola_model
+import searcher_model
+from wav_source import WavSource
+
 WINDOW_SIZE = 2048  # Change if your module uses a different size
 SAMPLE_RATE = 44100
-FRACTION_BITS = 14
+FRACTION_BITS = 16  # what bram_wrapper instantiates psola with
+QUANTIZER = searcher_model.Quantizer()
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+
+# AUDIO_PATH = BASE_PATH / "test_data" / "aladdin-new.wav"
+# tau_inS_PATH = BASE_PATH / "test_data" / "aladdin-new-windows.txt"
+
+AUDIO_PATH = BASE_PATH / "test_data" / "slide.wav"
+tau_inS_PATH = BASE_PATH / "test_data" / "slide-windows.txt"
+
 
 
 # Helper Functions
@@ -27,7 +45,7 @@ async def reset(dut, cycles=2):
     await ClockCycles(dut.clk_in, cycles)
 
 
-async def process_window(dut, next_window, tau_in):
+async def process_window(dut, driver, monitor, window, next_window, tau_in):
     """Process a single window of audio through the PSOLA module."""
     await FallingEdge(dut.clk_in)
     dut.tau_in.value = tau_in
@@ -36,25 +54,18 @@ async def process_window(dut, next_window, tau_in):
     dut.tau_valid_in.value = 0
     await ClockCycles(dut.clk_in, 2)
 
-    out = []
-    cycle = 0
-    while dut.read_done.value.integer == 0 or dut.output_done.value.integer == 0:
-        # Streaming in next window
-        if cycle % 3 == 0 and cycle < 3 * WINDOW_SIZE:
-            dut.sample_in.value = next_window[cycle // 3]
-            dut.addr_in.value = cycle // 3
-            dut.sample_valid_in.value = 1
-        else:
-            dut.sample_valid_in.value = 0
-
-        if dut.valid_out_piped.value.integer == 1:
-            if dut.out_val.value.integer >= 2 ** (16 + FRACTION_BITS):
-                dut._log.info(f"VALUE: {dut.out_val.value.integer}")
-                raise ValueError(f"out val too high on sample {len(out)}")
-            out.append(dut.out_val.value.integer)
-
-        await ClockCycles(dut.clk_in, 1)
-        cycle += 1
+    # Stream in the next window, one sample every third cycle, while PSOLA
+    # runs on this one
+    monitor.clear()
+    streaming = cocotb.start_soon(driver.drive(next_window))
+    await RisingEdge(dut.done)
+    await streaming
+
+    out = monitor.captured.copy()
+    high = np.flatnonzero(out >= 2 ** (16 + FRACTION_BITS))
+    if len(high):
+        dut._log.info(f"VALUE: {out[high[0]]}")
+        raise ValueError(f"out val too high on sample {high[0]}")
 
     # Collect output
     dut._log.info(f"Original period: {tau_in}")
@@ -63,59 +74,45 @@ async def process_window(dut, next_window, tau_in):
     dut._log.info(
         f"Min value was {min(out) / (2 ** FRACTION_BITS)} at position {np.argmin(out)}"
     )
-    dut._log.info(f"-------------------------------------------")
-    dut._log.info(f"Min INPUT signal value: {min(next_window)}")
+    dut._log.info("-------------------------------------------")
+    dut._log.info(f"Min INPUT signal value: {next_window.min()}")
 
-    return [x / (2**FRACTION_BITS) for x in out]
+    shifted_tau = dut.psola_inst.shifted_tau_in.value.integer
+    check_window(window, tau_in, shifted_tau, out)
+    return out, shifted_tau
 
 
-@cocotb.test()
-async def test_psola(dut):
-    """Test the PSOLA module."""
-    # Start the clock
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    # Reset the DUT
-    await reset(dut, cycles=5)
-
-    BASE_PATH = Path(__file__).resolve().parent.parent
-
-    # AUDIO_PATH = BASE_PATH / "test_data" / "aladdin-new.wav"
-    # tau_inS_PATH = BASE_PATH / "test_data" / "aladdin-new-windows.txt"
-
-    AUDIO_PATH = BASE_PATH / "test_data" / "slide.wav"
-    tau_inS_PATH = BASE_PATH / "test_data" / "slide-windows.txt"
+def check_window(window, tau_in, shifted_tau, out):
+    """Compare one window's output with the model."""
+    assert shifted_tau == QUANTIZER(tau_in), (
+        f"Expected shifted tau {QUANTIZER(tau_in)} for {tau_in}, got {shifted_tau}"
+    )
+    expected = psola_model.psola(window, tau_in, shifted_tau, FRACTION_BITS)
+    assert len(out) == expected.window_len, (
+        f"Expected window of length {expected.window_len}, got {len(out)}"
+    )
+    mismatch = np.flatnonzero(out != expected.out)
+    assert len(mismatch) == 0, (
+        f"Sample {mismatch[0]} is {out[mismatch[0]]}, expected {expected.out[mismatch[0]]}"
+    )
 
-    # Load the audio file and tau_ins from YIN
-    # input_wave, _ = librosa.load(AUDIO_PATH, sr=SAMPLE_RATE)
-    _, input_wave = wavfile.read(AUDIO_PATH)
-    input_wave = input_wave.view(dtype=np.uint16) ^ 0x8000
 
+def load_taus():
+    """tau_in for each window. PSOLA runs a window behind, so the first
+    tau goes to a blank BRAM."""
     with open(tau_inS_PATH, "r") as file:
         tau_ins = [int(SAMPLE_RATE / float(line.strip())) for line in file]
+    return [50] + tau_ins[:-1]
 
-    tau_ins = [50] + tau_ins[:-1]
-
-    input_wave = input_wave[: len(tau_ins) * WINDOW_SIZE]
-
-    # Split audio into windows
-    windows = np.array_split(input_wave, len(tau_ins))
-
-    # Process each window
-    processed_signal = []
-    for i, (window, tau_in) in enumerate(zip(windows, tau_ins)):
-        # Zero-pad if the window is smaller than WINDOW_SIZE
 
-        fp_window = [int(x) for x in window]
+def write_output(words, path):
+    processed_signal = np.asarray(words) / (2**FRACTION_BITS) - 32768
+    # sf.write(path, processed_signal, SAMPLE_RATE)
+    wavfile.write(path, SAMPLE_RATE, processed_signal.astype(np.int16))
 
-        output_window = await process_window(dut, fp_window, tau_in)
-        processed_signal.extend(output_window)
 
-    # Save the processed audio
-    processed_signal = np.array(processed_signal) - 32768
-    # sf.write("cocotb_psola_bram_output.wav", processed_signal, SAMPLE_RATE)
-    wavfile.write(
-        "cocotb_psola_bram_output.wav", SAMPLE_RATE, processed_signal.astype(np.int16)
-    )
+def plot(input_wave, words, path):
+    processed_signal = np.asarray(words) / (2**FRACTION_BITS) - 32768
 
     # Plot the original signal
     plt.figure(figsize=(14, 7))
@@ -136,17 +133,88 @@ async def test_psola(dut):
 
     plt.tight_layout()
 
-    plt.savefig("waveform_plots_psola_bram.png")
+    plt.savefig(path)
     plt.show()
 
+
+def replay(outputs, directory):
+    """Checks and plots from cached outputs instead of a simulation."""
+    source = WavSource(AUDIO_PATH, WINDOW_SIZE)
+    tau_ins = load_taus()
+    ends = np.cumsum(outputs["lengths"])
+    window = np.zeros(WINDOW_SIZE, dtype=np.uint16)
+    for i, tau_in in enumerate(tau_ins):
+        out = outputs["words"][ends[i] - outputs["lengths"][i] : ends[i]]
+        check_window(window, tau_in, outputs["shifted_taus"][i], out)
+        window = source[i]
+
+    write_output(outputs["words"], directory / "cocotb_psola_bram_output.wav")
+    plot(
+        source.samples[: len(tau_ins) * WINDOW_SIZE],
+        outputs["words"],
+        directory / "waveform_plots_psola_bram.png",
+    )
+    return 0
+
+
+@cocotb.test()
+async def test_psola(dut):
+    """Test the PSOLA module."""
+    # Start the clock
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    # Reset the DUT
+    await reset(dut, cycles=5)
+
+    driver = SampleDriver(
+        dut.clk_in, dut.sample_in, dut.sample_valid_in, addr=dut.addr_in, period=3, rising=True
+    )
+    monitor = ValidMonitor(dut.clk_in, dut.out_val, dut.valid_out_piped)
+    cocotb.start_soon(monitor.run())
+
+    # Load the audio file and tau_ins from YIN
+    source = WavSource(AUDIO_PATH, WINDOW_SIZE)
+    tau_ins = load_taus()
+
+    # Only this shard's windows when the run is sharded
+    first, last = bench.shard_windows(len(tau_ins))
+    input_wave = source.samples[first * WINDOW_SIZE : last * WINDOW_SIZE]
+
+    # Process each window
+    # PSOLA runs on the window received before, the first one on a blank BRAM
+    window = np.zeros(WINDOW_SIZE, dtype=np.uint16)
+    if first:
+        # Preload the window before the shard by running it on the blank
+        # BRAM, which leaves the wrapper as it would be after window first - 1
+        await process_window(dut, driver, monitor, window, source[first - 1], tau_ins[first - 1])
+        window = source[first - 1]
+
+    words = []
+    shifted_taus = []
+    for i in range(first, last):
+        bench.mark_window(i)
+        out, shifted_tau = await process_window(
+            dut, driver, monitor, window, source[i], tau_ins[i]
+        )
+        words.append(out)
+        shifted_taus.append(shifted_tau)
+        window = source[i]
+
+    # Save the processed audio
+    bench.save_outputs(
+        words=np.concatenate(words),
+        lengths=np.array([len(w) for w in words]),
+        shifted_taus=np.array(shifted_taus),
+    )
+    words = np.concatenate(words)
+    write_output(words, "cocotb_psola_bram_output.wav")
+    plot(input_wave, words, "waveform_plots_psola_bram.png")
+
     dut._log.info("Processed audio saved to cocotb_psola_bram_output.wav")
 
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [proj_path / "hdl" / "bram_wrapper.sv"]
     sources += [
         proj_path / "hdl" / "psola.sv",
@@ -156,26 +224,43 @@ def main():
         proj_path / "hdl" / "fp_div.sv",
         proj_path / "hdl" / "pipeline.sv",
     ]
-    build_test_args = ["-Wall"]
     parameters = {"WINDOW_SIZE": WINDOW_SIZE}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="bram_wrapper",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="bram_wrapper",
-        test_module="test_psola_bram",
-        test_args=run_test_args,
-        waves=True,
+    windows = len(load_taus())
+    shards = bench.shard_count()
+    start = time.perf_counter()
+    stimulus = [AUDIO_PATH, tau_inS_PATH]
+    failed = bench.run(
+        "test_psola_bram",
+        "bram_wrapper",
+        sources,
+        parameters,
+        windows=windows,
+        shards=shards,
+        stimulus=stimulus,
+        replay=replay,
     )
+    status = json.loads((bench.build_dir("test_psola_bram") / "status.json").read_text())
+
+    if status["shards"] > 1 and not failed:
+        words = bench.load_outputs("test_psola_bram")["words"]
+        write_output(words, bench.build_dir("test_psola_bram") / "cocotb_psola_bram_sharded_output.wav")
+
+        print(f"{windows} windows in {shards} shards took {time.perf_counter() - start:.1f}s")
+
+        # Check the stitched shards against one process running every window
+        if os.getenv("SHARD_CHECK", "1") != "0":
+            start = time.perf_counter()
+            failed = bench.run("test_psola_bram", "bram_wrapper", sources, parameters, cache=False)
+            print(f"{windows} windows in one process took {time.perf_counter() - start:.1f}s")
+            single = bench.load_outputs("test_psola_bram")["words"]
+            if not np.array_equal(words, single):
+                differ = np.flatnonzero(words[: len(single)] != single[: len(words)])
+                first = differ[0] if len(differ) else min(len(words), len(single))
+                print(f"Sharded output differs from a single run from word {first} on")
+                failed += 1
+            # The check run overwrote the status regress reports
+            bench.write_status(bench.build_dir("test_psola_bram"), **dict(status, failed=failed))
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
@@ -1,19 +1,20 @@
 import numpy as np
 import wave
-import librosa
 import soundfile as sf
 from pathlib import Path
 
 from matplotlib import pyplot as plt
 
-import os
 import sys
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
 
+import bench
+
+from wav_source import WavSource
+
 WINDOW_SIZE = 2048  # Change if your module uses a different size
 SAMPLE_RATE = 44100
 
@@ -31,7 +32,7 @@ async def process_window(dut, window, period):
     """Process a single window of audio through the PSOLA module."""
     await FallingEdge(dut.clk_in)
     for i in range(WINDOW_SIZE):
-        dut.signal[i].value = window[i]
+        dut.signal[i].value = int(window[i])
     dut.period.value = period
     dut.new_signal.value = 1
     await FallingEdge(dut.clk_in)
@@ -67,21 +68,16 @@ async def test_psola(dut):
     PERIODS_PATH = BASE_PATH / "test_data" / "slide-windows.txt"
 
     # Load the audio file and periods from YIN
-    input_wave, _ = librosa.load(AUDIO_PATH, sr=SAMPLE_RATE)
+    source = WavSource(AUDIO_PATH, WINDOW_SIZE)
     with open(PERIODS_PATH, "r") as file:
         periods = [int(SAMPLE_RATE / float(line.strip())) for line in file]
 
-    input_wave = input_wave[: len(periods) * WINDOW_SIZE]
-
-    # Split audio into windows
-    windows = np.array_split(input_wave, len(periods))
+    input_wave = source.samples[: len(periods) * WINDOW_SIZE]
 
     # Process each window
     processed_signal = []
-    for window, period in zip(windows, periods):
-        # Zero-pad if the window is smaller than WINDOW_SIZE
-
-        fp_window = [int(x * (2**10)) for x in window]
+    for i, period in enumerate(periods):
+        fp_window = (source.normalized(i) * (2**10)).astype(np.int32)
 
         output_window = await process_window(dut, fp_window, period)
         processed_signal.extend(output_window)
@@ -117,35 +113,16 @@ async def test_psola(dut):
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [proj_path / "hdl" / "psola_no_bram.sv"]
     sources += [
         proj_path / "hdl" / "searcher.sv",
         proj_path / "hdl" / "xilinx_single_port_ram_read_first.sv",
         proj_path / "hdl" / "fp_div.sv",
     ]
-    build_test_args = ["-Wall"]
     parameters = {"WINDOW_SIZE": WINDOW_SIZE}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="psola_no_bram",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="psola_no_bram",
-        test_module="test_psola_no_bram",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_psola_no_bram", "psola_no_bram", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
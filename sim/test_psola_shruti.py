@@ -1,34 +1,27 @@
-import os
-import subprocess
 import sys
 from pathlib import Path
 
 import cocotb
-import numpy as np
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
-from scipy.io import wavfile
+
+import bench
+from drivers import SampleDriver
+
+import searcher_model
+from wav_source import WavSource
 
 WINDOW_SIZE = 2048
 SAMPLING_RATE = 44100
-TOPLEVEL = (
-    subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True)
-    .stdout.decode("utf-8")
-    .strip()
-)
+TOPLEVEL = Path(__file__).resolve().parent.parent
 
-_, signal = wavfile.read(f"{TOPLEVEL}/test_data/aladdin-new.wav")
+signal = WavSource(f"{TOPLEVEL}/test_data/aladdin-new.wav", WINDOW_SIZE).samples
 
 with open(f"{TOPLEVEL}/test_data/aladdin-new-windows.txt", "r") as f:
     periods = [round(float(line.strip())) for line in f]
 
 
-def get_closest_period(period):
-    A4 = round(SAMPLING_RATE / 440)
-    semitone_ratio = 2 ** (1 / 12)
-    closest_semitone = round(12 * np.log2(A4 / period))
-    return int(period * (semitone_ratio**closest_semitone) / A4)
+QUANTIZER = searcher_model.Quantizer()
 
 
 def window_val(period, offset):
@@ -49,7 +42,7 @@ async def receive_tau(dut, period):
     # I'll trust that div works for now
 
     # Testing searched value
-    closest_period_exp = get_closest_period(period)
+    closest_period_exp = int(QUANTIZER(period))
     await RisingEdge(dut.shifted_tau_valid, rising=False)
     closest_period_act = dut.shifted_tau.value
     assert (
@@ -101,13 +94,9 @@ async def receive_tau(dut, period):
 
 
 async def feed_samples(dut):
-    for sample in signal:
-        await FallingEdge(dut.clk_in)
-        dut.sample_in.value = int(sample)
-        dut.sample_valid_in.value = 1
-        await ClockCycles(dut.clk_in, 1, rising=False)
-        dut.sample_valid_in = 0
-        await ClockCycles(dut.clk_in, 2303)
+    driver = SampleDriver(dut.clk_in, dut.sample_in, dut.sample_valid_in, period=2304)
+    await FallingEdge(dut.clk_in)
+    await driver.drive(signal)
 
 
 @cocotb.test()
@@ -132,9 +121,7 @@ async def test_psola(dut):
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [
         proj_path / "hdl" / "psola_rewrite.sv",
         proj_path / "hdl" / "searcher.sv",
@@ -143,26 +130,9 @@ def main():
         proj_path / "hdl" / "fp_div.sv",
         proj_path / "hdl" / "pipeline.sv",
     ]
-    build_test_args = ["-Wall"]
     parameters = {"WINDOW_SIZE": WINDOW_SIZE}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="psola_rewrite",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="psola_rewrite",
-        test_module="test_psola_shruti",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_psola_shruti", "psola_rewrite", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
@@ -1,111 +1,90 @@
-import os
 import sys
 from pathlib import Path
 
 import cocotb
+import numpy as np
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
-from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
+from cocotb.triggers import FallingEdge, RisingEdge
 
+import bench
 
-async def reset(dut):
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 1
-    await RisingEdge(dut.clk_in)
-    await FallingEdge(dut.clk_in)
-    dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
+from bufferizer_model import RingPlayout
 
+MAX_EXTENDED = 4
+ENTRIES = 2 * MAX_EXTENDED
+DATA_WIDTH = 16
+PERIOD = 4  # cycles between reads, SAMP_PLAY_DURATION in the bufferizer
 
-@cocotb.test()
-async def test_ring_buffer(dut):
-    def info(s):
-        dut._log.info(s)
+# (first cycle, words) of each burst of writes, sized to run the ring dry,
+# refill it, wrap it and finally lap the reader
+BURSTS = [(10, 5), (40, 6), (90, 3), (120, ENTRIES), (150, 2 * ENTRIES)]
+CYCLES = 400
 
-    async def c(i):
-        await ClockCycles(dut.clk_in, i)
 
-    async def f():
-        await FallingEdge(dut.clk_in)
+def schedule():
+    """Per-cycle inputs, and the words RingPlayout reads over the same cycles."""
+    shift = np.zeros(CYCLES, dtype=bool)
+    data = np.zeros(CYCLES, dtype=np.int64)
+    ring = RingPlayout(MAX_EXTENDED, PERIOD)
+    word = 1  # 0 is what a cleared slot reads as
+    for start, count in BURSTS:
+        words = np.arange(word, word + count)
+        shift[start : start + count] = True
+        data[start : start + count] = words
+        ring.write(start, words)
+        word += count
+    expected = ring.read_until(CYCLES)
 
-    async def r():
-        await RisingEdge(dut.clk_in)
+    read = np.zeros(CYCLES, dtype=bool)
+    first = BURSTS[0][0] + BURSTS[0][1] + PERIOD + 1
+    read[first::PERIOD] = True
+    return shift, data, read, expected, ring
 
-    info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
 
-    await reset(dut)
+@cocotb.test()
+async def test_ring_buffer(dut):
+    cocotb.start_soon(Clock(dut.clk_in, bench.CLOCK_PERIOD, units="ns").start())
+    shift, data, read, expected, ring = schedule()
 
-    await f()
     dut.shift_trigger.value = 0
     dut.read_trigger.value = 0
-    await c(3)
-
-    async def test(wrap):
-        for i in range(8 + wrap):
-            await f()
-            dut.shift_trigger.value = 1
-            dut.shift_data.value = i
-            assert dut.shift_ready_out.value and dut.read_ready_out.value
-            await r()
-            await f()
-            assert not dut.shift_ready_out.value and dut.read_ready_out.value
-            dut.shift_trigger.value = 0
-
-        for i in range(8):
-            await f()
-            dut.read_trigger.value = 1
-            dut.read_addr.value = i
-            # check previous iteration returned correct val
-            if i > 0:
-                assert dut.data_valid_out.value and dut.data_out == i - 1 + wrap
-            assert dut.shift_ready_out.value and dut.read_ready_out.value
-            await r()
-            await f()
-            assert dut.shift_ready_out.value and not dut.read_ready_out.value
-            dut.read_trigger.value = 0
-
-        await f()
-        assert dut.data_valid_out.value and dut.data_out == 7 + wrap
-
-    for i in range(7):
-        await test(i)
-    await test(8)
-
-    await c(10)
-
-    await ReadOnly()
+    dut.shift_data.value = 0
+    dut.rst_in.value = 1
+    await RisingEdge(dut.clk_in)
+    await RisingEdge(dut.clk_in)
+    await FallingEdge(dut.clk_in)
+    dut.rst_in.value = 0
+
+    # Inputs for cycle t go out on the falling edge before its rising edge
+    words = []
+    for t in range(CYCLES):
+        await FallingEdge(dut.clk_in)
+        if dut.data_valid_out.value:
+            words.append(dut.data_out.value.integer)
+        dut.shift_trigger.value = int(shift[t])
+        dut.shift_data.value = int(data[t])
+        dut.read_trigger.value = int(read[t])
+
+    assert len(words) >= len(expected), f"expected {len(expected)} reads, got {len(words)}"
+    words = np.array(words[: len(expected)])
+    mismatched = np.flatnonzero(words != expected)
+    assert not len(mismatched), (
+        f"read {mismatched[0]}: expected {expected[mismatched[0]]}, got {words[mismatched[0]]}"
+        f"\nexpected {expected.tolist()}\ngot      {words.tolist()}"
+    )
+    dut._log.info(f"{len(words)} reads, {ring.underruns} underruns, {ring.overruns} overruns")
 
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [
         proj_path / "hdl" / "ring_buffer.sv",
         proj_path / "hdl" / "xilinx_true_dual_port_read_first_1_clock_ram.v",
     ]
-    build_test_args = ["-Wall"]
-    parameters = {"ENTRIES": 8, "DATA_WIDTH": 4}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="ring_buffer",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="ring_buffer",
-        test_module="test_ring_buffer",
-        test_args=run_test_args,
-        waves=True,
-    )
+    parameters = {"ENTRIES": ENTRIES, "DATA_WIDTH": DATA_WIDTH}
+    failed = bench.run("test_ring_buffer", "ring_buffer", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,15 @@
-import os
 import sys
 from pathlib import Path
 
 import cocotb
 from cocotb.clock import Clock
 from cocotb.clock import Clock
-from cocotb.runner import get_runner
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
+import bench
+
+import searcher_model
+
 # Parameters
 WIDTH = 12
 BRAM_SIZE = 256
@@ -60,36 +62,21 @@ async def test_searcher(dut):
     closest_value = dut.closest_value.value.integer
     closest_found = dut.closest_value_found.value
     assert closest_found, "Closest value not found."
+    expected = searcher_model.closest_table(searcher_model.load_rom(size=BRAM_SIZE))
+    assert (
+        closest_value == expected[search_val]
+    ), f"Expected closest period {expected[search_val]}, got {closest_value}"
     dut._log.info(f"Closest period found to {search_val} was {closest_value}")
 
 
 def main():
     """Simulate the counter using the Python runner."""
-    sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
     sources = [proj_path / "hdl" / "searcher.sv"]
     sources += [proj_path / "hdl" / "xilinx_single_port_ram_read_first.sv"]
-    build_test_args = ["-Wall"]
     parameters = {"WIDTH": WIDTH, "BRAM_SIZE": BRAM_SIZE}
-    sys.path.append(str(proj_path / "sim"))
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="searcher",
-        always=True,
-        build_args=build_test_args,
-        parameters=parameters,
-        timescale=("1ns", "1ps"),
-        waves=True,
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel="searcher",
-        test_module="test_searcher",
-        test_args=run_test_args,
-        waves=True,
-    )
+    failed = bench.run("test_searcher", "searcher", sources, parameters)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import os
+import sys
+from pathlib import Path
+
+import cocotb
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
+from cocotb.utils import get_sim_time
+
+import bench
+from drivers import SampleDriver
+
+import yin_model
+from wav_source import WavSource
+
+WIDTH = 16
+WINDOW_SIZE = int(os.getenv("WINDOW_SIZE", 256))
+TAUMAX = WINDOW_SIZE
+DIFFS_PER_BRAM = WINDOW_SIZE // 4
+HOP = int(os.getenv("HOP", WINDOW_SIZE // 4))
+
+# Room for both passes over a 256 sample window's BRAMs, with a little to
+# spare. Bigger windows need more; main() says when it is too few
+SAMPLE_CYCLES = int(os.getenv("SAMPLE_CYCLES", 300))
+TIMING = yin_model.hop_timing(HOP, SAMPLE_CYCLES, WINDOW_SIZE, TAUMAX)
+
+# Set NUM_WINDOWS=0 to run the whole recording
+NUM_WINDOWS = int(os.getenv("NUM_WINDOWS", 4))
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+AUDIO_PATH = Path(os.getenv("AUDIO", BASE_PATH / "test_data" / "aladdin-new.wav"))
+
+source = WavSource(AUDIO_PATH, WINDOW_SIZE)
+samples = source.samples[: (NUM_WINDOWS or len(source)) * WINDOW_SIZE].view(np.uint16) ^ 0x8000
+
+# A window's CMNDF pass only starts with the sample after it
+ends, stages = yin_model.sliding(samples, HOP, WINDOW_SIZE, TAUMAX)
+ends = ends[ends < len(samples)]
+expected = stages.taumin[: len(ends), -1]
+
+
+def now():
+    return int(get_sim_time("ns")) // bench.CLOCK_PERIOD
+
+
+async def watch(dut, taus, cycles):
+    while True:
+        await RisingEdge(dut.valid_out)
+        await FallingEdge(dut.clk_in)
+        taus.append(dut.taumin.value.integer)
+        cycles.append(now())
+
+
+def check(taus, latency):
+    """Compare taumins with the model and report how long each took."""
+    assert len(taus) == len(expected), f"expected {len(expected)} taumins, got {len(taus)}"
+    for end, tau, want in zip(ends, taus, expected):
+        assert tau == want, f"window ending at sample {end}: expected {want}, got {tau}"
+    print(
+        f"{len(taus)} taumins every {HOP} samples, {latency.min()}-{latency.max()} cycles"
+        f" after the window's last sample (model {TIMING.latency})"
+    )
+
+
+def replay(outputs, directory):
+    """Check cached taumins against the current model."""
+    check(outputs["taumin"], outputs["latency"])
+    return 0
+
+
+@cocotb.test()
+async def test_yin_sliding(dut):
+    cocotb.start_soon(Clock(dut.clk_in, bench.CLOCK_PERIOD, units="ns").start())
+    dut.valid_in.value = 0
+    dut.rst_in.value = 1
+    await ClockCycles(dut.clk_in, 2)
+    dut.rst_in.value = 0
+
+    taus = []
+    cycles = []
+    cocotb.start_soon(watch(dut, taus, cycles))
+
+    driver = SampleDriver(dut.clk_in, dut.sample_in, dut.valid_in, period=SAMPLE_CYCLES, rising=True)
+    await ClockCycles(dut.clk_in, 5)
+    start = now()
+    await driver.drive(samples)
+    await ClockCycles(dut.clk_in, TIMING.latency)
+
+    # The block mode scores the other, empty diff BRAMs while the first
+    # window comes in
+    if HOP >= WINDOW_SIZE:
+        taus, cycles = taus[1:], cycles[1:]
+    # valid_in of sample n is high in cycle start + n * SAMPLE_CYCLES
+    latency = np.array(cycles) - (start + (ends[: len(cycles)] - 1) * SAMPLE_CYCLES)
+    bench.save_outputs(taumin=np.array(taus), latency=latency)
+    check(np.array(taus), latency)
+
+
+def main():
+    """Simulate the counter using the Python runner."""
+    if not TIMING.fits:
+        print(f"HOP={HOP} leaves the CMNDF pass too little time at {SAMPLE_CYCLES} cycles a sample")
+        sys.exit(69)
+    proj_path = Path(__file__).resolve().parent.parent
+    sources = [
+        proj_path / "hdl" / "yin.sv",
+        proj_path / "hdl" / "xilinx_true_dual_port_read_first_1_clock_ram.v",
+        proj_path / "hdl" / "fp_div.sv",
+    ]
+    parameters = {
+        "WIDTH": WIDTH,
+        "TAUMAX": TAUMAX,
+        "WINDOW_SIZE": WINDOW_SIZE,
+        "DIFFS_PER_BRAM": DIFFS_PER_BRAM,
+        "HOP": HOP,
+    }
+    failed = bench.run(
+        "test_yin_sliding",
+        "yin",
+        sources,
+        parameters,
+        stimulus=[AUDIO_PATH, NUM_WINDOWS, HOP, SAMPLE_CYCLES],
+        replay=replay,
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
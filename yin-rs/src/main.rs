@@ -1,4 +1,15 @@
-use clap::Parser;
+use std::collections::BTreeMap;
+use std::fs::{self, File};
+use std::io::{self, BufWriter, Write};
+use std::path::{Path, PathBuf};
+use std::process;
+use std::sync::mpsc::{channel, sync_channel, Receiver};
+use std::sync::{Arc, Mutex};
+use std::thread;
+use std::time::Instant;
+
+use clap::error::ErrorKind;
+use clap::{CommandFactory, Parser, ValueEnum};
 use hound::WavReader;
 use num_traits::FromPrimitive;
 
@@ -8,24 +19,59 @@ struct Config {
     window_size: usize,
     #[arg(long)]
     taumax: usize,
+    /// WAV file to track
+    #[arg(long)]
+    file: Option<PathBuf>,
+    /// More WAV files, or directories to track every .wav in
+    inputs: Vec<PathBuf>,
+    /// Write <stem>-taus.txt/.bin here instead of next to each input
+    #[arg(long)]
+    out_dir: Option<PathBuf>,
+    /// text prints one tau per line; binary writes little-endian u16s
+    #[arg(long, value_enum, default_value_t = Format::Text)]
+    format: Format,
+    /// Also output the CMNDF minimum at each tau, a second column in text
+    /// or little-endian f32s in <stem>-cmndf.bin
+    #[arg(long)]
+    cmndf: bool,
+    /// Worker threads [default: one per core]
     #[arg(long)]
-    file: String,
+    threads: Option<usize>,
+    /// Windows handed to a worker at a time
+    #[arg(long, default_value_t = 64)]
+    batch: usize,
+    /// Report windows/s on stderr instead of printing taus
+    #[arg(long)]
+    bench: bool,
+}
+
+#[derive(Clone, Copy, PartialEq, ValueEnum)]
+enum Format {
+    Text,
+    Binary,
 }
 
-fn yin(sig: &[f32], window_size: usize, taumax: usize) -> u16 {
+/// The tau of the first CMNDF dip under 0.1, or of its minimum if there is
+/// none, and the CMNDF there
+fn yin(sig: &[f32], window_size: usize, taumax: usize) -> (u16, f32) {
     let mut diff = vec![0.0; taumax];
     let mut cumdiff = vec![0.0; taumax];
 
     diff[0] = f32::from_i16(1).unwrap();
     cumdiff[0] = f32::from_i16(1).unwrap();
 
-    // autocorrelate
+    // autocorrelate, keeping a running sum of diff[1..=tau] for the
+    // normalization. Both add in the same order as summing from scratch,
+    // so the taus come out bit for bit the same
+    let mut diff_sum = 0.0;
     for tau in 1..taumax {
-        for i in 0..(window_size - tau) {
-            diff[tau] += (sig[i] - sig[i + tau]).powi(2);
+        let mut d = 0.0;
+        for (a, b) in sig[..window_size - tau].iter().zip(&sig[tau..window_size]) {
+            d += (a - b).powi(2);
         }
-        cumdiff[tau] =
-            f32::from_usize(tau).unwrap() * diff[tau] / diff.iter().skip(1).take(tau).sum::<f32>();
+        diff[tau] = d;
+        diff_sum += d;
+        cumdiff[tau] = f32::from_usize(tau).unwrap() * d / diff_sum;
     }
 
     let mut diff_min = f32::MAX;
@@ -43,7 +89,131 @@ fn yin(sig: &[f32], window_size: usize, taumax: usize) -> u16 {
         }
     }
 
-    tau_min as u16
+    (tau_min as u16, cumdiff[tau_min])
+}
+
+/// Reads `batch` whole windows at a time and sends them off in order, so the
+/// signal is never held in memory all at once. A trailing partial window is
+/// dropped, like `chunks_exact`. A file too short for a window still sends
+/// one empty batch, so it gets an (empty) output.
+fn read_windows(
+    file: &Path,
+    window_size: usize,
+    batch: usize,
+    mut send: impl FnMut(Vec<f32>) -> bool,
+) -> Result<(), hound::Error> {
+    let mut reader = WavReader::open(file)?;
+    let mut samples = reader
+        .samples::<i16>()
+        .map(|i| f32::from_u16((i.unwrap() as u16) ^ 0x8000u16).unwrap());
+    for index in 0.. {
+        let mut chunk = samples
+            .by_ref()
+            .take(batch * window_size)
+            .collect::<Vec<f32>>();
+        let last = chunk.len() < batch * window_size;
+        chunk.truncate(chunk.len() - chunk.len() % window_size);
+        if (chunk.is_empty() && index > 0) || !send(chunk) || last {
+            break;
+        }
+    }
+    Ok(())
+}
+
+/// Every input file, with each directory replaced by its .wav files in name
+/// order
+fn wav_files(inputs: &[PathBuf]) -> Vec<PathBuf> {
+    let mut files = Vec::new();
+    for input in inputs {
+        if !input.is_dir() {
+            files.push(input.clone());
+            continue;
+        }
+        let entries = fs::read_dir(input).unwrap_or_else(|e| {
+            eprintln!("{}: {}", input.display(), e);
+            process::exit(1);
+        });
+        let mut wavs = entries
+            .filter_map(|entry| entry.ok().map(|entry| entry.path()))
+            .filter(|path| {
+                path.extension()
+                    .is_some_and(|ext| ext.eq_ignore_ascii_case("wav"))
+            })
+            .collect::<Vec<_>>();
+        wavs.sort();
+        files.extend(wavs);
+    }
+    files
+}
+
+fn create(path: PathBuf) -> Box<dyn Write> {
+    match File::create(&path) {
+        Ok(f) => Box::new(BufWriter::new(f)),
+        Err(e) => {
+            eprintln!("{}: {}", path.display(), e);
+            process::exit(1);
+        }
+    }
+}
+
+/// Where one input's taus (and CMNDF minimums) go
+struct Sink {
+    format: Format,
+    cmndf: bool,
+    taus: Box<dyn Write>,
+    /// Binary CMNDF minimums; text puts them next to the taus
+    cmndf_out: Option<Box<dyn Write>>,
+}
+
+impl Sink {
+    fn stdout(cmndf: bool) -> Sink {
+        Sink {
+            format: Format::Text,
+            cmndf,
+            taus: Box::new(BufWriter::new(io::stdout())),
+            cmndf_out: None,
+        }
+    }
+
+    /// <stem>-taus.txt or <stem>-taus.bin (and <stem>-cmndf.bin) in
+    /// `out_dir`, or next to `file`
+    fn files(file: &Path, out_dir: Option<&Path>, format: Format, cmndf: bool) -> Sink {
+        let dir = out_dir.unwrap_or_else(|| file.parent().unwrap_or(Path::new("")));
+        let stem = file.file_stem().unwrap_or_default().to_string_lossy();
+        let ext = match format {
+            Format::Text => "txt",
+            Format::Binary => "bin",
+        };
+        Sink {
+            format,
+            cmndf,
+            taus: create(dir.join(format!("{}-taus.{}", stem, ext))),
+            cmndf_out: (cmndf && format == Format::Binary)
+                .then(|| create(dir.join(format!("{}-cmndf.bin", stem)))),
+        }
+    }
+
+    fn write(&mut self, tau: u16, cmndf: f32) -> io::Result<()> {
+        match self.format {
+            Format::Text if self.cmndf => writeln!(self.taus, "{} {}", tau, cmndf),
+            Format::Text => writeln!(self.taus, "{}", tau),
+            Format::Binary => {
+                self.taus.write_all(&tau.to_le_bytes())?;
+                if let Some(out) = &mut self.cmndf_out {
+                    out.write_all(&cmndf.to_le_bytes())?;
+                }
+                Ok(())
+            }
+        }
+    }
+
+    fn flush(&mut self) -> io::Result<()> {
+        self.taus.flush()?;
+        if let Some(out) = &mut self.cmndf_out {
+            out.flush()?;
+        }
+        Ok(())
+    }
 }
 
 fn main() {
@@ -51,14 +221,132 @@ fn main() {
         window_size,
         taumax,
         file,
+        inputs,
+        out_dir,
+        format,
+        cmndf,
+        threads,
+        batch,
+        bench,
     } = Config::parse();
-    let mut reader = WavReader::open(file).unwrap();
-    let sig = reader
-        .samples::<i16>()
-        .map(|i| f32::from_u16((i.unwrap() as u16) ^0x8000u16).unwrap())
-        .collect::<Vec<f32>>();
+    let inputs = file.into_iter().chain(inputs).collect::<Vec<_>>();
+    if inputs.is_empty() {
+        Config::command()
+            .error(
+                ErrorKind::MissingRequiredArgument,
+                "no --file or inputs given",
+            )
+            .exit();
+    }
+    // One file's text goes to stdout, as before there were several
+    let to_stdout =
+        inputs.len() == 1 && !inputs[0].is_dir() && out_dir.is_none() && format == Format::Text;
+    let files = wav_files(&inputs);
+    if let Some(dir) = &out_dir {
+        if let Err(e) = fs::create_dir_all(dir) {
+            eprintln!("{}: {}", dir.display(), e);
+            process::exit(1);
+        }
+    }
+    let threads = threads
+        .unwrap_or_else(|| thread::available_parallelism().map_or(1, |n| n.get()))
+        .max(1);
+    let batch = batch.max(1);
+
+    let start = Instant::now();
+    let mut windows = 0;
+    let mut failed = 0;
 
-    for chunk in sig.chunks_exact(window_size) {
-        println!("{}", yin(chunk, window_size, taumax))
+    thread::scope(|s| {
+        // A couple of batches queued per worker is enough to keep them busy.
+        // Batches are numbered across every file, so one pool of workers
+        // goes from file to file without waiting for the last one to finish
+        let (batch_tx, batch_rx) = sync_channel::<(usize, usize, Vec<f32>)>(2 * threads);
+        let batch_rx: Arc<Mutex<Receiver<_>>> = Arc::new(Mutex::new(batch_rx));
+        let (tau_tx, tau_rx) = channel::<(usize, usize, Vec<(u16, f32)>)>();
+
+        let files = &files;
+        let reader = s.spawn(move || {
+            let mut seq = 0;
+            let mut failed = 0;
+            for (n, file) in files.iter().enumerate() {
+                let read = read_windows(file, window_size, batch, |b| {
+                    seq += 1;
+                    batch_tx.send((seq - 1, n, b)).is_ok()
+                });
+                if let Err(e) = read {
+                    eprintln!("{}: {}, skipping", file.display(), e);
+                    failed += 1;
+                }
+            }
+            failed
+        });
+        for _ in 0..threads {
+            let batch_rx = Arc::clone(&batch_rx);
+            let tau_tx = tau_tx.clone();
+            s.spawn(move || loop {
+                let next = batch_rx.lock().unwrap().recv();
+                let Ok((index, n, sig)) = next else { break };
+                let taus = sig
+                    .chunks_exact(window_size)
+                    .map(|chunk| yin(chunk, window_size, taumax))
+                    .collect();
+                if tau_tx.send((index, n, taus)).is_err() {
+                    break;
+                }
+            });
+        }
+        drop(tau_tx);
+
+        // Batches finish out of order; write each as soon as every batch
+        // before it is out, moving to the next file's output with its first
+        // batch
+        let mut pending = BTreeMap::new();
+        let mut next = 0;
+        let mut sink: Option<(usize, Sink)> = None;
+        for (index, n, taus) in tau_rx {
+            pending.insert(index, (n, taus));
+            while let Some((n, taus)) = pending.remove(&next) {
+                windows += taus.len();
+                next += 1;
+                if bench {
+                    continue;
+                }
+                if !matches!(sink, Some((current, _)) if current == n) {
+                    if let Some((_, mut done)) = sink.take() {
+                        done.flush().unwrap();
+                    }
+                    let out = if to_stdout {
+                        Sink::stdout(cmndf)
+                    } else {
+                        Sink::files(&files[n], out_dir.as_deref(), format, cmndf)
+                    };
+                    sink = Some((n, out));
+                }
+                let (_, out) = sink.as_mut().unwrap();
+                for (tau, cmndf) in taus {
+                    out.write(tau, cmndf).unwrap();
+                }
+            }
+        }
+        if let Some((_, mut done)) = sink {
+            done.flush().unwrap();
+        }
+        failed = reader.join().unwrap();
+    });
+
+    if bench {
+        let elapsed = start.elapsed().as_secs_f64();
+        eprintln!(
+            "{} windows from {} files in {:.2}s, {:.0} windows/s on {} threads",
+            windows,
+            files.len() - failed,
+            elapsed,
+            windows as f64 / elapsed,
+            threads
+        );
+    }
+    if failed > 0 {
+        process::exit(1);
     }
 }